@@ -1,12 +1,23 @@
 import streamlit as st
-import os
-import tempfile
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from src.pipeline import MediSyncPipeline
+from src.ocr_cache import OCRCache
+from src.denial_extraction import get_record_cache
+from src.jobs import JobQueue, appeal_job, appeal_job_key, JOB_QUEUED, JOB_SUCCEEDED, JOB_FAILED, STAGE_OCR
+from src.errors import QueueFullError, RateLimitError
+from src.ocr_scheduler import get_ocr_scheduler
+from src.ocr_engine import get_page_count, join_page_texts
+from src.quotas import Cost, QuotaManager, Reservation, estimate_cost
+from src.constants import (
+    JOB_POLL_INTERVAL_SECONDS, JOB_WORKERS, JOB_QUEUE_DEPTH, RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW
+)
 from src.config import AppConfig
 from src.styles import get_base_styles, get_app_styles
-from src.auth import login_form, check_subscription, create_portal_session
-from src.rate_limiter import RateLimiter
+from src.auth import (
+    login_form, check_subscription, subscription_plan, create_portal_session, invalidate_subscription
+)
+from src.rate_limiter import RateLimiter, create_backend
 
 st.set_page_config(page_title="MediSync SaaS", page_icon="🏥", layout="wide")
 
@@ -25,6 +36,11 @@ import types
 if isinstance(user, dict):
     user = types.SimpleNamespace(**user)
 
+# Returning from Stripe checkout or the billing portal: the cached subscription state is outdated
+if st.query_params.get("billing") in ("checkout", "portal"):
+    invalidate_subscription(user.email)
+    del st.query_params["billing"]
+
 # Check Subscription
 is_subscribed = check_subscription(user.email)
 if not is_subscribed:
@@ -34,6 +50,9 @@ if not is_subscribed:
     st.warning("💳 Subscription Required")
     st.markdown("Your 7-day free trial has expired or you do not have an active subscription.")
     st.markdown(f"[Manage Subscription]({payment_link})") 
+    if st.button("I've completed checkout"):
+        invalidate_subscription(user.email)
+        st.rerun()
     st.stop()
 
 
@@ -51,6 +70,7 @@ with st.sidebar:
     # 3. User Info in Sidebar
     st.markdown(f"**Logged in as:** `{user.email}`")
     if st.sidebar.button("Logout", type="primary"):
+        invalidate_subscription(user.email)
         st.session_state.user = None
         st.rerun()
 
@@ -91,6 +111,13 @@ if not api_key:
     # st.warning("⚠️ Authentication Required. Please enter your API credentials in the sidebar.")
     st.stop()
 
+@st.cache_resource
+def get_ocr_cache() -> OCRCache:
+    """Process-wide OCR result cache shared by all sessions."""
+    config = AppConfig.from_secrets()
+    key = config.ocr_cache_key.encode() if config.ocr_cache_key else None
+    return OCRCache(disk_dir=config.ocr_cache_dir, encryption_key=key)
+
 # Initialize Pipeline (no caching needed - initialization is fast)
 def get_pipeline(api_key: str) -> Optional[MediSyncPipeline]:
     """Create a pipeline instance.
@@ -103,79 +130,306 @@ def get_pipeline(api_key: str) -> Optional[MediSyncPipeline]:
     """
     if not api_key:
         return None
-    return MediSyncPipeline(api_key)
+    ocr_cache = get_ocr_cache()
+    # Enforce the retention window even when nobody hits the expired entries
+    ocr_cache.purge_expired()
+    return MediSyncPipeline(api_key, ocr_cache=ocr_cache, record_cache=get_record_cache())
+
+@st.cache_resource
+def get_background_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for OCR work that outlives a single script run."""
+    return ThreadPoolExecutor(max_workers=2)
+
+def extract_remaining_context(pdf_bytes: bytes, page_numbers: List[int], owner: str) -> Dict[int, str]:
+    """Extract the pages skipped by the budgeted OCR pass (runs in the background).
+    
+    Args:
+        pdf_bytes: Uploaded PDF content
+        page_numbers: Pages that were not extracted yet
+        owner: User the extraction runs for
+        
+    Returns:
+        Text of each remaining page, by page number
+    """
+    return MediSyncPipeline.extract_remaining_pages(pdf_bytes, page_numbers[0], page_numbers, owner=owner)
+
+@st.cache_resource
+def get_rate_limiter() -> RateLimiter:
+    """Per-user appeal limit, shared by every tab and replica when the database is configured."""
+    config = AppConfig.from_secrets()
+    return RateLimiter(
+        max_requests=RATE_LIMIT_REQUESTS,
+        window_seconds=RATE_LIMIT_WINDOW,
+        backend=create_backend(config.supabase_url, config.supabase_service_key),
+        name="appeals"
+    )
+
+@st.cache_resource
+def get_quota_manager() -> QuotaManager:
+    """Per-user OCR and token budgets, on the same backend as the request limit."""
+    config = AppConfig.from_secrets()
+    return QuotaManager(backend=create_backend(config.supabase_url, config.supabase_service_key))
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """Process-wide appeal job queue; jobs outlive reruns and browser reconnects."""
+    config = AppConfig.from_secrets()
+    return JobQueue(
+        workers=int(config.job_workers or JOB_WORKERS),
+        max_queue_depth=int(config.job_queue_depth or JOB_QUEUE_DEPTH)
+    )
+
+def release_request(email: str, reservation: Optional[Reservation]):
+    """Give back a Draft Appeal request's rate limit unit and reserved budget (it started no new job)."""
+    get_rate_limiter().adjust(email, -1)
+    if reservation is not None:
+        reservation.settle(Cost())
+
+def cancel_job(job_id: str):
+    """Cancel button callback: stop the running appeal job."""
+    get_job_queue().cancel(job_id)
+
+def forget_job():
+    """Stop following the current job (it finished, expired, or was replaced)."""
+    st.session_state["job_id"] = None
+    if "job" in st.query_params:
+        del st.query_params["job"]
+
+@st.fragment(run_every=JOB_POLL_INTERVAL_SECONDS)
+def show_job_progress():
+    """Poll the appeal job and move its result into the session once it finishes."""
+    job_id = st.session_state.get("job_id")
+    if not job_id:
+        return
+    job = get_job_queue().get(job_id, owner=user.email)
+    if job is None:
+        forget_job()
+        st.info("The previous job has expired. Please draft the appeal again.")
+        return
+
+    if not job.done:
+        if job.status == JOB_QUEUED:
+            st.caption(f"⏳ Waiting for a free worker (position {get_job_queue().queue_position(job.id)} in line)...")
+        elif job.stage == STAGE_OCR:
+            st.progress(job.progress, text=job.message or "Ranking pages by relevance...")
+            scheduler = get_ocr_scheduler()
+            position = scheduler.position(user.email)
+            if position is not None and not job.partial_text:
+                st.caption(
+                    f"⏳ OCR is busy: you are #{position} in line, "
+                    f"about {scheduler.eta_seconds(user.email):.0f}s until your pages start."
+                )
+            if job.partial_text:
+                st.container(height=200).text(job.partial_text)
+        else:
+            st.caption(job.message)
+            if job.partial_text:
+                st.container(height=500).text(job.partial_text)
+        st.button("Cancel", on_click=cancel_job, args=(job.id,))
+        return
+
+    forget_job()
+    if job.status == JOB_SUCCEEDED:
+        result = job.result
+        st.session_state["appeal_result"] = {
+            "draft": result['draft'],
+            "context": result['context'],
+            "page_texts": result.get('page_texts', {}),
+            "extraction": result['extraction'],
+            "normalization": result.get('normalization'),
+            "compression": result.get('compression'),
+            "denial_record": result.get('denial_record'),
+            "prompt_version": result.get('prompt_version'),
+            "next_page": result['next_page'],
+            "remaining_pages": result['remaining_pages'],
+            "filename": job.label
+        }
+        st.session_state["context_job"] = None
+        st.rerun()
+    elif job.status == JOB_FAILED:
+        st.error(f"Error: {job.error}")
+    else:
+        st.info("Processing cancelled.")
+
+@st.fragment(run_every=2)
+def show_context_progress():
+    """Poll the background extraction and merge its text into the result once done."""
+    job = st.session_state.get("context_job")
+    if job is None:
+        return
+    if not job.done():
+        st.caption("⏳ Extracting remaining pages in the background...")
+        return
+
+    res = st.session_state["appeal_result"]
+    st.session_state["context_job"] = None
+    try:
+        # Triage can skip pages before extracted ones: merge by page number
+        res['page_texts'] = {**res['page_texts'], **job.result()}
+        res['context'] = join_page_texts(res['page_texts'])
+        res['next_page'] = None
+        res['remaining_pages'] = []
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
+        return
+    st.rerun()
 
 # Initialize Session State to hold data across re-runs
 # Initialize session state for appeal results
 if "appeal_result" not in st.session_state:
     st.session_state["appeal_result"] = None
 
-# Initialize rate limiter (5 requests per 60 seconds per user)
-if "rate_limiter" not in st.session_state:
-    st.session_state.rate_limiter = RateLimiter(max_requests=5, window_seconds=60)
+
+# Reconnect to a job started before a browser refresh
+if "job_id" not in st.session_state:
+    st.session_state["job_id"] = st.query_params.get("job")
 
 uploaded_file = st.file_uploader("Upload Denial Letter", type=["pdf"])
 
 # If a new file is uploaded, clear previous results
 if uploaded_file and st.session_state["appeal_result"] and st.session_state["appeal_result"]["filename"] != uploaded_file.name:
     st.session_state["appeal_result"] = None
+    st.session_state["context_job"] = None
 
 if uploaded_file:
-    # We use a button to trigger processing
-    if st.button("Draft Appeal"):
-        # Check rate limit before processing
-        allowed, reset_time = st.session_state.rate_limiter.is_allowed(user.email)
-        
-        if not allowed:
-            st.error(f"⏱️ **Rate limit exceeded.** Please wait {reset_time} seconds before trying again.")
-            st.info(f"💡 **Tip:** You can make up to 5 requests per minute to prevent system abuse.")
-            st.stop()
-        
-        with st.spinner("Analyzing Medical Policy & Drafting..."):
+    # We use a button to trigger processing (disabled while a job is in flight)
+    if st.button("Draft Appeal", disabled=bool(st.session_state["job_id"])):
+        advocate_details = {
+            "name": advocate_name,
+            "title": advocate_title,
+            "address": advocate_address
+        }
+        # Read the upload into memory (never written to disk)
+        pdf_bytes = uploaded_file.getvalue()
+        pipeline = get_pipeline(api_key)
+        job_key = appeal_job_key(pdf_bytes, advocate_details, pipeline.llm.model, pipeline.llm.prompt.id)
+
+        # The same appeal is already being drafted (double click, rerun, second tab): follow that job
+        job = get_job_queue().in_flight(user.email, job_key)
+        if job is None:
+            # Turn the request away now rather than after a long wait when OCR is saturated
+            # (before the rate limit, so a rejected request does not use up the user's allowance)
             try:
-                # 1. Save to Temp File
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                    tmp.write(uploaded_file.getvalue())
-                    tmp_path = tmp.name
-
-                # 2. Run Pipeline (PASSING THE SIDEBAR DATA NOW)
-                pipeline = get_pipeline(api_key)
-                result = pipeline.process_file(tmp_path, advocate_details={
-                    "name": advocate_name,
-                    "title": advocate_title,
-                    "address": advocate_address
-                })
-                
-                # 3. SAVE TO SESSION STATE
-                st.session_state["appeal_result"] = {
-                    "draft": result['draft'],
-                    "context": result['context'],
-                    "filename": uploaded_file.name
-                }
-                
-                # Cleanup
-                os.unlink(tmp_path)
-
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
-
-    # Display Result (If it exists in memory)
-    if st.session_state["appeal_result"]:
-        res = st.session_state["appeal_result"]
+                get_ocr_scheduler().check_admission()
+            except QueueFullError as e:
+                st.error(f"⏳ {str(e)}")
+                st.stop()
+
+            # Check rate limit before processing
+            allowed, reset_time = get_rate_limiter().is_allowed(user.email)
+            
+            if not allowed:
+                st.error(f"⏱️ **Rate limit exceeded.** Please wait {reset_time} seconds before trying again.")
+                st.info(
+                    f"💡 **Tip:** You can make up to {RATE_LIMIT_REQUESTS} requests per "
+                    f"{RATE_LIMIT_WINDOW} seconds to prevent system abuse."
+                )
+                st.stop()
         
-        st.success("✅ Appeal Generated!")
-        st.balloons()
+        charged = job is None
+        reservation = None
+        try:
+            if job is None:
+                # Hold the appeal's estimated OCR and token cost; the job settles the actual cost
+                reservation = get_quota_manager().reserve(
+                    user.email, subscription_plan(user.email), estimate_cost(get_page_count(pdf_bytes))
+                )
+
+                # Hand the work to a background worker; the script thread only polls the job.
+                # Joining a job another tab queued meanwhile releases this request's charges.
+                job = get_job_queue().submit(
+                    user.email,
+                    appeal_job(pipeline, pdf_bytes, advocate_details, reservation=reservation),
+                    label=uploaded_file.name,
+                    key=job_key,
+                    on_coalesced=lambda: release_request(user.email, reservation)
+                )
+            st.session_state["job_id"] = job.id
+            st.query_params["job"] = job.id
+        except RateLimitError as e:
+            st.error(f"⏱️ **{str(e)}** Please wait {e.retry_after} seconds, or try a shorter document.")
+        except QueueFullError as e:
+            st.error(f"⏳ {str(e)}")
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+        finally:
+            # No job was queued: give the allowance and the reserved budget back
+            if charged and not st.session_state["job_id"]:
+                release_request(user.email, reservation)
+
+# Progress of the running job (also after a rerun or a browser refresh)
+show_job_progress()
+
+# Display Result (If it exists in memory)
+if st.session_state["appeal_result"]:
+    res = st.session_state["appeal_result"]
+    
+    st.success("✅ Appeal Generated!")
+    st.balloons()
+    
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.text_area("Original Context", value=res['context'], height=300, disabled=True)
+        extraction = res['extraction']
+        st.caption(
+            f"{extraction['text_layer_pages']} page(s) read from the PDF text layer, "
+            f"{extraction['ocr_pages']} OCRed, {extraction['failed_pages']} unreadable."
+        )
+        if res.get('normalization'):
+            normalization = res['normalization']
+            st.caption(
+                f"Text clean-up: {normalization['chars_before']:,} → {normalization['chars_after']:,} characters "
+                f"({normalization['repeated_lines']} repeated header/footer lines, "
+                f"{normalization['noise_words']} noise words removed)."
+            )
+        if res.get('compression'):
+            compression = res['compression']
+            st.caption(
+                f"Context sent to the LLM: {compression.get('draft_context_tokens', compression['tokens_after'])} "
+                f"of {compression['tokens_before']} tokens."
+            )
+        if res.get('denial_record'):
+            with st.expander("Extracted denial details"):
+                st.json(res['denial_record'])
+        with st.expander("Page relevance"):
+            st.dataframe(
+                [
+                    {
+                        "page": page['page'],
+                        "source": page['source'],
+                        "relevance": page['relevance'],
+                        "signals": ", ".join(f"{name} x{count}" for name, count in page['signals'].items()),
+                    }
+                    for page in extraction['pages']
+                ],
+                hide_index=True
+            )
+        # Pages left out of the LLM context are only extracted if the user wants to see them
+        # After a browser reconnect the upload is gone: the pages can only be read from a new upload
+        if res['remaining_pages'] and uploaded_file is None:
+            st.caption(f"{len(res['remaining_pages'])} page(s) not extracted. Upload the PDF again to load them.")
+        elif res['remaining_pages'] and not st.session_state.get("context_job"):
+            if st.button(f"Load remaining pages ({len(res['remaining_pages'])} not extracted)"):
+                st.session_state["context_job"] = get_background_executor().submit(
+                    extract_remaining_context, uploaded_file.getvalue(), res['remaining_pages'], user.email
+                )
+        show_context_progress()
+    with col2:
+        # We let the user edit this text area, but we don't save the edits back to state yet for simplicity
+        final_draft = st.text_area("Appeal Draft", value=res['draft'], height=500)
         
-        col1, col2 = st.columns([1, 1])
-        with col1:
-            st.text_area("Original Context", value=res['context'], height=300, disabled=True)
-        with col2:
-            # We let the user edit this text area, but we don't save the edits back to state yet for simplicity
-            final_draft = st.text_area("Appeal Draft", value=res['draft'], height=500)
-            
-            st.download_button(
-                label="Download Text File",
-                data=final_draft,
-                file_name=f"{res['filename']}_APPEAL.txt",
-                mime="text/plain"
-            )
\ No newline at end of file
+        st.download_button(
+            label="Download Text File",
+            data=final_draft,
+            file_name=f"{res['filename']}_APPEAL.txt",
+            mime="text/plain"
+        )
+
+# --- Load metrics: OCR queue depth, wait times and job counters ---
+with st.sidebar.expander("📊 System Load"):
+    st.json({
+        "ocr": get_ocr_scheduler().stats(),
+        "ocr_cache": get_ocr_cache().stats(),
+        "jobs": get_job_queue().stats(),
+        "quotas": get_quota_manager().stats(),
+    })
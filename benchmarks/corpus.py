@@ -0,0 +1,214 @@
+"""Reproducible synthetic denial-letter corpus for the OCR benchmarks.
+
+Every document is generated from a seed, so the same (variant, pages, seed)
+always yields the same PDF and the same ground truth text. Variants:
+
+- ``born_digital``: real text layer, no images (exercises the pdftotext path)
+- ``clean``: crisp 200 DPI grayscale scan
+- ``noisy_fax``: half vertical resolution, speckle noise, 1-bit black/white
+- ``rotated``: clean scan skewed by up to ROTATION_MAX_DEGREES
+"""
+import io
+import random
+import textwrap
+from dataclasses import dataclass
+from typing import List
+
+from PIL import Image, ImageDraw, ImageFont
+
+VARIANTS = ("born_digital", "clean", "noisy_fax", "rotated")
+
+SCAN_DPI = 200
+"""Resolution the synthetic scans are rasterized at."""
+
+ROTATION_MAX_DEGREES = 5.0
+"""Largest skew applied to pages of the ``rotated`` variant."""
+
+FAX_NOISE_RATIO = 0.003
+"""Share of pixels flipped to black in the ``noisy_fax`` variant."""
+
+_LINE_WIDTH = 78
+_LINES_PER_PAGE = 48
+_FONT_CANDIDATES = ("DejaVuSans.ttf", "LiberationSans-Regular.ttf", "Arial.ttf")
+
+_PAYERS = ("Blue Meridian Health", "Keystone Mutual Insurance", "Pacific Crest Health Plan", "Unity Care Assurance")
+_PROCEDURES = (
+    ("97110", "therapeutic exercise"),
+    ("72148", "MRI lumbar spine without contrast"),
+    ("E0601", "continuous positive airway pressure device"),
+    ("J1745", "infliximab injection"),
+    ("29881", "knee arthroscopy with meniscectomy"),
+)
+_CARC_CODES = (
+    ("CO-50", "These are non-covered services because this is not deemed a medical necessity by the payer."),
+    ("CO-197", "Precertification/authorization/notification absent."),
+    ("PR-96", "Non-covered charge(s)."),
+    ("CO-151", "Payment adjusted because the payer deems the information submitted does not support this level of service."),
+)
+_BOILERPLATE = (
+    "This notice is provided in accordance with applicable state and federal law governing group health plans.",
+    "Coverage decisions are based on the terms of your benefit plan and the clinical policy in effect on the date of service.",
+    "You may request copies of all documents relevant to your claim free of charge by contacting Member Services.",
+    "Language assistance services are available at no cost to you. Please call the number on your member ID card.",
+    "Nothing in this letter should be interpreted as a limitation of the rights afforded to you under your plan.",
+    "Clinical policies are reviewed annually by a committee of practicing physicians and are subject to change.",
+)
+
+
+@dataclass
+class SyntheticDocument:
+    """A generated PDF together with the exact text of each page."""
+
+    name: str
+    variant: str
+    pdf: bytes
+    pages: List[str]
+
+
+def _denial_letter(rng: random.Random) -> List[str]:
+    """Lines of the first page: the actual denial with its codes and rationale."""
+    payer = rng.choice(_PAYERS)
+    code, procedure = rng.choice(_PROCEDURES)
+    carc, carc_text = rng.choice(_CARC_CODES)
+    claim = f"{rng.randint(10, 99)}{rng.randint(10000000, 99999999)}"
+    member = f"{rng.choice('ABCDEFGHJK')}{rng.randint(100000000, 999999999)}"
+    month, day = rng.randint(1, 12), rng.randint(1, 28)
+    paragraphs = [
+        f"{payer}",
+        "Notice of Adverse Benefit Determination",
+        f"Member ID: {member}",
+        f"Claim Number: {claim}",
+        f"Date of Service: {month:02d}/{day:02d}/2024",
+        f"Procedure: {code} {procedure}",
+        f"We have reviewed the claim for {procedure} and the claim has been denied. "
+        f"Reason code {carc}: {carc_text} Based on the clinical information provided, "
+        f"the service is not medically necessary under the applicable clinical policy.",
+        "You have the right to appeal this decision within 180 days of the date of this notice. "
+        "Please include this letter, the claim number and any supporting medical records with your appeal.",
+    ]
+    return [line for paragraph in paragraphs for line in textwrap.wrap(paragraph, _LINE_WIDTH)]
+
+
+def _filler_page(rng: random.Random) -> List[str]:
+    """Lines of a follow-up page: an EOB table or policy boilerplate."""
+    if rng.random() < 0.5:
+        lines = ["EXPLANATION OF BENEFITS", "Line  Code   Billed     Allowed    Paid      Remark"]
+        for index in range(1, rng.randint(12, 30)):
+            code, _ = rng.choice(_PROCEDURES)
+            billed = rng.randint(50, 5000)
+            lines.append(f"{index:<5} {code:<6} {billed:>9.2f} {billed * 0.6:>10.2f} {0:>9.2f}  N{rng.randint(1, 400)}")
+        return lines
+    text = " ".join(rng.choice(_BOILERPLATE) for _ in range(rng.randint(8, 16)))
+    return textwrap.wrap(text, _LINE_WIDTH)
+
+
+def _load_font(size: int) -> ImageFont.ImageFont:
+    for name in _FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    # The bitmap fallback is tiny, so accuracy numbers are only comparable on hosts with the same fonts
+    return ImageFont.load_default()
+
+
+def _render_scan(lines: List[str], variant: str, rng: random.Random) -> Image.Image:
+    """Rasterize page lines like a scanner or fax machine would."""
+    width, height = int(8.5 * SCAN_DPI), int(11 * SCAN_DPI)
+    font_size = SCAN_DPI // 7
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    font = _load_font(font_size)
+    y = SCAN_DPI
+    for line in lines:
+        draw.text((SCAN_DPI, y), line, font=font, fill=0)
+        y += int(font_size * 1.5)
+
+    if variant == "rotated":
+        angle = rng.uniform(-ROTATION_MAX_DEGREES, ROTATION_MAX_DEGREES)
+        image = image.rotate(angle, resample=Image.BILINEAR, fillcolor=255)
+    elif variant == "noisy_fax":
+        # Standard fax resolution halves the vertical DPI
+        image = image.resize((width, height // 2), Image.BILINEAR).resize((width, height), Image.NEAREST)
+        draw = ImageDraw.Draw(image)
+        speckles = int(width * height * FAX_NOISE_RATIO)
+        draw.point([(rng.randrange(width), rng.randrange(height)) for _ in range(speckles)], fill=0)
+        image = image.point(lambda value: 0 if value < 160 else 255).convert("1")
+    return image
+
+
+def _escape_pdf_text(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_pdf(pages: List[List[str]]) -> bytes:
+    """Write a minimal born-digital PDF with one Helvetica text block per page."""
+    font_id = 3
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        font_id: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    page_ids = []
+    for index, lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * index, 5 + 2 * index
+        body = "\n".join(f"({_escape_pdf_text(line)}) Tj T*" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 72 720 Td\n{body}\nET".encode("latin-1")
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font_id, content_id)
+        )
+        page_ids.append(page_id)
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = out.tell()
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (obj_id, objects[obj_id]))
+    xref = out.tell()
+    count = max(objects) + 1
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+    for obj_id in range(1, count):
+        out.write(b"%010d 00000 n \n" % offsets[obj_id])
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref))
+    return out.getvalue()
+
+
+def generate_document(variant: str, page_count: int, seed: int = 0) -> SyntheticDocument:
+    """Generate one synthetic denial packet.
+
+    Args:
+        variant: One of VARIANTS
+        page_count: Number of pages (the first is the denial letter itself)
+        seed: Seed that makes the content and noise reproducible
+
+    Returns:
+        The PDF and the ground truth text of every page
+
+    Raises:
+        ValueError: If the variant is unknown
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown corpus variant: {variant}")
+
+    rng = random.Random(f"{variant}|{page_count}|{seed}")
+    page_lines = [_denial_letter(rng)] + [_filler_page(rng) for _ in range(page_count - 1)]
+    page_lines = [lines[:_LINES_PER_PAGE] for lines in page_lines]
+
+    if variant == "born_digital":
+        pdf = _text_pdf(page_lines)
+    else:
+        images = [_render_scan(lines, variant, rng) for lines in page_lines]
+        buffer = io.BytesIO()
+        images[0].save(buffer, "PDF", save_all=True, append_images=images[1:], resolution=SCAN_DPI)
+        pdf = buffer.getvalue()
+
+    return SyntheticDocument(
+        name=f"{variant}-{page_count}p-s{seed}",
+        variant=variant,
+        pdf=pdf,
+        pages=["\n".join(lines) for lines in page_lines]
+    )
@@ -0,0 +1,385 @@
+"""OCR throughput, latency, memory and accuracy benchmark.
+
+Runs the OCR stage (extract_pages_from_pdf) over the synthetic corpus and
+writes one JSON document with a record per (engine configuration, variant,
+page count). Engine settings (worker count, adaptive DPI, the libtesseract
+worker pool, the text layer fast path) each take a comma-separated list of
+values, and every combination is run. Run from the repository root:
+
+    python -m benchmarks.ocr_benchmark --output bench.json
+    python -m benchmarks.ocr_benchmark --compare bench.json
+    python -m benchmarks.ocr_benchmark --workers 1,4 --worker-pool on,off
+
+With ``--compare`` the fresh results are checked against a baseline file and
+the command exits non-zero if throughput dropped by more than
+``--max-regression``.
+"""
+import argparse
+import difflib
+import glob
+import itertools
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+from benchmarks.corpus import VARIANTS, SyntheticDocument, generate_document
+from src import constants, tesseract_pool
+from src.ocr_engine import (
+    extract_pages_from_pdf, normalize_extracted_pages, SOURCE_OCR, SOURCE_TEXT_LAYER, SOURCE_FAILED
+)
+
+DEFAULT_PAGE_COUNTS = (1, 10, 50)
+SAMPLE_INTERVAL_SECONDS = 0.02
+SCHEMA_VERSION = 2
+
+
+@dataclass(frozen=True)
+class EngineConfig:
+    """OCR engine settings one benchmark run is measured under."""
+
+    workers: int = constants.OCR_WORKERS
+    adaptive_dpi: bool = constants.OCR_ADAPTIVE_DPI
+    worker_pool: bool = constants.OCR_USE_WORKER_POOL
+    text_layer: bool = True
+
+    @property
+    def name(self) -> str:
+        """Short label, e.g. "w4/adaptive/pool/text"."""
+        return "/".join((
+            f"w{self.workers}",
+            "adaptive" if self.adaptive_dpi else "fixed",
+            "pool" if self.worker_pool else "pytesseract",
+            "text" if self.text_layer else "ocr-only",
+        ))
+
+    @contextmanager
+    def applied(self) -> Iterator[None]:
+        """Select the Tesseract backend for the duration of a run."""
+        previous = tesseract_pool.OCR_USE_WORKER_POOL
+        tesseract_pool.OCR_USE_WORKER_POOL = self.worker_pool
+        try:
+            yield
+        finally:
+            tesseract_pool.OCR_USE_WORKER_POOL = previous
+
+    def extract(self, document: SyntheticDocument) -> List:
+        """Run the OCR stage on a document with these settings."""
+        with self.applied():
+            return extract_pages_from_pdf(
+                document.pdf,
+                max_pages=len(document.pages),
+                workers=self.workers,
+                use_text_layer=self.text_layer,
+                adaptive_dpi=self.adaptive_dpi
+            )
+
+
+def config_matrix(
+    workers: List[int], adaptive_dpi: List[bool], worker_pool: List[bool], text_layer: List[bool]
+) -> List[EngineConfig]:
+    """Every combination of the given engine settings."""
+    return [
+        EngineConfig(*values) for values in itertools.product(workers, adaptive_dpi, worker_pool, text_layer)
+    ]
+
+
+class PeakRSSSampler:
+    """Track the peak resident memory of this process and all of its children.
+
+    OCR runs in poppler and Tesseract child processes, so the parent's own
+    ru_maxrss would miss most of the memory. /proc is sampled in a background
+    thread; on systems without /proc the parent's ru_maxrss is reported.
+    """
+
+    def __init__(self):
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "PeakRSSSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        if not os.path.exists("/proc/self/status"):
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            scale = 1 if sys.platform == "darwin" else 1024
+            self.peak_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, _tree_rss_bytes(os.getpid()))
+            self._stop.wait(SAMPLE_INTERVAL_SECONDS)
+
+
+def _tree_rss_bytes(pid: int) -> int:
+    """Resident memory of a process plus all of its descendants (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            match = re.search(r"^VmRSS:\s+(\d+) kB", f.read(), re.MULTILINE)
+        total = int(match.group(1)) * 1024 if match else 0
+        children = []
+        for path in glob.glob(f"/proc/{pid}/task/*/children"):
+            with open(path) as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        # The process exited while it was being sampled
+        return 0
+    return total + sum(_tree_rss_bytes(child) for child in children)
+
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile (None for an empty list)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def char_accuracy(expected: str, actual: str) -> float:
+    """Share of ground truth characters recovered, in order (whitespace-insensitive)."""
+    expected, actual = _normalize(expected), _normalize(actual)
+    if not expected:
+        return 1.0
+    matcher = difflib.SequenceMatcher(None, expected, actual, autojunk=False)
+    return sum(block.size for block in matcher.get_matching_blocks()) / len(expected)
+
+
+def run_document(document: SyntheticDocument, repeat: int = 1, config: EngineConfig = EngineConfig()) -> Dict:
+    """Benchmark the OCR stage on one document.
+
+    Args:
+        document: Generated document with its ground truth
+        repeat: Number of timed runs (wall time is the median of these)
+        config: Engine settings to run with
+
+    Returns:
+        Machine-readable record of throughput, latency, memory and accuracy
+    """
+    walls = []
+    latencies: List[float] = []
+    peak_bytes = 0
+    pages = []
+    for _ in range(repeat):
+        with PeakRSSSampler() as sampler:
+            started = time.perf_counter()
+            pages = config.extract(document)
+            walls.append(time.perf_counter() - started)
+        peak_bytes = max(peak_bytes, sampler.peak_bytes)
+        latencies.extend(sum(page.timings.values()) for page in pages)
+
+    wall = sorted(walls)[len(walls) // 2]
+    accuracies = [char_accuracy(expected, page.text) for expected, page in zip(document.pages, pages)]
+    _, normalization = normalize_extracted_pages(pages)
+    return {
+        "config": config.name,
+        "engine": asdict(config),
+        "document": document.name,
+        "variant": document.variant,
+        "pages": len(document.pages),
+        "pdf_bytes": len(document.pdf),
+        "wall_seconds": round(wall, 4),
+        "pages_per_second": round(len(document.pages) / wall, 3) if wall else None,
+        "latency_p50_seconds": _round(_percentile(latencies, 50)),
+        "latency_p95_seconds": _round(_percentile(latencies, 95)),
+        "peak_rss_mb": round(peak_bytes / (1024 * 1024), 1),
+        "char_accuracy": round(sum(accuracies) / len(accuracies), 4) if accuracies else None,
+        "text_layer_pages": sum(page.source == SOURCE_TEXT_LAYER for page in pages),
+        "ocr_pages": sum(page.source == SOURCE_OCR for page in pages),
+        "failed_pages": sum(page.source == SOURCE_FAILED for page in pages),
+        "chars_extracted": normalization.chars_before,
+        "chars_normalized": normalization.chars_after,
+        "noise_words": normalization.noise_words,
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> Dict:
+    """Describe the host and OCR settings the results were measured under."""
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ocr_dpi": constants.OCR_DPI,
+        "ocr_workers": constants.OCR_WORKERS,
+        "ocr_chunk_size": constants.OCR_CHUNK_SIZE,
+        "ocr_adaptive_dpi": constants.OCR_ADAPTIVE_DPI,
+        "ocr_use_worker_pool": constants.OCR_USE_WORKER_POOL,
+    }
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Compare two result documents.
+
+    Args:
+        results: Fresh benchmark output
+        baseline: Earlier benchmark output
+        max_regression: Allowed relative drop in pages/sec (0.1 = 10%)
+
+    Returns:
+        Descriptions of every configuration that regressed beyond the threshold
+    """
+    # Schema 1 baselines were measured with the default engine settings only
+    default = EngineConfig().name
+    previous = {
+        (record.get("config", default), record["variant"], record["pages"]): record for record in baseline["results"]
+    }
+    regressions = []
+    print(f"{'config':<48} {'pages/s':>16} {'p95 s':>16} {'accuracy':>16}", file=sys.stderr)
+    for record in results["results"]:
+        old = previous.get((record["config"], record["variant"], record["pages"]))
+        if old is None:
+            continue
+        config = f"{record['config']} {record['variant']}/{record['pages']}p"
+        print(
+            f"{config:<48} "
+            f"{_delta(old['pages_per_second'], record['pages_per_second']):>16} "
+            f"{_delta(old['latency_p95_seconds'], record['latency_p95_seconds']):>16} "
+            f"{_delta(old['char_accuracy'], record['char_accuracy']):>16}",
+            file=sys.stderr
+        )
+        if old["pages_per_second"] and record["pages_per_second"] is not None:
+            drop = 1 - record["pages_per_second"] / old["pages_per_second"]
+            if drop > max_regression:
+                regressions.append(f"{config}: pages/sec down {drop:.0%}")
+    return regressions
+
+
+def _delta(old: Optional[float], new: Optional[float]) -> str:
+    if old is None or new is None:
+        return "n/a"
+    change = f" ({(new - old) / old:+.0%})" if old else ""
+    return f"{new:g}{change}"
+
+
+def _on_off(value: bool) -> str:
+    return "on" if value else "off"
+
+
+def _parse_switches(values: str) -> List[bool]:
+    """Parse "on", "off" or "on,off" into booleans."""
+    switches = {"on": True, "off": False}
+    parsed = [value.strip().lower() for value in values.split(",") if value.strip()]
+    unknown = [value for value in parsed if value not in switches]
+    if unknown or not parsed:
+        raise ValueError(f"expected on and/or off, got {values!r}")
+    return [switches[value] for value in dict.fromkeys(parsed)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="Comma-separated corpus variants")
+    parser.add_argument(
+        "--pages", default=",".join(map(str, DEFAULT_PAGE_COUNTS)),
+        help=f"Comma-separated page counts (1-{constants.MAX_PDF_PAGES})"
+    )
+    parser.add_argument(
+        "--workers", default=str(constants.OCR_WORKERS), help="Comma-separated OCR worker counts"
+    )
+    parser.add_argument(
+        "--adaptive-dpi", default=_on_off(constants.OCR_ADAPTIVE_DPI), help="Adaptive DPI: on, off or on,off"
+    )
+    parser.add_argument(
+        "--worker-pool", default=_on_off(constants.OCR_USE_WORKER_POOL),
+        help="libtesseract worker pool (off: pytesseract): on, off or on,off"
+    )
+    parser.add_argument("--text-layer", default="on", help="Text layer fast path: on, off or on,off")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per document")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--save-corpus", metavar="DIR", help="Also write the generated PDFs to DIR")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against an earlier JSON result")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="Allowed pages/sec drop for --compare")
+    args = parser.parse_args(argv)
+
+    variants = [variant.strip() for variant in args.variants.split(",") if variant.strip()]
+    page_counts = [int(count) for count in args.pages.split(",")]
+    if any(count < 1 or count > constants.MAX_PDF_PAGES for count in page_counts):
+        parser.error(f"page counts must be between 1 and {constants.MAX_PDF_PAGES}")
+    try:
+        configs = config_matrix(
+            [int(count) for count in args.workers.split(",")],
+            _parse_switches(args.adaptive_dpi),
+            _parse_switches(args.worker_pool),
+            _parse_switches(args.text_layer),
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if any(config.workers < 1 for config in configs):
+        parser.error("worker counts must be at least 1")
+
+    # Untimed warm-up: starts the Tesseract worker pool and loads the language model
+    extract_pages_from_pdf(generate_document("clean", 1, args.seed).pdf)
+
+    records = []
+    for variant in variants:
+        for page_count in page_counts:
+            document = generate_document(variant, page_count, args.seed)
+            if args.save_corpus:
+                os.makedirs(args.save_corpus, exist_ok=True)
+                with open(os.path.join(args.save_corpus, f"{document.name}.pdf"), "wb") as f:
+                    f.write(document.pdf)
+            for config in configs:
+                record = run_document(document, repeat=args.repeat, config=config)
+                print(
+                    f"{config.name} {document.name}: {record['pages_per_second']} pages/s, "
+                    f"p95 {record['latency_p95_seconds']}s, {record['peak_rss_mb']} MB, "
+                    f"accuracy {record['char_accuracy']}",
+                    file=sys.stderr
+                )
+                records.append(record)
+
+    # Read the baseline first: it may be the same file as --output
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {"schema": SCHEMA_VERSION, "environment": environment(), "results": records}
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Micro-benchmark: GCRA RateLimiter against the previous timestamp-list limiter.
+
+Measures the cost of an ``is_allowed`` call and the memory held after many
+distinct users, on a simulated clock so runs are fast and repeatable. Run
+from the repository root:
+
+    python -m benchmarks.rate_limiter_benchmark
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.rate_limiter import RateLimiter
+
+
+class LegacyRateLimiter:
+    """The previous implementation: one list of request timestamps per user, never evicted."""
+
+    def __init__(self, max_requests: int = 10, window_seconds: int = 60, clock: Callable[[], float] = time.time):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.requests: Dict[str, List[float]] = defaultdict(list)
+        self._clock = clock
+
+    def is_allowed(self, user_id: str) -> Tuple[bool, int]:
+        now = self._clock()
+        user_requests = self.requests[user_id]
+        user_requests[:] = [req_time for req_time in user_requests if now - req_time < self.window_seconds]
+        if len(user_requests) >= self.max_requests:
+            return False, int(self.window_seconds - (now - min(user_requests)))
+        user_requests.append(now)
+        return True, 0
+
+
+class SimulatedClock:
+    """Clock that advances a fixed step on every reading."""
+
+    def __init__(self, step: float):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self) -> float:
+        self.now += self.step
+        return self.now
+
+
+def _time_calls(limiter, user_ids: List[str]) -> float:
+    """Mean seconds per is_allowed call over the given sequence of users."""
+    started = time.perf_counter()
+    for user_id in user_ids:
+        limiter.is_allowed(user_id)
+    return (time.perf_counter() - started) / len(user_ids)
+
+
+def _held_bytes(build: Callable[[], object], user_ids: List[str]) -> int:
+    """Memory still allocated by a limiter after serving the given users."""
+    tracemalloc.start()
+    limiter = build()
+    for user_id in user_ids:
+        limiter.is_allowed(user_id)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+def run(calls: int, users: int, max_requests: int, window_seconds: int) -> Dict:
+    """Benchmark both limiters on the same workloads.
+
+    Workloads:
+        hot_key: every call from one user that is over the limit most of the time
+        many_users: ``users`` distinct users with one request each, ten per simulated second
+
+    Returns:
+        Machine-readable results per implementation
+    """
+    implementations = {
+        "legacy": lambda clock: LegacyRateLimiter(max_requests, window_seconds, clock=clock),
+        "gcra": lambda clock: RateLimiter(max_requests, window_seconds, clock=clock),
+    }
+    hot = ["hot@example.com"] * calls
+    many = [f"user{index}@example.com" for index in range(users)]
+
+    results = {}
+    for name, build in implementations.items():
+        limiter = build(SimulatedClock(0.001))
+        hot_seconds = _time_calls(limiter, hot)
+        many_seconds = _time_calls(build(SimulatedClock(0.1)), many)
+        results[name] = {
+            "hot_key_ns_per_call": round(hot_seconds * 1e9),
+            "many_users_ns_per_call": round(many_seconds * 1e9),
+            "many_users_held_kb": round(_held_bytes(lambda: build(SimulatedClock(0.1)), many) / 1024, 1),
+        }
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000, help="Calls in the hot-key workload")
+    parser.add_argument("--users", type=int, default=100_000, help="Distinct users in the many-users workload")
+    parser.add_argument("--max-requests", type=int, default=5)
+    parser.add_argument("--window", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    results = run(args.calls, args.users, args.max_requests, args.window)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
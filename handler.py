@@ -2,6 +2,28 @@ import json
 import os
 import base64
 
+_rate_limiter = None
+
+
+def _get_rate_limiter():
+    """Per-caller limit on /generate, shared across Lambda instances when the database is configured."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        from src.constants import RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW
+        from src.rate_limiter import RateLimiter, create_backend
+
+        _rate_limiter = RateLimiter(
+            max_requests=RATE_LIMIT_REQUESTS,
+            window_seconds=RATE_LIMIT_WINDOW,
+            backend=create_backend(
+                os.environ.get("SUPABASE_URL"),
+                os.environ.get("SUPABASE_SERVICE_KEY"),
+                os.environ.get("POSTGREST_URL")
+            ),
+            name="api-generate"
+        )
+    return _rate_limiter
+
 
 def lambda_handler(event, context):
     """
@@ -9,6 +31,7 @@ def lambda_handler(event, context):
     Supports:
       GET  /health
       POST /generate  { "denial_text": "...", "advocate_details": {...} }
+      POST /stripe/webhook  (Stripe-signed event)
     """
     try:
         # Determine path and method (HTTP API v2)
@@ -34,8 +57,10 @@ def lambda_handler(event, context):
 
         # ---- Generate endpoint ----
         if path == "/generate" and method == "POST":
-            # Import Groq directly (no pytesseract dependency)
-            from groq import Groq
+            # The shared Groq client survives across warm invocations (no pytesseract dependency)
+            from src.constants import MAX_CONTEXT_LENGTH
+            from src.letter_template import build_letter
+            from src.llm_engine import CloudLLM
 
             api_key = os.environ.get("GROQ_API_KEY")
             if not api_key:
@@ -45,6 +70,16 @@ def lambda_handler(event, context):
                     "body": json.dumps({"error": "GROQ_API_KEY not set in environment"}),
                 }
 
+            # The API has no user identity, so callers are limited by source IP
+            caller = event.get("requestContext", {}).get("http", {}).get("sourceIp", "unknown")
+            allowed, reset_seconds = _get_rate_limiter().is_allowed(caller)
+            if not allowed:
+                return {
+                    "statusCode": 429,
+                    "headers": {"Content-Type": "application/json", "Retry-After": str(reset_seconds)},
+                    "body": json.dumps({"error": f"Rate limit exceeded. Retry in {reset_seconds} seconds."}),
+                }
+
             # Decode request body
             raw_body = event.get("body") or "{}"
             if event.get("isBase64Encoded"):
@@ -59,56 +94,56 @@ def lambda_handler(event, context):
                     "body": json.dumps({"error": "denial_text is required"}),
                 }
 
-            # Get advocate details (optional)
-            advocate_details = data.get("advocate_details", {})
-            name = advocate_details.get("name", "[Your Name]")
-            title = advocate_details.get("title", "Medical Billing Advocate")
-            address = advocate_details.get("address", "[Your Address]")
-
-            # Build the prompt
-            prompt = f"""
-            You are {name}, a {title}. Write a formal insurance appeal letter.
-            
-            YOUR DETAILS (The Sender):
-            Name: {name}
-            Title: {title}
-            Address: {address}
-            
-            DENIAL CONTEXT:
-            {denial_text[:6000]}
-            
-            RULES:
-            1. HEADER: Start the letter with your details exactly as provided above.
-               Format:
-               {name}
-               {title}
-               {address}
-               Date: (Insert Today's Date)
-
-            2. DO NOT include labels like "[Your Name]" or placeholders like "[City, State, ZIP]". 
-               If a piece of information (like City/State) is missing in the Address provided, do not fake it or add a placeholder.
-            3. Argue specifically against the denial reason found in the text.
-            4. Do not invent diagnoses (No Hallucinations).
-            5. Sign the letter with {name}.
-            """
-
-            # Call Groq API
-            client = Groq(api_key=api_key)
-            chat_completion = client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are a helpful medical assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                model="llama-3.1-8b-instant",
-                temperature=0.1,
-            )
-
-            appeal_text = chat_completion.choices[0].message.content
+            # Same prompt template and model as the Streamlit pipeline; the LLM
+            # writes the body, header and signature are rendered locally
+            advocate_details = data.get("advocate_details") or {}
+            llm = CloudLLM(api_key)
+            body = llm.draft_appeal(f"DENIAL LETTER CONTENT:\n{denial_text[:MAX_CONTEXT_LENGTH]}", advocate_details)
+            appeal_text = build_letter(advocate_details).render(body)
 
             return {
                 "statusCode": 200,
                 "headers": {"Content-Type": "application/json"},
-                "body": json.dumps({"appeal": appeal_text}),
+                "body": json.dumps({"appeal": appeal_text, "model": llm.model, "prompt_version": llm.prompt.id}),
+            }
+
+        # ---- Stripe webhook ----
+        if path == "/stripe/webhook" and method == "POST":
+            from src.clients import get_stripe_client
+            from src.entitlements import EntitlementStore
+            from src.stripe_webhooks import handle_webhook, stripe_customer_email_lookup
+
+            secret = os.environ.get("STRIPE_WEBHOOK_SECRET")
+            service_key = os.environ.get("SUPABASE_SERVICE_KEY")
+            supabase_url = os.environ.get("SUPABASE_URL")
+            postgrest_url = os.environ.get("POSTGREST_URL")
+            stripe_api_key = os.environ.get("STRIPE_API_KEY")
+            if not (secret and service_key and stripe_api_key and (supabase_url or postgrest_url)):
+                return {
+                    "statusCode": 500,
+                    "headers": {"Content-Type": "application/json"},
+                    "body": json.dumps({"error": "Stripe webhook is not configured"}),
+                }
+
+            # The signature covers the exact bytes Stripe sent
+            raw_body = event.get("body") or ""
+            if event.get("isBase64Encoded"):
+                payload = base64.b64decode(raw_body)
+            else:
+                payload = raw_body.encode("utf-8")
+            headers = {name.lower(): value for name, value in (event.get("headers") or {}).items()}
+
+            status_code, body = handle_webhook(
+                payload,
+                headers.get("stripe-signature"),
+                secret,
+                EntitlementStore.connect(supabase_url, service_key, postgrest_url),
+                stripe_customer_email_lookup(get_stripe_client(stripe_api_key))
+            )
+            return {
+                "statusCode": status_code,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps(body),
             }
 
         # ---- Fallback: unknown route ----
@@ -0,0 +1,51 @@
+"""Check that the shared rate limit holds across processes, against the local stand-in.
+
+Several "replicas" (separate RateLimiter instances with their own clients)
+hammer the same user from many threads at once; exactly max_requests checks
+must pass. Start the stand-in first:
+
+    docker compose -f infra/local/docker-compose.yml up -d
+    PYTHONPATH=. python infra/local/check_rate_limits.py
+"""
+import argparse
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from postgrest import SyncPostgrestClient
+
+from src.rate_limiter import PostgresBackend, RateLimiter
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--postgrest-url", default="http://localhost:54321", help="Local PostgREST URL")
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--checks", type=int, default=100, help="Checks per replica")
+    parser.add_argument("--max-requests", type=int, default=5)
+    args = parser.parse_args()
+
+    limiters = [
+        RateLimiter(
+            max_requests=args.max_requests,
+            window_seconds=60,
+            backend=PostgresBackend(SyncPostgrestClient(args.postgrest_url)),
+            name="local-check"
+        )
+        for _ in range(args.replicas)
+    ]
+    user = f"{uuid.uuid4().hex}@example.com"
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        outcomes = list(pool.map(
+            lambda index: limiters[index % args.replicas].is_allowed(user)[0],
+            range(args.replicas * args.checks)
+        ))
+
+    allowed = sum(outcomes)
+    remaining = limiters[0].get_remaining_requests(user)
+    print(f"{allowed} of {len(outcomes)} checks allowed (expected {args.max_requests}); {remaining} remaining")
+    return 0 if allowed == args.max_requests and remaining == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
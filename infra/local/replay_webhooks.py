@@ -0,0 +1,79 @@
+"""Replay recorded Stripe webhook events against the local entitlement table.
+
+Signs every fixture in webhook_events/ with a local secret, sends it through
+handler.lambda_handler as an API Gateway HTTP API event, and prints the
+resulting row and paywall decision. Start the stand-in first:
+
+    docker compose -f infra/local/docker-compose.yml up -d
+    PYTHONPATH=. python infra/local/replay_webhooks.py
+"""
+import argparse
+import base64
+import glob
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LOCAL_SECRET = "whsec_local_replay"
+
+
+def sign(payload: bytes, secret: str, timestamp: int) -> str:
+    """Build a Stripe-Signature header value for a payload."""
+    signed = f"{timestamp}.".encode("utf-8") + payload
+    digest = hmac.new(secret.encode("utf-8"), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def api_gateway_event(payload: bytes, signature: str) -> dict:
+    """Wrap a webhook body like API Gateway (payload format 2.0) does."""
+    return {
+        "rawPath": "/stripe/webhook",
+        "requestContext": {"http": {"method": "POST", "path": "/stripe/webhook"}},
+        "headers": {"content-type": "application/json", "stripe-signature": signature},
+        "body": base64.b64encode(payload).decode("ascii"),
+        "isBase64Encoded": True,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--postgrest-url", default="http://localhost:54321", help="Local PostgREST URL")
+    parser.add_argument("--events", default=os.path.join(HERE, "webhook_events"), help="Fixture directory")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "STRIPE_WEBHOOK_SECRET": LOCAL_SECRET,
+        "SUPABASE_SERVICE_KEY": "local",
+        "STRIPE_API_KEY": os.environ.get("STRIPE_API_KEY", "sk_test_local"),
+        "POSTGREST_URL": args.postgrest_url,
+    })
+
+    from handler import lambda_handler
+    from src.entitlements import EntitlementStore, entitlement_from_record
+
+    store = EntitlementStore.connect("", "local", args.postgrest_url)
+    failures = 0
+    for path in sorted(glob.glob(os.path.join(args.events, "*.json"))):
+        with open(path, "rb") as f:
+            payload = f.read()
+        response = lambda_handler(api_gateway_event(payload, sign(payload, LOCAL_SECRET, int(time.time()))), None)
+        print(f"{os.path.basename(path)}: {response['statusCode']} {response['body']}")
+        failures += response["statusCode"] != 200
+
+        event = json.loads(payload)
+        customer_id = event["data"]["object"].get("customer")
+        record = store.find_by_customer(customer_id) if customer_id else None
+        if record:
+            entitlement = entitlement_from_record(record, now=event["created"])
+            print(f"  row: {record}")
+            print(f"  access at event time: {entitlement.active}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+-- Roles that exist on Supabase and are referenced by entitlements.sql.
+create role anon nologin;
+create role authenticated nologin;
+create role service_role nologin bypassrls;
+create role authenticator login password 'authenticator' noinherit;
+grant anon, authenticated, service_role to authenticator;
+grant usage on schema public to anon, authenticated, service_role;
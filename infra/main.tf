@@ -81,6 +81,8 @@ resource "aws_lambda_function" "api" {
       SUPABASE_KEY        = var.supabase_key
       STRIPE_API_KEY      = var.stripe_api_key
       GROQ_API_KEY        = var.groq_api_key
+      SUPABASE_SERVICE_KEY  = var.supabase_service_key
+      STRIPE_WEBHOOK_SECRET = var.stripe_webhook_secret
       STRIPE_PAYMENT_LINK = "https://buy.stripe.com/test_14AeVfdef2bk7YJ248bAs00"
     }
   }
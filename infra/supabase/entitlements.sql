@@ -0,0 +1,33 @@
+-- Subscription entitlements, maintained by the Stripe webhook (POST /stripe/webhook).
+-- The Streamlit paywall reads one row by primary key per cache miss.
+create table if not exists public.entitlements (
+    email           text primary key,
+    customer_id     text,
+    subscription_id text,       -- subscription the status belongs to
+    status          text,
+    period_end      bigint,     -- Unix seconds, end of the current billing period
+    last_event_at   bigint,     -- created time of the last applied Stripe event
+    updated_at      timestamptz not null default now()
+);
+
+-- Tables created before subscriptions were tracked
+alter table public.entitlements add column if not exists subscription_id text;
+
+create index if not exists entitlements_customer_id_idx on public.entitlements (customer_id);
+
+create or replace function public.entitlements_touch() returns trigger
+language plpgsql as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists entitlements_touch on public.entitlements;
+create trigger entitlements_touch before update on public.entitlements
+    for each row execute function public.entitlements_touch();
+
+-- Only the service role (webhook handler and app server) may read or write.
+alter table public.entitlements enable row level security;
+revoke all on public.entitlements from anon, authenticated;
+grant select, insert, update on public.entitlements to service_role;
@@ -0,0 +1,67 @@
+-- Shared rate limit state (GCRA), used by src/rate_limiter.PostgresBackend.
+-- One row per limited key holding its theoretical arrival time (TAT).
+create table if not exists public.rate_limits (
+    key text primary key,
+    tat double precision not null  -- Unix seconds
+);
+
+-- Counts one request against p_key if its allowance permits; one round trip per check.
+-- p_interval is what the request adds to the TAT (cost x emission interval). A request
+-- bigger than the whole allowance is let through when the key is idle.
+create or replace function public.rate_limit_check(p_key text, p_interval double precision, p_window double precision)
+returns table (allowed boolean, retry_after double precision)
+language plpgsql as $$
+declare
+    v_now double precision := extract(epoch from clock_timestamp());
+    v_tat double precision;
+begin
+    -- The upsert locks the row, serializing concurrent checks of the same key
+    insert into public.rate_limits as r (key, tat) values (p_key, v_now)
+    on conflict (key) do update set tat = greatest(r.tat, v_now)
+    returning r.tat into v_tat;
+
+    if v_tat + least(p_interval, p_window) - p_window > v_now then
+        return query select false, v_tat + least(p_interval, p_window) - p_window - v_now;
+    else
+        update public.rate_limits set tat = v_tat + p_interval where key = p_key;
+        return query select true, 0::double precision;
+    end if;
+
+    -- (return query only queues the result row; execution continues here)
+    -- Occasionally drop keys whose allowance has fully refilled
+    if random() < 0.01 then
+        delete from public.rate_limits where key in (
+            select key from public.rate_limits where tat < v_now limit 100 for update skip locked
+        );
+    end if;
+end;
+$$;
+
+-- Moves p_key's TAT by p_delta seconds: settles a reservation against the actual cost
+-- (negative p_delta refunds allowance).
+create or replace function public.rate_limit_adjust(p_key text, p_delta double precision)
+returns void
+language sql as $$
+    insert into public.rate_limits as r (key, tat)
+    values (p_key, extract(epoch from clock_timestamp()) + p_delta)
+    on conflict (key) do update
+        set tat = greatest(r.tat, extract(epoch from clock_timestamp())) + p_delta;
+$$;
+
+-- Seconds p_key's TAT is ahead of now (0 for a full allowance).
+create or replace function public.rate_limit_backlog(p_key text)
+returns double precision
+language sql stable as $$
+    select coalesce(max(greatest(tat - extract(epoch from clock_timestamp()), 0)), 0)
+    from public.rate_limits where key = p_key;
+$$;
+
+alter table public.rate_limits enable row level security;
+revoke all on public.rate_limits from anon, authenticated;
+grant select, insert, update, delete on public.rate_limits to service_role;
+revoke execute on function public.rate_limit_check(text, double precision, double precision) from public, anon, authenticated;
+revoke execute on function public.rate_limit_backlog(text) from public, anon, authenticated;
+revoke execute on function public.rate_limit_adjust(text, double precision) from public, anon, authenticated;
+grant execute on function public.rate_limit_check(text, double precision, double precision) to service_role;
+grant execute on function public.rate_limit_backlog(text) to service_role;
+grant execute on function public.rate_limit_adjust(text, double precision) to service_role;
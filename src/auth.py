@@ -3,10 +3,17 @@ import time
 import re
 import string
 from functools import wraps
-from supabase import create_client, Client
 import stripe
 
+from src.clients import (
+    STRIPE, get_stripe_client, get_supabase_client, create_isolated_supabase_client, invalidate_client
+)
 from src.config import AppConfig
+from src.entitlements import (
+    EntitlementStore, fetch_stored_entitlement, fetch_stripe_entitlement, get_entitlement_cache
+)
+from src.quotas import TRIAL_PLAN, plan_for_status
+from src.constants import QUOTA_DEFAULT_PLAN
 from src.styles import get_landing_page_styles
 
 def handle_auth_errors(func):
@@ -25,11 +32,19 @@ def handle_auth_errors(func):
     return wrapper
 
 
-def init_services():
-    """Initialize Supabase and Stripe services using centralized config.
+def init_services(isolated=False):
+    """Get the Supabase and Stripe clients using centralized config.
+    
+    The clients are shared by the whole process (see src.clients), so no
+    client construction or TLS handshake happens on a normal rerun.
+    
+    Args:
+        isolated: Return a private Supabase client instead of the shared one.
+            Sign-in and sign-up store the user's session on the client they
+            run on, so they must never use the shared client.
     
     Returns:
-        tuple: (supabase_client, stripe_module) or (None, None) if config incomplete
+        tuple: (supabase_client, stripe_client) or (None, None) if config incomplete
     """
     config = AppConfig.from_secrets()
     
@@ -39,14 +54,32 @@ def init_services():
         return None, None
 
     try:
-        supabase: Client = create_client(config.supabase_url, config.supabase_key)
+        if isolated:
+            supabase = create_isolated_supabase_client(config.supabase_url, config.supabase_key)
+        else:
+            supabase = get_supabase_client(config.supabase_url, config.supabase_key)
     except Exception as e:
         st.warning(f"⚠️ Auth Error: Invalid Supabase Credentials. ({str(e)})")
         print(f"Supabase Init Error: {e}")
         return None, None
 
-    stripe.api_key = config.stripe_api_key
-    return supabase, stripe
+    return supabase, get_stripe_client(config.stripe_api_key)
+
+
+def get_entitlement_store():
+    """Return the webhook-maintained entitlement table, or None if it is not configured.
+    
+    Reading the table needs the Supabase service role key (SUPABASE_SERVICE_KEY).
+    """
+    config = AppConfig.from_secrets()
+    if not (config.is_auth_enabled() and config.supabase_service_key):
+        return None
+    return EntitlementStore.connect(config.supabase_url, config.supabase_service_key)
+
+def _report_stripe_error(error):
+    """Rebuild the shared Stripe client on the next request after a connection failure."""
+    if isinstance(error, stripe.APIConnectionError):
+        invalidate_client(STRIPE, AppConfig.from_secrets().stripe_api_key)
 
 def landing_page_css():
     """Apply landing page CSS styles using shared styles module."""
@@ -85,7 +118,7 @@ def format_error_message(e):
 
 @st.dialog("Log In")
 def login_dialog():
-    supabase, _ = init_services()
+    supabase, _ = init_services(isolated=True)
     import types
     
     email = st.text_input("Email", key="login_email").strip()
@@ -117,7 +150,7 @@ def login_dialog():
 
 @st.dialog("Start Free Trial")
 def signup_dialog():
-    supabase, _ = init_services()
+    supabase, _ = init_services(isolated=True)
     
     st.markdown("Create an account to start your **7-day free trial**.")
     new_email = st.text_input("Email Address", key="signup_email").strip()
@@ -252,46 +285,86 @@ def create_portal_session(user_email):
         return "https://billing.stripe.com/p/login/example"
         
     try:
-        customers = stripe.Customer.list(email=user_email)
-        if not customers.data:
-            return None
+        store = get_entitlement_store()
+        record = store.get(user_email) if store else None
+        if record and record.get("customer_id"):
+            customer_id = record["customer_id"]
+        else:
+            customers = stripe_client.v1.customers.list({"email": user_email})
+            if not customers.data:
+                return None
+            customer_id = customers.data[0].id
             
-        customer_id = customers.data[0].id
-        session = stripe.billing_portal.Session.create(
-            customer=customer_id,
-            return_url=st.secrets.get("STRIPE_PAYMENT_LINK", "http://localhost:8501") # Fallback
-        )
+        config = AppConfig.from_secrets()
+        if config.app_url:
+            # The billing query parameter makes the app re-check the subscription on return
+            return_url = f"{config.app_url}?billing=portal"
+        else:
+            return_url = st.secrets.get("STRIPE_PAYMENT_LINK", "http://localhost:8501") # Fallback
+        session = stripe_client.v1.billing_portal.sessions.create({
+            "customer": customer_id,
+            "return_url": return_url
+        })
         return session.url
     except Exception as e:
+        _report_stripe_error(e)
         print(f"Portal Error: {e}")
         return None
 
-def check_subscription(user_email):
-    """Checks if the user has an active Stripe subscription."""
+def _get_entitlement(user_email):
+    """Return the user's cached Entitlement, or None in dev mode (no Stripe key).
+    
+    Answers come from the process-wide entitlement cache. When it has
+    expired, the webhook-maintained entitlement table is read (one indexed
+    lookup); Stripe itself is only queried, with a single request, for users
+    missing from the table or when the table is not configured.
+    """
     _, stripe_client = init_services()
     
     if not stripe_client:
-        return True # Dev mode: allow if no keys
-        
-    try:
-        # Search for customer
-        customers = stripe.Customer.list(email=user_email)
-        if not customers.data:
-            return False # No customer found = No sub
-
-        customer_id = customers.data[0].id
-        
-        # Check active subscriptions
-        subscriptions = stripe.Subscription.list(customer=customer_id, status='active')
+        return None
         
-        # Also check trialing
-        trials = stripe.Subscription.list(customer=customer_id, status='trialing')
+    def fetch_from_stripe(email):
+        return fetch_stripe_entitlement(stripe_client, email)
+    
+    store = get_entitlement_store()
+    if store:
+        def fetch(email):
+            return fetch_stored_entitlement(store, email, fetch_from_stripe)
+    else:
+        fetch = fetch_from_stripe
         
-        if subscriptions.data or trials.data:
-            return True
-            
-        return False
+    return get_entitlement_cache().get(user_email, fetch)
+
+def check_subscription(user_email):
+    """Checks if the user has an active or trialing Stripe subscription (see _get_entitlement)."""
+    try:
+        entitlement = _get_entitlement(user_email)
+        if entitlement is None:
+            return True # Dev mode: allow if no keys
+        return entitlement.active
         
     except Exception as e:
+        _report_stripe_error(e)
         st.error(f"Billing Error: {e}")
         return False
+
+def subscription_plan(user_email):
+    """Quota plan of the user: 'trial' while their subscription is trialing.
+    
+    Reuses the entitlement cached by check_subscription, so it costs no
+    extra lookup. If billing cannot be reached the trial plan is assumed.
+    """
+    try:
+        entitlement = _get_entitlement(user_email)
+    except Exception as e:
+        _report_stripe_error(e)
+        return TRIAL_PLAN
+    return plan_for_status(entitlement.status) if entitlement else QUOTA_DEFAULT_PLAN
+
+def invalidate_subscription(user_email):
+    """Drop the cached subscription state so the next check asks Stripe again.
+    
+    Called after checkout, on return from the billing portal and on logout.
+    """
+    get_entitlement_cache().invalidate(user_email)
@@ -0,0 +1,222 @@
+"""Process-wide API clients (Groq, Supabase, Stripe).
+
+Building a client sets up a fresh HTTP connection pool, so creating one per
+request pays client construction plus a TLS handshake every time. This
+module keeps one keep-alive client per credential for the life of the
+process. A client that is found closed, fails a health check, or is reported
+broken by a caller is dropped and rebuilt on the next request.
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.constants import CLIENT_MAX_RETRIES, CLIENT_TIMEOUT_SECONDS
+
+GROQ = "groq"
+SUPABASE = "supabase"
+STRIPE = "stripe"
+
+
+@dataclass
+class _Entry:
+    client: Any
+    created_at: float
+    is_alive: Optional[Callable[[Any], bool]] = None
+    probe: Optional[Callable[[Any], None]] = None
+
+
+class ClientRegistry:
+    """Thread-safe cache of clients keyed by service and credential.
+
+    Credentials are only kept as SHA-256 fingerprints in the keys.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "builds": 0, "rebuilds": 0}
+
+    def get(
+        self,
+        service: str,
+        credentials: Tuple[str, ...],
+        factory: Callable[[], Any],
+        is_alive: Optional[Callable[[Any], bool]] = None,
+        probe: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        """Return the cached client for these credentials, building it if needed.
+
+        Args:
+            service: Service name (GROQ, SUPABASE or STRIPE)
+            credentials: Values that identify the client (API key, URL, ...)
+            factory: Builds a new client
+            is_alive: Cheap local check run on every lookup
+            probe: Network health check run by health_check(); raises on failure
+
+        Returns:
+            The shared client
+        """
+        key = (service, _fingerprint(credentials))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.is_alive is not None and not entry.is_alive(entry.client):
+                del self._entries[key]
+                self._stats["rebuilds"] += 1
+                entry = None
+            if entry is None:
+                # Built under the lock so concurrent first requests share one client
+                entry = _Entry(client=factory(), created_at=time.time(), is_alive=is_alive, probe=probe)
+                self._entries[key] = entry
+                self._stats["builds"] += 1
+            else:
+                self._stats["hits"] += 1
+            return entry.client
+
+    def invalidate(self, service: str, credentials: Tuple[str, ...]) -> None:
+        """Drop a client after a connection-level failure; the next get() rebuilds it."""
+        with self._lock:
+            if self._entries.pop((service, _fingerprint(credentials)), None) is not None:
+                self._stats["rebuilds"] += 1
+
+    def health_check(self) -> Dict[str, bool]:
+        """Probe every cached client and drop the ones that fail.
+
+        Returns:
+            Health per service (False if any client of that service failed)
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+
+        health: Dict[str, bool] = {}
+        for key, entry in entries:
+            service = key[0]
+            healthy = True
+            try:
+                if entry.is_alive is not None and not entry.is_alive(entry.client):
+                    healthy = False
+                elif entry.probe is not None:
+                    entry.probe(entry.client)
+            except Exception as e:
+                print(f"Warning: {service} client failed health check: {e}")
+                healthy = False
+            if not healthy:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                        self._stats["rebuilds"] += 1
+            health[service] = health.get(service, True) and healthy
+        return health
+
+    def stats(self) -> Dict:
+        """Return lookup counters and the number of cached clients."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["clients"] = len(self._entries)
+        return stats
+
+
+def _fingerprint(credentials: Tuple[str, ...]) -> str:
+    return hashlib.sha256("\0".join(credentials).encode("utf-8")).hexdigest()
+
+
+_registry = ClientRegistry()
+
+
+def get_registry() -> ClientRegistry:
+    """Return the process-wide client registry."""
+    return _registry
+
+
+def get_groq_client(api_key: str):
+    """Return the shared Groq client for an API key."""
+    def build():
+        from groq import Groq
+        return Groq(api_key=api_key, max_retries=CLIENT_MAX_RETRIES, timeout=CLIENT_TIMEOUT_SECONDS)
+
+    return _registry.get(
+        GROQ, (api_key,), build,
+        is_alive=lambda client: not client.is_closed(),
+        probe=lambda client: client.models.list()
+    )
+
+
+def get_supabase_client(url: str, key: str):
+    """Return the shared Supabase client for a project.
+
+    The shared client must never hold a user session: sign-in and sign-up
+    store the user's tokens on the client they run on, so they use
+    create_isolated_supabase_client instead.
+    """
+    def build():
+        from supabase import create_client
+        from supabase.lib.client_options import SyncClientOptions
+        options = SyncClientOptions(auto_refresh_token=False, persist_session=False)
+        return create_client(url, key, options=options)
+
+    def probe(client) -> None:
+        import httpx
+        httpx.get(
+            f"{url.rstrip('/')}/auth/v1/health", headers={"apikey": key}, timeout=CLIENT_TIMEOUT_SECONDS
+        ).raise_for_status()
+
+    return _registry.get(SUPABASE, (url, key), build, probe=probe)
+
+
+def get_database_client(supabase_url: Optional[str], service_key: str, postgrest_url: Optional[str] = None):
+    """Return a shared client for the app's own tables and database functions.
+
+    Both the Supabase client and a bare PostgREST client offer ``.table()``
+    and ``.rpc()``; the latter serves the local Postgres/PostgREST stand-in.
+
+    Args:
+        supabase_url: Supabase project URL
+        service_key: Supabase service role key
+        postgrest_url: Bare PostgREST URL; overrides supabase_url when set
+
+    Returns:
+        Supabase client or postgrest SyncPostgrestClient
+    """
+    if not postgrest_url:
+        return get_supabase_client(supabase_url, service_key)
+
+    def build():
+        from postgrest import SyncPostgrestClient
+        client = SyncPostgrestClient(postgrest_url, timeout=CLIENT_TIMEOUT_SECONDS)
+        client.auth(service_key)
+        return client
+
+    return _registry.get(SUPABASE, (postgrest_url, service_key), build)
+
+
+def create_isolated_supabase_client(url: str, key: str):
+    """Create a private, unshared Supabase client for flows that log a user in."""
+    from supabase import create_client
+    return create_client(url, key)
+
+
+def get_stripe_client(api_key: str):
+    """Return the shared Stripe client for an API key.
+
+    StripeClient keeps a keep-alive HTTP session per thread, unlike the
+    module-level ``stripe.api_key`` API which is global mutable state.
+    """
+    def build():
+        import stripe
+        return stripe.StripeClient(api_key, max_network_retries=CLIENT_MAX_RETRIES)
+
+    return _registry.get(
+        STRIPE, (api_key,), build,
+        probe=lambda client: client.v1.customers.list({"limit": 1})
+    )
+
+
+def invalidate_client(service: str, *credentials: str) -> None:
+    """Report a connection-level failure so the client is rebuilt on next use.
+
+    Args:
+        service: GROQ, SUPABASE or STRIPE
+        credentials: The same credential values the client was built from
+    """
+    _registry.invalidate(service, tuple(credentials))
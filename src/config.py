@@ -1,23 +1,34 @@
 """Centralized configuration management for MediSync SaaS."""
 import streamlit as st
+from functools import lru_cache
 from typing import Optional
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(frozen=True)
 class AppConfig:
     """Application configuration loaded from Streamlit secrets."""
     
     groq_api_key: str
     supabase_url: Optional[str] = None
     supabase_key: Optional[str] = None
+    supabase_service_key: Optional[str] = None
     stripe_api_key: Optional[str] = None
     stripe_payment_link: Optional[str] = None
+    app_url: Optional[str] = None
+    ocr_cache_dir: Optional[str] = None
+    ocr_cache_key: Optional[str] = None
+    job_workers: Optional[int] = None
+    job_queue_depth: Optional[int] = None
 
     @classmethod
+    @lru_cache(maxsize=1)
     def from_secrets(cls) -> 'AppConfig':
         """Load configuration from Streamlit secrets.
         
+        Secrets are read once per process; the returned object is immutable
+        and shared. Call reload() after changing secrets at runtime.
+        
         Returns:
             AppConfig: Configuration object with all secrets loaded.
         """
@@ -25,13 +36,29 @@ class AppConfig:
             groq_api_key=st.secrets.get("GROQ_API_KEY", ""),
             supabase_url=st.secrets.get("SUPABASE_URL"),
             supabase_key=st.secrets.get("SUPABASE_KEY"),
+            supabase_service_key=st.secrets.get("SUPABASE_SERVICE_KEY"),
             stripe_api_key=st.secrets.get("STRIPE_API_KEY"),
             stripe_payment_link=st.secrets.get(
                 "STRIPE_PAYMENT_LINK",
                 "https://buy.stripe.com/test_14AeVfdef2bk7YJ248bAs00"
-            )
+            ),
+            app_url=st.secrets.get("APP_URL"),
+            ocr_cache_dir=st.secrets.get("OCR_CACHE_DIR"),
+            ocr_cache_key=st.secrets.get("OCR_CACHE_KEY"),
+            job_workers=st.secrets.get("JOB_WORKERS"),
+            job_queue_depth=st.secrets.get("JOB_QUEUE_DEPTH")
         )
 
+    @classmethod
+    def reload(cls) -> 'AppConfig':
+        """Discard the cached configuration and read the secrets again.
+        
+        Returns:
+            AppConfig: Freshly loaded configuration.
+        """
+        cls.from_secrets.cache_clear()
+        return cls.from_secrets()
+
     def is_auth_enabled(self) -> bool:
         """Check if authentication is fully configured.
         
@@ -1,5 +1,6 @@
 """Application-wide constants and configuration values."""
-from typing import Final
+import os
+from typing import Dict, Final, Tuple
 
 # ============================================================================
 # OCR Configuration
@@ -7,17 +8,95 @@ from typing import Final
 OCR_DPI: Final[int] = 200
 """DPI for PDF to image conversion. 200 provides optimal balance of speed/quality."""
 
+OCR_ADAPTIVE_DPI: Final[bool] = False
+"""Render pages at the lowest OCR_DPI_LADDER step and re-render only low-confidence pages."""
+
+OCR_DPI_LADDER: Final[Tuple[int, ...]] = (150, 200, 300)
+"""DPI steps tried in adaptive mode, lowest first."""
+
+OCR_MIN_CONFIDENCE: Final[float] = 75.0
+"""Mean Tesseract word confidence (0-100) below which a page is re-rendered at the next DPI."""
+
+OCR_WORKERS: Final[int] = max(1, os.cpu_count() or 1)
+"""Number of pages OCRed concurrently. Defaults to one worker per CPU core."""
+
+OCR_MAX_CONCURRENT_TASKS: Final[int] = max(1, os.cpu_count() or 1)
+"""Page renders and OCR tasks allowed to run at once across all users (one per core)."""
+
+OCR_MAX_WAITING_TASKS: Final[int] = 64
+"""OCR tasks waiting for a slot above which new appeal requests are rejected."""
+
+OCR_CHUNK_SIZE: Final[int] = 8
+"""Number of pages rendered per pdftoppm call (bounds peak image memory)."""
+
+OCR_RENDER_TIMEOUT_SECONDS: Final[int] = 120
+"""Maximum time a single pdftoppm call may take to render one chunk of pages."""
+
+OCR_USE_WORKER_POOL: Final[bool] = True
+"""OCR through persistent libtesseract workers (falls back to pytesseract if unavailable)."""
+
+OCR_WORKER_MAX_PAGES: Final[int] = 200
+"""Pages a Tesseract worker process handles before it is recycled."""
+
+OCR_WORKER_TIMEOUT_SECONDS: Final[int] = 60
+"""Maximum time a Tesseract worker may spend on one page before it is killed."""
+
+OCR_WORKER_PING_IDLE_SECONDS: Final[int] = 30
+"""Idle time after which a Tesseract worker is pinged before it gets a page (dead or wedged ones are replaced)."""
+
+OCR_WORKER_PING_TIMEOUT_SECONDS: Final[int] = 5
+"""Time a pinged Tesseract worker has to answer before it is treated as wedged."""
+
 OCR_PSM_MODE: Final[str] = '--psm 6'
 """Tesseract Page Segmentation Mode. PSM 6 assumes uniform text block."""
 
+OCR_NOISE_MIN_CONFIDENCE: Final[float] = 40.0
+"""Word confidence (0-100) below which symbol-like OCR words are dropped as stamp/speckle noise (0 disables)."""
+
+TEXT_REPEATED_LINE_MIN_SHARE: Final[float] = 0.5
+"""Share of pages a line must appear on to be removed as a running header/footer (first occurrence is kept)."""
+
 MAX_PDF_PAGES: Final[int] = 50
 """Maximum number of PDF pages to process (prevents abuse and OOM errors)."""
 
+OCR_CACHE_MAX_ENTRIES: Final[int] = 32
+"""Maximum number of OCR results kept in the in-memory cache tier."""
+
+OCR_CACHE_MAX_AGE_SECONDS: Final[int] = 15 * 60
+"""Maximum age of a cached OCR result. Keeps cached PHI within the zero-retention window."""
+
+DENIAL_RECORD_CACHE_MAX_ENTRIES: Final[int] = 256
+"""Maximum number of extracted denial records kept for reuse when an appeal is regenerated."""
+
+TEXT_LAYER_MIN_CHARS: Final[int] = 80
+"""Minimum non-whitespace characters for an embedded text layer to be trusted over OCR."""
+
+TEXT_LAYER_MIN_ALNUM_RATIO: Final[float] = 0.6
+"""Minimum share of letters/digits among non-whitespace characters of a trusted text layer."""
+
+PAGE_TRIAGE_ENABLED: Final[bool] = True
+"""Rank pages by denial signals and send only the most relevant ones to full OCR and the LLM."""
+
+PAGE_TRIAGE_MIN_PAGES: Final[int] = 5
+"""Documents with at most this many pages skip triage and are read front to back."""
+
+PAGE_TRIAGE_DPI: Final[int] = 100
+"""DPI for the low-resolution triage OCR of image-only pages."""
+
 # ============================================================================
 # LLM Configuration
 # ============================================================================
 MAX_CONTEXT_LENGTH: Final[int] = 6000
-"""Maximum context length for LLM prompts (token limit for Groq API)."""
+"""Characters extracted for the LLM before OCR stops (the context is then compressed to MAX_CONTEXT_TOKENS)."""
+
+MAX_CONTEXT_TOKENS: Final[int] = 1200
+"""Token budget of the denial context in the prompt, filled with the most informative spans."""
+
+DENIAL_EVIDENCE_TOKENS: Final[int] = 350
+"""Token budget of the evidence quotes sent to drafting alongside the extracted denial record."""
+
+LLM_EXTRACTION_MAX_TOKENS: Final[int] = 400
+"""Output token cap of the fallback LLM call that extracts denial fields the rules missed."""
 
 LLM_MODEL: Final[str] = "llama-3.1-8b-instant"
 """Default LLM model for appeal generation."""
@@ -25,6 +104,33 @@ LLM_MODEL: Final[str] = "llama-3.1-8b-instant"
 LLM_TEMPERATURE: Final[float] = 0.1
 """Temperature for LLM generation. Lower = more deterministic."""
 
+LLM_BODY_MAX_TOKENS: Final[int] = 900
+"""Output token cap of the appeal body (header and signature are rendered locally)."""
+
+# ============================================================================
+# API Client Configuration
+# ============================================================================
+CLIENT_MAX_RETRIES: Final[int] = 2
+"""Retries for transient network errors in the shared Groq and Stripe clients."""
+
+CLIENT_TIMEOUT_SECONDS: Final[int] = 60
+"""Request timeout of the shared API clients."""
+
+# ============================================================================
+# Background Job Configuration
+# ============================================================================
+JOB_WORKERS: Final[int] = 2
+"""Appeal jobs run at the same time (each one OCRs with up to OCR_WORKERS threads)."""
+
+JOB_QUEUE_DEPTH: Final[int] = 16
+"""Maximum number of jobs waiting for a worker; further submissions are rejected."""
+
+JOB_RESULT_TTL_SECONDS: Final[int] = 10 * 60
+"""How long a finished job and its result are kept for the UI to pick up."""
+
+JOB_POLL_INTERVAL_SECONDS: Final[int] = 1
+"""How often the UI polls a running job for progress."""
+
 # ============================================================================
 # Security Configuration
 # ============================================================================
@@ -49,11 +155,47 @@ RATE_LIMIT_REQUESTS: Final[int] = 5
 RATE_LIMIT_WINDOW: Final[int] = 60
 """Rate limit time window in seconds."""
 
+RATE_LIMIT_MAX_KEYS: Final[int] = 100_000
+"""Maximum number of users an in-memory rate limiter tracks at once."""
+
+# ============================================================================
+# Quota Configuration
+# ============================================================================
+QUOTA_PLAN_BUDGETS: Final[Dict[str, Dict[str, Tuple[int, int]]]] = {
+    "trial": {"ocr_units": (60, 300), "llm_tokens": (20_000, 150_000)},
+    "standard": {"ocr_units": (120, 2_000), "llm_tokens": (40_000, 1_000_000)},
+}
+"""Per-user budgets by plan: (per minute, per day) of OCR page units and LLM tokens."""
+
+QUOTA_DEFAULT_PLAN: Final[str] = "standard"
+"""Plan of users without a trialing subscription (and of everyone in dev mode)."""
+
+QUOTA_ESTIMATED_TOKENS: Final[int] = 3_000
+"""LLM tokens reserved per appeal before the actual usage is known (prompt + letter)."""
+
+QUOTA_TEXT_LAYER_PAGE_UNITS: Final[float] = 0.05
+"""OCR units charged for a page read from the PDF text layer (one unit = one page OCRed at OCR_DPI)."""
+
 # ============================================================================
 # Subscription Configuration
 # ============================================================================
 FREE_TRIAL_DAYS: Final[int] = 7
 """Number of days for free trial period."""
 
+ENTITLEMENT_TTL_SECONDS: Final[int] = 60
+"""How long a subscription check is answered from cache without asking Stripe."""
+
+ENTITLEMENT_STALE_SECONDS: Final[int] = 10 * 60
+"""How long past the TTL an active subscription is still served while it is re-checked in the background."""
+
+ENTITLEMENT_TABLE: Final[str] = "entitlements"
+"""Supabase table holding subscription state materialized from Stripe webhooks."""
+
+ENTITLEMENT_PERIOD_GRACE_SECONDS: Final[int] = 24 * 60 * 60
+"""How long past its stored period end a subscription still counts (covers late renewal webhooks)."""
+
+STRIPE_WEBHOOK_TOLERANCE_SECONDS: Final[int] = 300
+"""Maximum age of a Stripe webhook signature timestamp (replay protection)."""
+
 DEFAULT_STRIPE_PAYMENT_LINK: Final[str] = "https://buy.stripe.com/test_14AeVfdef2bk7YJ248bAs00"
 """Default Stripe payment link for subscriptions."""
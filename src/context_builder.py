@@ -0,0 +1,278 @@
+"""Token-budgeted LLM context built from the most informative spans of a letter.
+
+Cutting the extracted text at MAX_CONTEXT_LENGTH characters keeps the
+letterhead, addresses and legal footers at the top of a packet and can drop
+the denial rationale further down. Instead the text is split into sentences
+and short spans (field lines such as "Claim Number: ..."), every span is
+scored for what an appeal needs (denial rationale, codes, dates, policy
+citations, the requested service), and the best spans fill a token budget.
+Boilerplate is scored down, repeated spans are kept once, and the kept spans
+stay in document order.
+
+Token counts are estimated (about four characters per word piece, one per
+punctuation mark), which tracks the Llama 3 tokenizer closely enough for
+budgeting without loading it.
+"""
+import heapq
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from src.constants import MAX_CONTEXT_TOKENS
+from src.page_triage import DENIAL_SIGNALS
+
+_MONTHS = r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?"
+
+CONTEXT_SIGNALS: List[Tuple[str, "re.Pattern", float]] = DENIAL_SIGNALS + [
+    ("rationale", re.compile(
+        r"\bbecause\b|\bdue\s+to\b|\bnon-?covered\b|\bnot\s+covered\b|\bexperimental\b|\binvestigational\b"
+        r"|\bdoes\s+not\s+(?:meet|support|qualify)\b|\b(?:prior\s+)?authorization\b|\bprecertification\b",
+        re.IGNORECASE
+    ), 2.5),
+    ("procedure_code", re.compile(
+        # A bare "[A-V]dddd" may be an undotted ICD-10 code, so HCPCS codes count only after a label
+        r"\b(?:CPT|HCPCS)\b|\bprocedure(?:\s+code)?\s*:?\s*(?:\d{5}|[A-V]\d{4})\b", re.IGNORECASE
+    ), 2.0),
+    ("diagnosis_code", re.compile(r"\bICD-?10\b|\b[A-TV-Z]\d{2}\.\d{1,4}\b|\bdiagnosis\b", re.IGNORECASE), 2.0),
+    ("policy_citation", re.compile(
+        r"\bpolic(?:y|ies)\s+(?:number|no\.?|#)?\s*:?\s*[A-Z]*[-.]?\d|\b(?:LCD|NCD)\s*L?\d+"
+        r"|\bsection\s+\d|\bguidelines?\b|\bcriteria\b",
+        re.IGNORECASE
+    ), 2.0),
+    ("member_id", re.compile(
+        r"\b(?:member|subscriber|patient|group)\s*(?:ID|number|no\.?|#)\s*:?\s*[A-Z0-9-]{5,}", re.IGNORECASE
+    ), 2.0),
+    ("date", re.compile(rf"\b\d{{1,2}}/\d{{1,2}}/\d{{2,4}}\b|\b{_MONTHS}\s+\d{{1,2}},?\s+\d{{4}}\b"), 1.0),
+    ("service", re.compile(
+        r"\b(?:requested|procedure|service|surgery|treatment|therapy|device|injection|imaging|MRI|CT\s+scan)\b",
+        re.IGNORECASE
+    ), 1.0),
+    ("deadline", re.compile(r"\bwithin\s+\d+\s+(?:calendar\s+)?days\b|\bdeadline\b", re.IGNORECASE), 1.5),
+    # Boilerplate that costs tokens without helping the appeal
+    ("page_marker", re.compile(r"\bpage\s+\d+\s+of\s+\d+\b", re.IGNORECASE), -5.0),
+    ("privacy_notice", re.compile(
+        r"\bHIPAA\b|\bconfidential(?:ity)?\b|\bprivacy\s+(?:notice|practices)\b", re.IGNORECASE
+    ), -2.0),
+    ("assistance_notice", re.compile(
+        r"\blanguage\s+assistance\b|\bTTY\b|\bnondiscriminat|\bfree\s+of\s+charge\b|\bin\s+accordance\s+with\b",
+        re.IGNORECASE
+    ), -3.0),
+]
+"""(name, pattern, weight) of every signal a span is scored on; negative weights mark boilerplate."""
+
+_SIGNAL_WEIGHTS: Dict[str, float] = {name: weight for name, _, weight in CONTEXT_SIGNALS}
+
+_MAX_COUNT_PER_SIGNAL = 3
+"""Repetitions of one signal in a span beyond this add nothing."""
+
+_REPEAT_DECAY = 0.5
+"""Factor a signal's value shrinks by each time a kept span already covers it."""
+
+_SHORT_LINE_CHARS = 50
+"""Lines shorter than this end a span (headings, field lines, table rows, last lines of paragraphs)."""
+
+_MAX_SPAN_TOKENS = 80
+"""Spans longer than this are split back into their lines."""
+
+_GAP_MARKER = "[...]"
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+(?=[A-Z(\"'])")
+
+
+@dataclass
+class CompressedContext:
+    """LLM context selected from a document, and what the selection saved."""
+
+    text: str
+    tokens_before: int
+    tokens_after: int
+    spans_total: int
+    spans_kept: int
+
+    def report(self) -> Dict:
+        """Token counts before and after compression, for results and benchmarks."""
+        return {
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "reduction": round(1 - self.tokens_after / self.tokens_before, 3) if self.tokens_before else 0.0,
+            "spans_total": self.spans_total,
+            "spans_kept": self.spans_kept,
+        }
+
+
+def count_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in a text."""
+    return sum((len(piece) + 3) // 4 if piece[0].isalnum() else 1 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def split_spans(text: str) -> List[str]:
+    """Split OCR or text layer output into sentences and short stand-alone spans.
+
+    Wrapped prose lines are rejoined before the sentences are split, while
+    short lines (headings, "Field: value" lines, table rows) stay on their
+    own. Overlong spans (e.g. a table read as one block) are split back
+    into lines.
+
+    Args:
+        text: Extracted document text
+
+    Returns:
+        Spans in document order
+    """
+    spans: List[str] = []
+    buffer: List[str] = []
+
+    def flush() -> None:
+        if not buffer:
+            return
+        lines = list(buffer)
+        buffer.clear()
+        sentences = _SENTENCE_BREAK.split(" ".join(lines))
+        if len(lines) > 1 and any(count_tokens(sentence) > _MAX_SPAN_TOKENS for sentence in sentences):
+            spans.extend(lines)
+        else:
+            spans.extend(sentences)
+
+    for raw_line in text.splitlines():
+        line = " ".join(raw_line.split())
+        if not line:
+            flush()
+            continue
+        buffer.append(line)
+        if len(line) < _SHORT_LINE_CHARS or line.endswith((".", "!", "?", ":")):
+            flush()
+    flush()
+    return spans
+
+
+def score_span(span: str) -> Tuple[float, Dict[str, int]]:
+    """Score a span for how much it helps an appeal (negative for boilerplate).
+
+    Returns:
+        Tuple of (score, match count per signal that was found)
+    """
+    signals: Dict[str, int] = {}
+    score = 0.0
+    for name, pattern, weight in CONTEXT_SIGNALS:
+        count = len(pattern.findall(span))
+        if count:
+            signals[name] = count
+            score += weight * min(count, _MAX_COUNT_PER_SIGNAL)
+    return score, signals
+
+
+def _gain(signals: Dict[str, int], covered: Dict[str, int], tokens: int) -> float:
+    """Value per token of a span given how often its signals are already covered."""
+    value = 0.0
+    for name, count in signals.items():
+        weight = _SIGNAL_WEIGHTS[name]
+        if weight > 0:
+            seen = covered.get(name, 0)
+            value += weight * sum(_REPEAT_DECAY ** (seen + repeat) for repeat in range(min(count, _MAX_COUNT_PER_SIGNAL)))
+    return value / tokens ** 0.5
+
+
+def compress_context(text: str, token_budget: int = MAX_CONTEXT_TOKENS) -> CompressedContext:
+    """Fill a token budget with the most informative spans of a document.
+
+    Spans with denial signals are taken greedily by value per token, where a
+    signal is worth less each time an already kept span covers it, so forty
+    EOB rows with the same kind of code do not crowd out the one sentence
+    with the rationale. Neutral spans fill what is left of the budget in
+    document order; boilerplate and repeats of an already kept span are never
+    taken. Runs of left-out spans are marked with "[...]" so the LLM sees
+    where text was cut.
+
+    Args:
+        text: Extracted document text
+        token_budget: Tokens the context may use
+
+    Returns:
+        The selected context with its before/after token counts
+    """
+    spans = split_spans(text)
+    tokens = [count_tokens(span) for span in spans]
+
+    seen = set()
+    informative: List[Tuple[int, Dict[str, int]]] = []
+    neutral: List[int] = []
+    for index, span in enumerate(spans):
+        key = span.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        score, signals = score_span(span)
+        if score > 0:
+            informative.append((index, signals))
+        elif score == 0:
+            neutral.append(index)
+
+    kept = set()
+    used = 0
+    # Every kept span may follow a "[...]" marker, which uses the budget too
+    gap_tokens = count_tokens(_GAP_MARKER)
+    covered: Dict[str, int] = {}
+    # Lazy greedy: gains only shrink as coverage grows, so a span whose gain
+    # is up to date with the current coverage (epoch) and still on top of the
+    # heap is the best one. Spans with the same signals and length (e.g. EOB
+    # rows) share one gain computation per epoch.
+    epoch = 0
+    gains: Dict[Tuple, float] = {}
+    heap = []
+    for index, signals in informative:
+        profile = (tokens[index], tuple(sorted(signals.items())))
+        heap.append((-_gain(signals, covered, tokens[index]), index, epoch, profile, signals))
+    heapq.heapify(heap)
+    while heap:
+        _, index, computed_at, profile, signals = heapq.heappop(heap)
+        if used + tokens[index] + gap_tokens > token_budget:
+            continue
+        if computed_at != epoch:
+            if profile not in gains:
+                gains[profile] = _gain(signals, covered, tokens[index])
+            heapq.heappush(heap, (-gains[profile], index, epoch, profile, signals))
+            continue
+        kept.add(index)
+        used += tokens[index] + gap_tokens
+        for name, count in signals.items():
+            covered[name] = covered.get(name, 0) + min(count, _MAX_COUNT_PER_SIGNAL)
+        epoch += 1
+        gains.clear()
+
+    for index in neutral:
+        if used + tokens[index] + gap_tokens <= token_budget:
+            kept.add(index)
+            used += tokens[index] + gap_tokens
+
+    parts: List[str] = []
+    for index, span in enumerate(spans):
+        if index in kept:
+            parts.append(span)
+        elif parts and parts[-1] != _GAP_MARKER:
+            parts.append(_GAP_MARKER)
+    if parts and parts[-1] == _GAP_MARKER:
+        parts.pop()
+    selected = "\n".join(parts)
+
+    if not selected:
+        # Nothing usable was recognized: fall back to the start of the document
+        selected = _truncate_tokens(text, token_budget)
+
+    return CompressedContext(
+        text=selected,
+        tokens_before=sum(tokens),
+        tokens_after=count_tokens(selected),
+        spans_total=len(spans),
+        spans_kept=len(kept),
+    )
+
+
+def _truncate_tokens(text: str, token_budget: int) -> str:
+    used = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        piece = match.group()
+        used += (len(piece) + 3) // 4 if piece[0].isalnum() else 1
+        if used > token_budget:
+            return text[:match.start()].rstrip()
+    return text
@@ -0,0 +1,318 @@
+"""Structured denial fields: the compact input of the drafting prompt.
+
+Instead of sending the denial text itself to the drafting call, the text is
+first turned into a DenialRecord: payer, claim number, member ID, dates of
+service, procedure (CPT/HCPCS), diagnosis (ICD-10) and reason (CARC/RARC)
+codes, the denial rationale and the appeal deadline, plus a few short
+evidence quotes. Most denial letters state these fields in a predictable
+form, so a local rule-based extractor reads them; only when it cannot find
+the rationale does a small LLM extraction call fill the gaps.
+
+Records are cached by the hash of the text they came from, so regenerating
+an appeal for the same document reuses the record without extracting again.
+"""
+import copy
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field, fields
+from typing import Dict, List, Optional, Tuple
+
+from src.constants import DENIAL_RECORD_CACHE_MAX_ENTRIES, DENIAL_EVIDENCE_TOKENS, OCR_CACHE_MAX_AGE_SECONDS
+from src.context_builder import compress_context, score_span, split_spans
+
+EXTRACTOR_VERSION = "4"
+"""Bumped whenever extraction rules change, so cached records are not reused across versions."""
+
+_MAX_CODES = 10
+_MAX_RATIONALE_SPANS = 2
+_MIN_QUOTE_WORDS = 5
+_MIN_TABLE_AMOUNTS = 2
+
+_PAYER_FIELD = re.compile(r"^(?:payer|insurer|health\s+plan|insurance\s+company)\s*:\s*(.+)$", re.IGNORECASE)
+_PAYER_NAME = re.compile(
+    r"\b(?:health|healthcare|insurance|assurance|mutual|plan|blue\s+cross|blue\s+shield|aetna|cigna|humana"
+    r"|anthem|kaiser|unitedhealthcare|medicare|medicaid)\b",
+    re.IGNORECASE
+)
+_CLAIM_NUMBER = re.compile(r"\bclaim\s*(?:number|no\.?|#|id)\s*:?\s*([A-Z0-9][A-Z0-9-]{4,})", re.IGNORECASE)
+_MEMBER_ID = re.compile(
+    r"\b(?:member|subscriber|patient)\s*(?:ID|number|no\.?|#)\s*:?\s*([A-Z0-9][A-Z0-9-]{4,})", re.IGNORECASE
+)
+_DATE = re.compile(
+    r"\b\d{1,2}/\d{1,2}/\d{2,4}\b"
+    r"|\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}\b"
+)
+_SERVICE_DATE_LINE = re.compile(r"\bdates?\s+of\s+service\b|\bservice\s+dates?\b|\bDOS\b", re.IGNORECASE)
+_CPT_LINE = re.compile(r"\b(?:CPT|HCPCS|procedure|service\s+code|billed\s+code)\b", re.IGNORECASE)
+_CPT = re.compile(r"\b\d{4}[0-9FTU]\b")
+_HCPCS = re.compile(r"\b[A-V]\d{4}\b")
+_ICD_LINE = re.compile(r"\bICD-?10\b|\bdiagnos[ie]s\b|\bDx\b", re.IGNORECASE)
+_CODE_FIELD = re.compile(rf"(?=(?:{_CPT_LINE.pattern}|{_ICD_LINE.pattern}))", re.IGNORECASE)
+_ICD_DOTTED = re.compile(r"\b[A-TV-Z]\d{2}\.[0-9A-Z]{1,4}\b")
+_ICD_PLAIN = re.compile(r"\b[A-TV-Z]\d{2}[0-9A-Z]{0,4}\b(?!\.\w)")
+_CARC = re.compile(r"\b(CO|PR|OA|PI|CR)[\s-]?(\d{1,3})\b")
+_RARC = re.compile(r"\b(?:MA|M|N)\d{1,3}\b(?!\.\d)")
+_DEADLINE = re.compile(
+    r"\bwithin\s+\d+\s+(?:calendar\s+|business\s+)?days\b[^.\n]*|\b(?:no\s+later\s+than|by)\s+"
+    r"(?:\d{1,2}/\d{1,2}/\d{2,4}|(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4})",
+    re.IGNORECASE
+)
+_RATIONALE_SIGNALS = ("medical_necessity", "rationale")
+_WORD = re.compile(r"[A-Za-z]{2,}")
+_AMOUNT = re.compile(r"\b\d[\d,]*\.\d{2}\b")
+
+_PROMPT_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("payer", "Payer"),
+    ("claim_number", "Claim number"),
+    ("member_id", "Member ID"),
+    ("dates_of_service", "Date(s) of service"),
+    ("procedure_codes", "Procedure codes (CPT/HCPCS)"),
+    ("diagnosis_codes", "Diagnosis codes (ICD-10)"),
+    ("carc_codes", "Claim adjustment reason codes (CARC)"),
+    ("rarc_codes", "Remittance advice remark codes (RARC)"),
+    ("rationale", "Denial rationale"),
+    ("appeal_deadline", "Appeal deadline"),
+)
+
+
+@dataclass
+class DenialRecord:
+    """The facts of a denial an appeal is written from."""
+
+    payer: Optional[str] = None
+    claim_number: Optional[str] = None
+    member_id: Optional[str] = None
+    dates_of_service: List[str] = field(default_factory=list)
+    procedure_codes: List[str] = field(default_factory=list)
+    diagnosis_codes: List[str] = field(default_factory=list)
+    carc_codes: List[str] = field(default_factory=list)
+    rarc_codes: List[str] = field(default_factory=list)
+    rationale: Optional[str] = None
+    appeal_deadline: Optional[str] = None
+    evidence: List[str] = field(default_factory=list)
+    source: str = "rules"
+
+    @property
+    def complete(self) -> bool:
+        """Whether the record says why the claim was denied (the one field drafting cannot do without)."""
+        return bool(self.rationale)
+
+    def missing_fields(self) -> List[str]:
+        """Names of the prompt fields the extractor found nothing for."""
+        return [name for name, _ in _PROMPT_FIELDS if not getattr(self, name)]
+
+    def to_dict(self) -> Dict:
+        """Plain dictionary (JSON serializable) of the record."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DenialRecord":
+        """Build a record from a dictionary, ignoring unknown keys."""
+        known = {item.name for item in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+    def to_prompt(self) -> str:
+        """Compact text of the record for the drafting prompt (fields found, then evidence quotes)."""
+        lines = []
+        for name, label in _PROMPT_FIELDS:
+            value = getattr(self, name)
+            if value:
+                lines.append(f"{label}: {', '.join(value) if isinstance(value, list) else value}")
+        if self.evidence:
+            lines.append("Evidence quotes:")
+            lines.extend(f'- "{quote}"' for quote in self.evidence)
+        return "\n".join(lines)
+
+    def merge(self, other: Dict) -> None:
+        """Fill fields that are still empty from another extraction (e.g. the LLM's)."""
+        for name, _ in _PROMPT_FIELDS:
+            value = other.get(name)
+            if getattr(self, name) or not value:
+                continue
+            if isinstance(getattr(self, name), list):
+                value = [str(item) for item in value] if isinstance(value, list) else [str(value)]
+            else:
+                value = str(value)
+            setattr(self, name, value)
+
+
+def _unique(values: List[str]) -> List[str]:
+    """Values in first-seen order without repeats, at most _MAX_CODES."""
+    return list(dict.fromkeys(values))[:_MAX_CODES]
+
+
+def _find_payer(lines: List[str]) -> Optional[str]:
+    for line in lines:
+        match = _PAYER_FIELD.match(line)
+        if match:
+            return match.group(1).strip()
+    # Otherwise the letterhead: a short title-case line naming an insurer
+    for line in lines:
+        if len(line) > 60 or line.endswith(".") or any(char.isdigit() for char in line):
+            continue
+        words = line.split()
+        if _PAYER_NAME.search(line) and sum(word[0].isupper() for word in words) == len(words):
+            return line
+    return None
+
+
+def extract_denial_record(text: str, evidence_tokens: int = DENIAL_EVIDENCE_TOKENS) -> DenialRecord:
+    """Read the denial fields from a letter with local rules (no LLM call).
+
+    Args:
+        text: Normalized document text
+        evidence_tokens: Token budget of the evidence quotes
+
+    Returns:
+        The record; fields the rules could not find are left empty
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    record = DenialRecord(payer=_find_payer(lines))
+
+    match = _CLAIM_NUMBER.search(text)
+    record.claim_number = match.group(1) if match else None
+    match = _MEMBER_ID.search(text)
+    record.member_id = match.group(1) if match else None
+
+    service_dates = []
+    for line in lines:
+        if _SERVICE_DATE_LINE.search(line):
+            service_dates.extend(_DATE.findall(line))
+    record.dates_of_service = _unique(service_dates)
+
+    # The rationale: the sentences with the strongest denial signals, in document
+    # order; sentences giving a reason rank above ones that only say "denied"
+    spans = split_spans(text)
+    scored = []
+    for index, span in enumerate(spans):
+        score, signals = score_span(span)
+        reasoned = any(name in signals for name in _RATIONALE_SIGNALS)
+        if reasoned or (score > 0 and "denied" in signals):
+            scored.append((not reasoned, -score, index, span))
+    best = sorted(scored)[:_MAX_RATIONALE_SPANS]
+    if best:
+        record.rationale = " ".join(span for *_, span in sorted(best, key=lambda item: item[2]))
+
+    # Codes: only from field lines and prose, never from EOB line tables (whose
+    # rows list every billed line, not the denied service), nearest to the
+    # rationale first
+    anchors = [index for *_, index, _ in best]
+    procedures, diagnoses, carcs, rarcs = [], [], [], []
+    for index, span in sorted(
+        enumerate(spans), key=lambda item: min((abs(item[0] - anchor) for anchor in anchors), default=item[0])
+    ):
+        if len(_AMOUNT.findall(span)) >= _MIN_TABLE_AMOUNTS:
+            continue
+        # Field lines can be joined into one span ("Procedure: ... Diagnosis: ..."),
+        # so undotted codes are classified by the label they follow
+        for part in _CODE_FIELD.split(span):
+            if _ICD_LINE.match(part):
+                diagnoses.extend(_ICD_PLAIN.findall(part))
+            elif _CPT_LINE.match(part):
+                procedures.extend(_CPT.findall(part) + _HCPCS.findall(part))
+        diagnoses.extend(_ICD_DOTTED.findall(span))
+        carcs.extend(f"{group}-{number}" for group, number in _CARC.findall(span))
+        rarcs.extend(_RARC.findall(span))
+    # Undotted ICD-10 codes look like HCPCS ("M5416") or remark ("N390") codes
+    record.procedure_codes = _unique([code for code in procedures if code not in diagnoses])
+    record.diagnosis_codes = _unique(diagnoses)
+    record.carc_codes = _unique(carcs)
+    record.rarc_codes = _unique([code for code in rarcs if code not in diagnoses])
+
+    match = _DEADLINE.search(" ".join(text.split()))
+    record.appeal_deadline = match.group(0).rstrip(",;") if match else None
+
+    # Evidence: the most informative prose the fields above do not already carry
+    # (field lines and table rows are left out, as is the rationale itself)
+    rationale = record.rationale or ""
+    evidence = compress_context(text, evidence_tokens).text
+    record.evidence = [
+        quote for quote in evidence.split("\n")
+        if len(_WORD.findall(quote)) >= _MIN_QUOTE_WORDS and quote not in rationale
+    ]
+    return record
+
+
+def record_key(text: str) -> str:
+    """Cache key of the record extracted from a text."""
+    return hashlib.sha256(f"{EXTRACTOR_VERSION}|{text}".encode("utf-8")).hexdigest()
+
+
+class DenialRecordCache:
+    """In-memory LRU of extracted records; entries expire with the OCR retention window."""
+
+    def __init__(
+        self,
+        max_entries: int = DENIAL_RECORD_CACHE_MAX_ENTRIES,
+        max_age_seconds: int = OCR_CACHE_MAX_AGE_SECONDS
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of records kept
+            max_age_seconds: Maximum age of a record (records hold PHI)
+        """
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, text: str) -> Optional[DenialRecord]:
+        """Look up the record extracted from a text.
+
+        Args:
+            text: Normalized document text
+
+        Returns:
+            A copy of the cached record, or None on a miss
+        """
+        key = record_key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] < self.max_age_seconds:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                # A deep copy, so callers cannot change the cached record's lists
+                return DenialRecord.from_dict(copy.deepcopy(entry[1]))
+            self._entries.pop(key, None)
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, text: str, record: DenialRecord) -> None:
+        """Store the record extracted from a text.
+
+        Args:
+            text: Normalized document text
+            record: Record to cache
+        """
+        key = record_key(text)
+        with self._lock:
+            self._entries[key] = (time.time(), record.to_dict())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
+
+
+_cache: Optional[DenialRecordCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_record_cache() -> DenialRecordCache:
+    """Return the process-wide denial record cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DenialRecordCache()
+    return _cache
@@ -0,0 +1,268 @@
+"""Subscription entitlements: webhook-maintained table plus an in-process cache.
+
+check_subscription runs on every Streamlit rerun, i.e. on every widget
+interaction. Entitlements are cached per user for ENTITLEMENT_TTL_SECONDS;
+after that a granted entitlement keeps being served for up to
+ENTITLEMENT_STALE_SECONDS while it is refreshed in the background
+(stale-while-revalidate). Denied entitlements are never served stale, so a
+user who just subscribed is not locked out by an old answer.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from src.constants import (
+    ENTITLEMENT_TTL_SECONDS, ENTITLEMENT_STALE_SECONDS, ENTITLEMENT_TABLE, ENTITLEMENT_PERIOD_GRACE_SECONDS
+)
+
+ENTITLED_STATUSES = ("active", "trialing")
+"""Stripe subscription statuses that grant access."""
+
+
+@dataclass(frozen=True)
+class Entitlement:
+    """Whether a user may use the app, and the billing state behind the answer."""
+
+    email: str
+    active: bool
+    customer_id: Optional[str] = None
+    status: Optional[str] = None
+
+
+def fetch_stripe_entitlement(stripe_client, email: str) -> Entitlement:
+    """Look up a user's entitlement with a single Stripe request.
+
+    The customer's non-canceled subscriptions are expanded into the customer
+    search result, so no per-customer subscription listing is needed.
+
+    Args:
+        stripe_client: Shared StripeClient
+        email: User email
+
+    Returns:
+        Entitlement of the best subscription found under any customer with this email
+    """
+    customers = stripe_client.v1.customers.list({"email": email, "expand": ["data.subscriptions"]})
+    fallback = Entitlement(email=email, active=False)
+    for customer in customers.data:
+        expanded = getattr(customer, "subscriptions", None)
+        subscriptions = expanded.data if expanded else []
+        for subscription in subscriptions:
+            if subscription.status in ENTITLED_STATUSES:
+                return Entitlement(email=email, active=True, customer_id=customer.id, status=subscription.status)
+        if fallback.customer_id is None:
+            status = subscriptions[0].status if subscriptions else None
+            fallback = Entitlement(email=email, active=False, customer_id=customer.id, status=status)
+    return fallback
+
+
+class EntitlementStore:
+    """Subscription state materialized from Stripe webhooks, one row per email.
+
+    Rows hold email (primary key), customer_id, subscription_id (the
+    subscription the status belongs to), status, period_end (Unix seconds)
+    and last_event_at (creation time of the last applied Stripe event).
+    Works with a Supabase client or a bare PostgREST client, since only
+    ``.table()`` is used.
+    """
+
+    def __init__(self, client: Any, table: str = ENTITLEMENT_TABLE):
+        """Initialize the store.
+
+        Args:
+            client: Supabase client (service role) or postgrest SyncPostgrestClient
+            table: Table name
+        """
+        self._client = client
+        self._table = table
+
+    @classmethod
+    def connect(cls, supabase_url: str, service_key: str, postgrest_url: Optional[str] = None) -> "EntitlementStore":
+        """Open the store on the shared database client (see clients.get_database_client).
+
+        Args:
+            supabase_url: Supabase project URL
+            service_key: Supabase service role key (the table is not readable with the anon key)
+            postgrest_url: Bare PostgREST URL (e.g. a local stand-in); overrides supabase_url
+
+        Returns:
+            EntitlementStore
+        """
+        from src.clients import get_database_client
+        return cls(get_database_client(supabase_url, service_key, postgrest_url))
+
+    def get(self, email: str) -> Optional[Dict]:
+        """Read a user's row by email (primary key lookup)."""
+        rows = self._client.table(self._table).select("*").eq("email", email.strip().lower()).limit(1).execute()
+        return rows.data[0] if rows.data else None
+
+    def find_by_customer(self, customer_id: str) -> Optional[Dict]:
+        """Read the row of a Stripe customer (indexed lookup)."""
+        rows = self._client.table(self._table).select("*").eq("customer_id", customer_id).limit(1).execute()
+        return rows.data[0] if rows.data else None
+
+    def upsert(self, record: Dict) -> None:
+        """Insert or update a row; only the given columns are written."""
+        record = dict(record, email=record["email"].strip().lower())
+        self._client.table(self._table).upsert(record, on_conflict="email").execute()
+
+
+def entitlement_from_record(record: Dict, now: Optional[float] = None) -> Entitlement:
+    """Turn a stored row into an Entitlement, honouring the billing period end."""
+    now = time.time() if now is None else now
+    period_end = record.get("period_end")
+    in_period = period_end is None or period_end + ENTITLEMENT_PERIOD_GRACE_SECONDS > now
+    return Entitlement(
+        email=record["email"],
+        active=record.get("status") in ENTITLED_STATUSES and in_period,
+        customer_id=record.get("customer_id"),
+        status=record.get("status")
+    )
+
+
+def fetch_stored_entitlement(store: EntitlementStore, email: str, fallback: Callable[[str], Entitlement]) -> Entitlement:
+    """Look up a user's entitlement with one indexed read of the local table.
+
+    Users without a row yet (e.g. customers from before the webhook existed)
+    are looked up with ``fallback`` once, and the answer is written back so
+    the next lookup is local.
+
+    Args:
+        store: Webhook-maintained entitlement table
+        email: User email
+        fallback: Live lookup used on a miss (e.g. fetch_stripe_entitlement)
+
+    Returns:
+        The user's entitlement
+    """
+    record = store.get(email)
+    if record is not None:
+        return entitlement_from_record(record)
+
+    entitlement = fallback(email)
+    if entitlement.customer_id:
+        try:
+            store.upsert({"email": email, "customer_id": entitlement.customer_id, "status": entitlement.status})
+        except Exception as e:
+            print(f"Warning: Could not backfill entitlement: {e}")
+    return entitlement
+
+
+class EntitlementCache:
+    """Per-user entitlement cache with stale-while-revalidate."""
+
+    def __init__(
+        self,
+        ttl_seconds: int = ENTITLEMENT_TTL_SECONDS,
+        stale_seconds: int = ENTITLEMENT_STALE_SECONDS,
+        max_refresh_workers: int = 2,
+        clock: Callable[[], float] = time.time
+    ):
+        """Initialize the cache.
+
+        Args:
+            ttl_seconds: Age up to which an entry is served without a lookup
+            stale_seconds: Extra age up to which a granted entry is served while it refreshes
+            max_refresh_workers: Threads used for background refreshes
+            clock: Time source (replaceable for tests)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._clock = clock
+        self._entries: Dict[str, tuple] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_refresh_workers, thread_name_prefix="entitlements")
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refresh_errors": 0}
+
+    def get(self, email: str, fetch: Callable[[str], Entitlement]) -> Entitlement:
+        """Return a user's entitlement, looking it up only when the cache cannot answer.
+
+        Args:
+            email: User email
+            fetch: Looks up the current entitlement (e.g. fetch_stripe_entitlement)
+
+        Returns:
+            The cached or freshly fetched entitlement
+
+        Raises:
+            Exception: Whatever fetch raises, when there is no usable cached entry
+        """
+        key = email.strip().lower()
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, entitlement = entry
+                age = now - stored_at
+                if age < self.ttl_seconds:
+                    self._stats["hits"] += 1
+                    return entitlement
+                if entitlement.active and age < self.ttl_seconds + self.stale_seconds:
+                    self._stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, email, fetch, entry)
+                    return entitlement
+            self._stats["misses"] += 1
+
+        entitlement = fetch(email)
+        self._store(key, entitlement, now)
+        return entitlement
+
+    def invalidate(self, email: str) -> None:
+        """Forget a user's entitlement (after checkout, a portal visit or logout)."""
+        with self._lock:
+            self._entries.pop(email.strip().lower(), None)
+
+    def clear(self) -> None:
+        """Forget every cached entitlement."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
+
+    def _refresh(self, key: str, email: str, fetch: Callable[[str], Entitlement], stale_entry: tuple) -> None:
+        started = self._clock()
+        try:
+            entitlement = fetch(email)
+        except Exception as e:
+            # Keep serving the stale entry until it ages out
+            print(f"Warning: Entitlement refresh failed: {e}")
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+                self._refreshing.discard(key)
+            return
+        with self._lock:
+            self._refreshing.discard(key)
+            entry = self._entries.get(key)
+            # Skip if the entry was invalidated or replaced while the lookup ran (by
+            # identity: a replacement may carry the same timestamp)
+            if entry is not stale_entry:
+                return
+            self._entries[key] = (started, entitlement)
+
+    def _store(self, key: str, entitlement: Entitlement, stored_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (stored_at, entitlement)
+
+
+_cache: Optional[EntitlementCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_entitlement_cache() -> EntitlementCache:
+    """Return the process-wide entitlement cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EntitlementCache()
+    return _cache
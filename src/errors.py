@@ -28,4 +28,12 @@ class ValidationError(MediSyncError):
 
 class RateLimitError(MediSyncError):
     """Raised when rate limit is exceeded."""
+
+    def __init__(self, message: str, retry_after: int = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(MediSyncError):
+    """Raised when the background job queue cannot accept more work."""
     pass
@@ -0,0 +1,348 @@
+"""Background jobs: appeal drafting runs off the Streamlit script thread.
+
+Running OCR and the LLM inside a script run pins that session's thread for
+the whole run, and a browser refresh throws the work away. Work is submitted
+to the process-wide JobQueue instead: a bounded pool of workers runs it, the
+UI polls the job by id, and finished jobs are kept for
+JOB_RESULT_TTL_SECONDS so a rerun or a reconnecting browser can pick up the
+result.
+
+Submitting the same work again while it is still in flight (a double click,
+a rerun, a second tab) joins the running job instead of starting another:
+jobs submitted with a key are coalesced per user and key (single flight).
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.constants import JOB_WORKERS, JOB_QUEUE_DEPTH, JOB_RESULT_TTL_SECONDS, MAX_PDF_PAGES
+from src.errors import QueueFullError
+from src.ocr_engine import get_page_count, join_pages
+from src.quotas import Cost, Reservation, ocr_cost
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+STAGE_OCR = "ocr"
+STAGE_DRAFT = "draft"
+
+
+@dataclass
+class Job:
+    """A unit of background work and its progress, as seen by the UI.
+
+    The worker updates the progress fields while it runs; readers only ever
+    see whole attribute values, so no lock is needed to poll them.
+    """
+
+    id: str
+    owner: str
+    label: str = ""
+    key: Optional[str] = None
+    status: str = JOB_QUEUED
+    stage: Optional[str] = None
+    progress: float = 0.0
+    message: str = ""
+    partial_text: str = ""
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        """Whether the job has finished, successfully or not."""
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation was requested; work functions should stop when it is."""
+        return self.cancel_event.is_set()
+
+    def report(
+        self,
+        stage: Optional[str] = None,
+        progress: Optional[float] = None,
+        message: Optional[str] = None,
+        partial_text: Optional[str] = None
+    ) -> None:
+        """Publish progress from the work function (only the given fields change)."""
+        if stage is not None:
+            self.stage = stage
+        if progress is not None:
+            self.progress = progress
+        if message is not None:
+            self.message = message
+        if partial_text is not None:
+            self.partial_text = partial_text
+
+
+class JobQueue:
+    """Bounded worker pool with job ids, cancellation and short-lived results."""
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        max_queue_depth: int = JOB_QUEUE_DEPTH,
+        result_ttl_seconds: int = JOB_RESULT_TTL_SECONDS
+    ):
+        """Initialize the queue.
+
+        Args:
+            workers: Jobs run at the same time
+            max_queue_depth: Jobs allowed to wait for a worker
+            result_ttl_seconds: How long finished jobs are kept
+        """
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self.result_ttl_seconds = result_ttl_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[Tuple[str, str], Job] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jobs")
+        self._stats = {"submitted": 0, "coalesced": 0, "rejected": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+
+    def submit(
+        self,
+        owner: str,
+        work: Callable[[Job], Any],
+        label: str = "",
+        key: Optional[str] = None,
+        on_coalesced: Optional[Callable[[], None]] = None
+    ) -> Job:
+        """Queue work for a background worker.
+
+        Args:
+            owner: User the job belongs to (only they can see it)
+            work: Called with the Job on a worker thread; its return value becomes the result
+            label: Free-form description shown with the job (e.g. the file name)
+            key: Identifies identical work (e.g. appeal_job_key); while a job with the
+                same owner and key is queued or running, it is returned instead of
+                starting a new one
+            on_coalesced: Called when the submission joins a job in flight, so the
+                caller can release what it reserved for work that will never run
+
+        Returns:
+            The queued job, or the in-flight job this submission was coalesced into
+
+        Raises:
+            QueueFullError: If max_queue_depth jobs are already waiting
+        """
+        self.purge_expired()
+        with self._lock:
+            existing = self._in_flight.get((owner, key)) if key is not None else None
+            if existing is not None:
+                self._stats["coalesced"] += 1
+            else:
+                waiting = sum(job.status == JOB_QUEUED for job in self._jobs.values())
+                if waiting >= self.max_queue_depth:
+                    self._stats["rejected"] += 1
+                    raise QueueFullError("The server is busy. Please try again in a minute.")
+                job = Job(id=uuid.uuid4().hex, owner=owner, label=label, key=key)
+                self._jobs[job.id] = job
+                if key is not None:
+                    self._in_flight[(owner, key)] = job
+                self._stats["submitted"] += 1
+        if existing is not None:
+            # Outside the lock: releasing a reservation may call the database
+            if on_coalesced is not None:
+                on_coalesced()
+            return existing
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def in_flight(self, owner: str, key: str) -> Optional[Job]:
+        """The queued or running job of a user with this key, if any.
+
+        Callers that check before submitting (e.g. to avoid reserving quota
+        twice) join the job they find, so a hit counts as coalesced like a
+        coalesced submit.
+        """
+        with self._lock:
+            job = self._in_flight.get((owner, key))
+            if job is not None:
+                self._stats["coalesced"] += 1
+            return job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        """Look up a job; None if it is unknown, expired, or belongs to someone else."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def cancel(self, job_id: str) -> None:
+        """Ask a job to stop. Queued jobs never start; running jobs stop at their next check."""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position of a waiting job (None once it is running or finished)."""
+        with self._lock:
+            waiting = sorted(
+                (job for job in self._jobs.values() if job.status == JOB_QUEUED), key=lambda job: job.created_at
+            )
+        for position, job in enumerate(waiting, start=1):
+            if job.id == job_id:
+                return position
+        return None
+
+    def jobs_for(self, owner: str) -> List[Job]:
+        """Every job of a user still held by the queue, oldest first."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    def purge_expired(self) -> None:
+        """Forget finished jobs older than result_ttl_seconds."""
+        cutoff = time.time() - self.result_ttl_seconds
+        with self._lock:
+            for job_id in [job.id for job in self._jobs.values() if job.done and job.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict:
+        """Return job counters plus the current number of waiting and running jobs."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queued"] = sum(job.status == JOB_QUEUED for job in self._jobs.values())
+            stats["running"] = sum(job.status == JOB_RUNNING for job in self._jobs.values())
+        return stats
+
+    def _run(self, job: Job, work: Callable[[Job], Any]) -> None:
+        if job.cancelled:
+            self._finish(job, JOB_CANCELLED)
+            return
+        job.started_at = time.time()
+        job.status = JOB_RUNNING
+        try:
+            result = work(job)
+        except Exception as e:
+            if job.cancelled:
+                self._finish(job, JOB_CANCELLED)
+            else:
+                print(f"Warning: Job {job.id} failed: {e}")
+                job.error = str(e)
+                self._finish(job, JOB_FAILED)
+            return
+        if job.cancelled:
+            self._finish(job, JOB_CANCELLED)
+        else:
+            job.result = result
+            self._finish(job, JOB_SUCCEEDED)
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.finished_at = time.time()
+        job.status = status
+        with self._lock:
+            self._stats[status] += 1
+            if job.key is not None and self._in_flight.get((job.owner, job.key)) is job:
+                del self._in_flight[(job.owner, job.key)]
+
+
+def appeal_job_key(pdf_bytes: bytes, advocate_details: Optional[Dict], model: str, prompt_version: str) -> str:
+    """Coalescing key of an appeal: same PDF content, advocate details, model and prompt template."""
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(pdf_bytes).digest())
+    digest.update(json.dumps(advocate_details or {}, sort_keys=True).encode("utf-8"))
+    digest.update(model.encode("utf-8"))
+    digest.update(prompt_version.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def appeal_job(
+    pipeline,
+    pdf_bytes: bytes,
+    advocate_details: Optional[Dict] = None,
+    reservation: Optional[Reservation] = None
+) -> Callable[[Job], Optional[Dict]]:
+    """Build the work function for one appeal (the steps of MediSyncPipeline.process_file).
+
+    Progress is reported page by page during extraction and delta by delta
+    while the letter is written, so the UI can show both live.
+
+    Args:
+        pipeline: MediSyncPipeline to run
+        pdf_bytes: Uploaded PDF content
+        advocate_details: Optional dict with name, title, address
+        reservation: Quota reservation settled with the actual cost when the
+            job ends (also when it fails or is cancelled)
+
+    Returns:
+        Work function for JobQueue.submit; its result is the process_file
+        result, or None if the job was cancelled
+    """
+    pages = []
+    drafting = False
+
+    def work(job: Job) -> Optional[Dict]:
+        try:
+            return run(job)
+        finally:
+            if reservation is not None:
+                reservation.settle(actual_cost())
+
+    def actual_cost() -> Cost:
+        # Without reported usage, a started draft is assumed to have cost the estimate
+        usage = pipeline.llm.last_usage if drafting else None
+        if usage is not None:
+            tokens = usage["total_tokens"]
+        else:
+            tokens = reservation.estimate.llm_tokens if drafting else 0
+        # The denial field extraction call, when the local rules needed it
+        extraction_usage = pipeline.llm.last_extraction_usage
+        if extraction_usage is not None:
+            tokens += extraction_usage["total_tokens"]
+        return Cost(ocr_units=ocr_cost(pages), llm_tokens=tokens)
+
+    def run(job: Job) -> Optional[Dict]:
+        nonlocal drafting
+        total_pages = min(get_page_count(pdf_bytes), MAX_PDF_PAGES)
+        job.report(stage=STAGE_OCR, message="Ranking pages by relevance...")
+
+        stream = pipeline.stream_pages(pdf_bytes, cancel_event=job.cancel_event, owner=job.owner)
+        try:
+            for page in stream:
+                pages.append(page)
+                job.report(
+                    progress=min(1.0, len(pages) / total_pages),
+                    message=(
+                        f"Page {page.page_number} of {total_pages} "
+                        f"({page.source}, {sum(page.timings.values()):.1f}s)"
+                    ),
+                    partial_text=join_pages(pages) if page.text else None
+                )
+        finally:
+            stream.close()
+        if job.cancelled:
+            return None
+
+        job.report(stage=STAGE_DRAFT, progress=1.0, message="Analyzing Medical Policy & Drafting...", partial_text="")
+        drafting = True
+        draft_stream = pipeline.stream_draft_from_pages(pages, advocate_details=advocate_details)
+        deltas = iter(draft_stream)
+        draft = ""
+        try:
+            for delta in deltas:
+                if job.cancelled:
+                    return None
+                draft += delta
+                job.report(partial_text=draft)
+        finally:
+            # Closing the generator closes the LLM stream when the loop stops early
+            deltas.close()
+        return draft_stream.result
+
+    return work
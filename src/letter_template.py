@@ -0,0 +1,109 @@
+"""Appeal letter frame rendered locally around the LLM-written body.
+
+The sender block, date, recipient block, reference line, salutation and
+signature of an appeal are fully determined by the advocate details and the
+extracted denial record. Having the LLM copy them costs output tokens (the
+slowest part of a request) and invites mistakes such as placeholders or a
+mangled address. Only the argument body is generated; the rest is rendered
+here from sanitized inputs.
+"""
+import datetime
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from src.sanitization import sanitize_address, sanitize_name
+
+if TYPE_CHECKING:
+    # Only a type here: the Lambda API renders letters without the OCR dependencies
+    from src.denial_extraction import DenialRecord
+
+DEFAULT_TITLE = "Medical Billing Advocate"
+SALUTATION = "Dear Appeals Reviewer:"
+CLOSING = "Sincerely,"
+
+_PLACEHOLDER = re.compile(r"^\[.*\]$|^your name$|^mailing address$", re.IGNORECASE)
+_FRAME_START = re.compile(r"^(?:dear\b|to whom it may concern|re:|subject:|date:)", re.IGNORECASE)
+_FRAME_END = re.compile(
+    r"^(?:sincerely|respectfully(?:\s+(?:yours|submitted))?|(?:best|kind|warm)\s+regards|regards"
+    r"|yours\s+(?:truly|sincerely|faithfully))\s*,?$",
+    re.IGNORECASE
+)
+
+
+def _value(text: str) -> str:
+    """A sanitized field, or "" for an empty field or a form placeholder."""
+    return "" if _PLACEHOLDER.match(text) else text
+
+
+def format_date(day: datetime.date) -> str:
+    """Date as written in a US business letter (e.g. "March 4, 2025")."""
+    return f"{day:%B} {day.day}, {day.year}"
+
+
+@dataclass
+class AppealLetter:
+    """The locally rendered parts of a letter; the LLM body goes in between."""
+
+    opening: str
+    closing: str
+
+    def render(self, body: str) -> str:
+        """Complete letter around a generated body (stray salutations and sign-offs removed)."""
+        return f"{self.opening}{clean_body(body)}{self.closing}"
+
+
+def build_letter(
+    advocate_details: Dict,
+    record: Optional["DenialRecord"] = None,
+    today: Optional[datetime.date] = None
+) -> AppealLetter:
+    """Render the header and signature of an appeal letter.
+
+    Args:
+        advocate_details: Dictionary containing name, title, and address
+        record: Extracted denial record (payer and claim references)
+        today: Date of the letter (defaults to today)
+
+    Returns:
+        AppealLetter whose opening ends and closing starts with a blank line
+    """
+    name = _value(sanitize_name(advocate_details.get("name")))
+    title = _value(sanitize_name(advocate_details.get("title"))) or DEFAULT_TITLE
+    address = _value(sanitize_address(advocate_details.get("address")))
+
+    opening: List[str] = [line for line in (name, title) if line]
+    opening.extend(line.strip() for line in address.splitlines() if line.strip())
+    opening += ["", format_date(today or datetime.date.today()), ""]
+
+    if record is not None:
+        payer = sanitize_name(record.payer)
+        if payer:
+            opening += [payer, "Attn: Appeals Department", ""]
+        references = []
+        if record.claim_number:
+            references.append(f"Claim number {sanitize_name(record.claim_number)}")
+        if record.member_id:
+            references.append(f"Member ID {sanitize_name(record.member_id)}")
+        if record.dates_of_service:
+            references.append(f"Date(s) of service {sanitize_name(', '.join(record.dates_of_service))}")
+        opening.append("Re: Appeal of claim denial" + (f" ({'; '.join(references)})" if references else ""))
+        opening.append("")
+
+    opening += [SALUTATION, "", ""]
+    closing = ["", "", CLOSING, ""] + [line for line in (name, title) if line]
+    return AppealLetter(opening="\n".join(opening), closing="\n".join(closing))
+
+
+def clean_body(body: str) -> str:
+    """Strip header, salutation, sign-off and placeholder lines the model added despite the instructions."""
+    lines = [line for line in body.strip().splitlines() if not _PLACEHOLDER.match(line.strip())]
+    while lines and (not lines[0].strip() or _FRAME_START.match(lines[0].strip())):
+        lines.pop(0)
+    for index in range(len(lines) - 1, -1, -1):
+        if _FRAME_END.match(lines[index].strip()):
+            # Only a sign-off near the end, followed by at most a name and title
+            if len(lines) - index <= 4:
+                lines = lines[:index]
+            break
+    return "\n".join(lines).strip()
@@ -1,79 +1,155 @@
+import json
 import os
-from groq import Groq
-from src.sanitization import sanitize_name, sanitize_address
-from src.constants import LLM_MODEL, LLM_TEMPERATURE
+from typing import Dict, Iterator, List, Optional
+from groq import APIConnectionError
+from src.clients import GROQ, get_groq_client, invalidate_client
+from src.sanitization import sanitize_name
+from src.constants import LLM_BODY_MAX_TOKENS, LLM_EXTRACTION_MAX_TOKENS, LLM_MODEL, LLM_TEMPERATURE
 from src.errors import LLMError
+from src.prompts import APPEAL_BODY, DENIAL_FIELDS
 
 class CloudLLM:
     def __init__(self, api_key: str):
         """Initialize CloudLLM client.
         
+        The Groq client is shared process-wide per API key, so creating a
+        CloudLLM is cheap and reuses warm connections.
+        
         Args:
             api_key: Groq API key
         """
-        self.client = Groq(api_key=api_key)
+        self.api_key = api_key
+        self.client = get_groq_client(api_key)
         self.model = LLM_MODEL
+        # Versioned prompt of the appeal body; its id is recorded with each result
+        self.prompt = APPEAL_BODY
+        # Token usage of the last completed request (prompt_tokens, completion_tokens, total_tokens)
+        self.last_usage: Optional[Dict[str, int]] = None
+        # Token usage of the last denial field extraction
+        self.last_extraction_usage: Optional[Dict[str, int]] = None
 
     def draft_appeal(self, context, advocate_details):
-        """Draft an appeal letter with sanitized inputs to prevent prompt injection.
+        """Draft the body of an appeal letter with sanitized inputs to prevent prompt injection.
         
         Args:
             context: The denial context extracted from the PDF
             advocate_details: Dictionary containing name, title, and address
             
         Returns:
-            Generated appeal letter text
+            Generated letter body (without header, salutation or signature)
         """
-        # Sanitize all user inputs to prevent prompt injection
-        name = sanitize_name(advocate_details.get("name", "[Your Name]"))
-        title = sanitize_name(advocate_details.get("title", "Medical Billing Advocate"))
-        address = sanitize_address(advocate_details.get("address", "[Your Address]"))
-        
-        # Use structured prompting with clear XML-style delimiters for security
-        prompt = f"""You are a medical billing advocate assistant. Generate a formal insurance appeal letter.
-
-SENDER INFORMATION (Use exactly as provided below):
-<sender>
-<name>{name}</name>
-<title>{title}</title>
-<address>{address}</address>
-</sender>
-
-DENIAL CONTEXT:
-<denial_context>
-{context}
-</denial_context>
-
-INSTRUCTIONS:
-1. HEADER: Start the letter with the sender's details in this exact format:
-   {name}
-   {title}
-   {address}
-   Date: (Insert Today's Date)
-
-2. DO NOT include labels like "[Your Name]" or placeholders like "[City, State, ZIP]".
-   If information is missing in the address, do not add placeholders.
-
-3. Address the specific denial reason found in the context.
+        try:
+            self.last_usage = None
+            chat_completion = self.client.chat.completions.create(
+                messages=self._build_messages(context, advocate_details),
+                model=self.model,
+                temperature=LLM_TEMPERATURE,
+                max_tokens=LLM_BODY_MAX_TOKENS,
+            )
+            
+            self.last_usage = _usage_dict(chat_completion.usage)
+            return chat_completion.choices[0].message.content
+        except Exception as e:
+            self._report_error(e)
+            raise LLMError(f"Failed to generate appeal letter: {str(e)}") from e
 
-4. Provide medical justification based ONLY on information in the denial context.
-   DO NOT invent diagnoses or medical facts.
+    def stream_appeal(self, context, advocate_details) -> Iterator[str]:
+        """Draft the body of an appeal letter like draft_appeal, yielding text as it is generated.
+        
+        Args:
+            context: The denial context extracted from the PDF
+            advocate_details: Dictionary containing name, title, and address
+            
+        Yields:
+            Successive pieces of the body; joined they form the full text
+            
+        Raises:
+            LLMError: If the request fails or the stream breaks off
+        """
+        self.last_usage = None
+        try:
+            stream = self.client.chat.completions.create(
+                messages=self._build_messages(context, advocate_details),
+                model=self.model,
+                temperature=LLM_TEMPERATURE,
+                max_tokens=LLM_BODY_MAX_TOKENS,
+                stream=True,
+            )
+        except Exception as e:
+            self._report_error(e)
+            raise LLMError(f"Failed to generate appeal letter: {str(e)}") from e
 
-5. Sign the letter with: {name}
+        # Closing the stream (also when the caller stops early) drops the connection
+        with stream:
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    # The last chunk carries the token usage of the whole request
+                    x_groq = getattr(chunk, "x_groq", None)
+                    usage = getattr(chunk, "usage", None) or getattr(x_groq, "usage", None)
+                    if usage is not None:
+                        self.last_usage = _usage_dict(usage)
+            except Exception as e:
+                self._report_error(e)
+                raise LLMError(f"Appeal generation was interrupted: {str(e)}") from e
 
-6. Keep the tone professional and formal.
-"""
+    def extract_denial_fields(self, context: str) -> Dict:
+        """Extract the denial fields the local rules could not find.
+        
+        A short JSON-mode call on the compressed context; its output is small
+        and capped, so it costs a fraction of a drafting call.
         
+        Args:
+            context: The denial context extracted from the PDF
+            
+        Returns:
+            Dictionary with any of the DenialRecord field names as keys
+            
+        Raises:
+            LLMError: If the request fails or the response is not a JSON object
+        """
+        self.last_extraction_usage = None
         try:
             chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are a helpful medical billing advocate assistant."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=DENIAL_FIELDS.messages(context=context),
                 model=self.model,
-                temperature=LLM_TEMPERATURE,
+                temperature=0,
+                max_tokens=LLM_EXTRACTION_MAX_TOKENS,
+                response_format={"type": "json_object"},
             )
-            
-            return chat_completion.choices[0].message.content
+            self.last_extraction_usage = _usage_dict(chat_completion.usage)
+            fields = json.loads(chat_completion.choices[0].message.content)
         except Exception as e:
-            raise LLMError(f"Failed to generate appeal letter: {str(e)}") from e
\ No newline at end of file
+            self._report_error(e)
+            raise LLMError(f"Failed to extract denial fields: {str(e)}") from e
+        if not isinstance(fields, dict):
+            raise LLMError("Failed to extract denial fields: response is not a JSON object")
+        return fields
+
+    def _report_error(self, error: Exception) -> None:
+        """Rebuild the shared client on the next request after a connection failure."""
+        if isinstance(error, APIConnectionError):
+            invalidate_client(GROQ, self.api_key)
+
+    def _build_messages(self, context, advocate_details) -> List[Dict[str, str]]:
+        """Build the chat messages for an appeal body request.
+        
+        The sender block, date, recipient, salutation and signature are
+        rendered locally (see letter_template), so the model writes only the
+        argument paragraphs.
+        """
+        # Sanitize all user inputs to prevent prompt injection
+        title = sanitize_name(advocate_details.get("title")) or "Medical Billing Advocate"
+        return self.prompt.messages(title=title, context=context)
+
+
+def _usage_dict(usage) -> Optional[Dict[str, int]]:
+    """Token counts of a Groq CompletionUsage (None if the response had none)."""
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
@@ -0,0 +1,236 @@
+"""Content-addressed cache for OCR results."""
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+from src.constants import (
+    OCR_DPI, OCR_PSM_MODE, OCR_ADAPTIVE_DPI, OCR_DPI_LADDER, OCR_MIN_CONFIDENCE,
+    OCR_CACHE_MAX_ENTRIES, OCR_CACHE_MAX_AGE_SECONDS
+)
+from src.ocr_engine import PageResult, SOURCE_FAILED, SOURCE_OCR
+
+
+def cache_key(
+    pdf_bytes: bytes,
+    first_page: int,
+    last_page: int,
+    char_budget: Optional[int] = None,
+    ranked: bool = False
+) -> str:
+    """Build a cache key from the PDF content and every parameter that affects OCR output.
+
+    Args:
+        pdf_bytes: Raw PDF content
+        first_page: First page extracted
+        last_page: Last page extracted (page cap)
+        char_budget: Character budget the extraction stopped at, if any
+        ranked: Whether pages were picked by relevance triage
+
+    Returns:
+        Hex SHA-256 digest identifying the OCR result
+    """
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    dpi = f"adaptive{OCR_DPI_LADDER}@{OCR_MIN_CONFIDENCE}" if OCR_ADAPTIVE_DPI else OCR_DPI
+    params = f"{digest}|dpi={dpi}|psm={OCR_PSM_MODE}|pages={first_page}-{last_page}|budget={char_budget}|ranked={ranked}"
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()
+
+
+def _failed(page: PageResult) -> bool:
+    """Whether extraction of a page failed (as opposed to being skipped by a budget)."""
+    return page.source == SOURCE_FAILED or (page.source == SOURCE_OCR and not page.text.strip())
+
+
+class OCRCache:
+    """Two-tier OCR result cache: in-memory LRU plus optional encrypted disk tier.
+
+    Entries expire after ``max_age_seconds`` in both tiers so cached PHI never
+    outlives the configured retention window. Disk entries are encrypted with
+    Fernet (AES-128-CBC + HMAC); with no key configured a random per-process
+    key is used, which makes the disk tier unreadable after a restart.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = OCR_CACHE_MAX_ENTRIES,
+        max_age_seconds: int = OCR_CACHE_MAX_AGE_SECONDS,
+        disk_dir: Optional[str] = None,
+        encryption_key: Optional[bytes] = None
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            max_age_seconds: Maximum age of an entry in either tier
+            disk_dir: Directory for the encrypted disk tier (None disables it)
+            encryption_key: Fernet key for the disk tier
+        """
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.disk_dir = disk_dir
+        self._memory: "OrderedDict[str, Tuple[float, List[PageResult]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "skipped_failures": 0}
+
+        self._fernet = None
+        if disk_dir:
+            # Imported lazily: only the disk tier needs cryptography
+            from cryptography.fernet import Fernet
+            os.makedirs(disk_dir, mode=0o700, exist_ok=True)
+            self._fernet = Fernet(encryption_key or Fernet.generate_key())
+
+    def get(self, key: str) -> Optional[List[PageResult]]:
+        """Look up an OCR result, promoting disk hits into memory.
+
+        Args:
+            key: Key from cache_key()
+
+        Returns:
+            A copy of the cached page results, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, pages = entry
+                if now - stored_at < self.max_age_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    # A deep copy, so callers cannot change the cached pages
+                    return copy.deepcopy(pages)
+                del self._memory[key]
+
+            pages = self._read_disk(key)
+            if pages is not None:
+                self._stats["disk_hits"] += 1
+                self._store_memory(key, pages, now)
+                return copy.deepcopy(pages)
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key: str, pages: List[PageResult]) -> None:
+        """Store an OCR result in both tiers.
+
+        Results with a failed page (an error, or OCR that returned no text)
+        are not stored: the failure may be temporary, and caching it would
+        return the empty page for the whole retention window.
+
+        Args:
+            key: Key from cache_key()
+            pages: Page results to cache
+        """
+        with self._lock:
+            if any(_failed(page) for page in pages):
+                self._stats["skipped_failures"] += 1
+                return
+            self._store_memory(key, copy.deepcopy(pages), time.time())
+            self._write_disk(key, pages)
+
+    def purge(self) -> None:
+        """Drop every cached entry from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            for path in self._disk_paths():
+                self._remove(path)
+
+    def purge_expired(self) -> int:
+        """Drop entries older than max_age_seconds from both tiers.
+
+        Returns:
+            Number of entries removed
+        """
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for key in [k for k, (stored_at, _) in self._memory.items() if now - stored_at >= self.max_age_seconds]:
+                del self._memory[key]
+                removed += 1
+            for path in self._disk_paths():
+                try:
+                    expired = now - os.path.getmtime(path) >= self.max_age_seconds
+                except OSError:
+                    continue
+                if expired:
+                    self._remove(path)
+                    removed += 1
+        return removed
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _store_memory(self, key: str, pages: List[PageResult], stored_at: float) -> None:
+        self._memory[key] = (stored_at, pages)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.ocr")
+
+    def _disk_paths(self) -> List[str]:
+        if not self._fernet:
+            return []
+        return [
+            os.path.join(self.disk_dir, name)
+            for name in os.listdir(self.disk_dir)
+            if name.endswith(".ocr")
+        ]
+
+    def _read_disk(self, key: str) -> Optional[List[PageResult]]:
+        if not self._fernet:
+            return None
+
+        from cryptography.fernet import InvalidToken
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                token = f.read()
+        except OSError:
+            return None
+
+        try:
+            # Fernet tokens carry their creation time, so the TTL check is tamper-proof
+            payload = self._fernet.decrypt(token, ttl=self.max_age_seconds)
+        except InvalidToken:
+            # Expired, or written with a different key
+            self._remove(path)
+            return None
+
+        return [PageResult(**page) for page in json.loads(payload)]
+
+    def _write_disk(self, key: str, pages: List[PageResult]) -> None:
+        if not self._fernet:
+            return
+
+        token = self._fernet.encrypt(json.dumps([asdict(page) for page in pages]).encode("utf-8"))
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(token)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            if tmp_path is not None:
+                self._remove(tmp_path)
+            print(f"Warning: Failed to write OCR cache entry: {e}")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,64 +1,683 @@
-import pytesseract
-from pdf2image import convert_from_path
-from pdf2image.exceptions import PDFPageCountError
 import os
-from src.constants import OCR_DPI, OCR_PSM_MODE, MAX_PDF_PAGES
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pytesseract
+from pytesseract import Output
+from PIL import Image
+from src.constants import (
+    OCR_DPI, OCR_PSM_MODE, MAX_PDF_PAGES, OCR_WORKERS, OCR_CHUNK_SIZE, OCR_RENDER_TIMEOUT_SECONDS,
+    OCR_ADAPTIVE_DPI, OCR_DPI_LADDER, OCR_MIN_CONFIDENCE, OCR_NOISE_MIN_CONFIDENCE,
+    TEXT_LAYER_MIN_CHARS, TEXT_LAYER_MIN_ALNUM_RATIO
+)
 from src.errors import OCRError
+from src.ocr_scheduler import get_ocr_scheduler
+from src.tesseract_pool import get_worker_pool
+from src.text_normalizer import NormalizationReport, drop_noise_words, normalize_pages
+
+# Tesseract is itself multi-threaded via OpenMP. When several pages are OCRed
+# side by side, the per-process threads only fight each other for the cores.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+SOURCE_TEXT_LAYER = "text_layer"
+SOURCE_OCR = "ocr"
+SOURCE_FAILED = "failed"
+SOURCE_SKIPPED = "skipped"
+SOURCE_PENDING = "pending"
+
+PDFSource = Union[str, bytes]
+"""A PDF given either as a filesystem path or as its raw bytes."""
+
+_PGM_HEADER = re.compile(rb"P5\s+(\d+)\s+(\d+)\s+(\d+)\s")
+
+
+@dataclass
+class PageResult:
+    """Text extracted from a single PDF page and how it was obtained."""
+
+    page_number: int
+    text: str
+    source: str
+    dpi: Optional[int] = None
+    confidence: Optional[float] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    relevance: Optional[float] = None
+    signals: Dict[str, int] = field(default_factory=dict)
+    noise_words: int = 0
+
 
+def read_pdf_source(pdf: Union[str, bytes, BinaryIO]) -> PDFSource:
+    """Normalize a PDF argument to a path or in-memory bytes.
 
-def extract_text_from_pdf(pdf_path: str, max_pages: int = MAX_PDF_PAGES) -> str:
-    """Extract text from PDF using memory-efficient streaming.
-    
-    This function processes PDFs page-by-page to avoid loading the entire
-    document into memory, preventing OOM errors on large files.
-    
     Args:
-        pdf_path: Path to the PDF file
-        max_pages: Maximum pages to process (prevents abuse)
-        
+        pdf: Path to the PDF file, its raw bytes, or a binary file object
+
     Returns:
-        Extracted text content
-        
+        The path unchanged, or the PDF content as bytes
+    """
+    if isinstance(pdf, (str, bytes)):
+        return pdf
+    if isinstance(pdf, (bytearray, memoryview)):
+        return bytes(pdf)
+    return pdf.read()
+
+
+def _run_poppler(tool: str, options: List[str], pdf: PDFSource, timeout: int, output: Optional[str] = None) -> bytes:
+    """Run a poppler utility and return its stdout.
+
+    In-memory PDFs are piped through stdin (poppler reads ``-`` as stdin), so
+    no temporary file is ever written.
+
     Raises:
-        OCRError: If OCR processing fails
+        OSError: If the tool is not installed
+        subprocess.SubprocessError: If the tool fails or times out
+    """
+    in_memory = isinstance(pdf, bytes)
+    command = [tool] + options + ["-" if in_memory else pdf] + ([output] if output else [])
+    proc = subprocess.run(
+        command,
+        input=pdf if in_memory else None,
+        capture_output=True,
+        timeout=timeout,
+        check=True
+    )
+    return proc.stdout
+
+
+def get_page_count(pdf: Union[str, bytes, BinaryIO]) -> int:
+    """Probe the number of pages in a PDF with a single pdfinfo call.
+
+    Args:
+        pdf: Path to the PDF file, its raw bytes, or a binary file object
+
+    Returns:
+        Number of pages in the document
+
+    Raises:
+        OCRError: If the page count cannot be determined
     """
     try:
-        full_text = []
-        
-        # Process page by page to minimize memory usage
-        for page_num in range(1, max_pages + 1):
-            try:
-                # Convert only one page at a time
-                pages = convert_from_path(
-                    pdf_path, 
-                    dpi=OCR_DPI, 
-                    first_page=page_num,
-                    last_page=page_num
-                )
-                
-                if not pages:
-                    # No more pages
-                    break
-                    
-                # Extract text from this page
-                text = pytesseract.image_to_string(pages[0], config=OCR_PSM_MODE)
-                full_text.append(text)
-                
-            except PDFPageCountError:
-                # Reached end of document
+        info = _run_poppler("pdfinfo", [], read_pdf_source(pdf), timeout=30).decode("utf-8", "replace")
+    except (OSError, subprocess.SubprocessError) as e:
+        raise OCRError(f"Unable to get page count: {e}") from e
+
+    match = re.search(r"^Pages:\s+(\d+)", info, re.MULTILINE)
+    if not match:
+        raise OCRError("Unable to get page count. Is this a valid PDF?")
+    return int(match.group(1))
+
+
+def _read_text_layer(pdf: PDFSource, first_page: int, last_page: int) -> List[str]:
+    """Read the embedded text layer of a page range with one pdftotext call.
+
+    Args:
+        pdf: Path to the PDF file or its raw bytes
+        first_page: First page to read (1-based, inclusive)
+        last_page: Last page to read (inclusive)
+
+    Returns:
+        One string per page (empty for pages without a text layer, or for
+        every page if pdftotext is unavailable or fails)
+    """
+    page_count = last_page - first_page + 1
+    try:
+        output = _run_poppler(
+            "pdftotext",
+            ["-f", str(first_page), "-l", str(last_page), "-enc", "UTF-8"],
+            pdf,
+            timeout=60,
+            output="-"
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Warning: Could not read PDF text layer, falling back to OCR: {e}")
+        return [""] * page_count
+
+    # pdftotext terminates every page with a form feed
+    texts = output.decode("utf-8", "replace").split("\f")[:page_count]
+    return texts + [""] * (page_count - len(texts))
+
+
+def is_plausible_text(text: str) -> bool:
+    """Decide whether an embedded text layer is good enough to skip OCR.
+
+    Scanned faxes often carry no text layer or a junk one (a handful of
+    characters, glyph IDs, replacement characters). Only accept text with
+    enough characters that are mostly letters and digits.
+
+    Args:
+        text: Text layer content of a single page
+
+    Returns:
+        True if the text can be used instead of OCR
+    """
+    chars = [char for char in text if not char.isspace()]
+    if len(chars) < TEXT_LAYER_MIN_CHARS or "\ufffd" in text:
+        return False
+
+    alnum = sum(1 for char in chars if char.isalnum())
+    return alnum / len(chars) >= TEXT_LAYER_MIN_ALNUM_RATIO
+
+
+def _chunk_ranges(page_numbers: List[int], chunk_size: int) -> List[Tuple[int, int]]:
+    """Group sorted page numbers into contiguous ranges of at most chunk_size pages."""
+    ranges: List[Tuple[int, int]] = []
+    for page_num in page_numbers:
+        if ranges and ranges[-1][1] == page_num - 1 and page_num - ranges[-1][0] < chunk_size:
+            ranges[-1] = (ranges[-1][0], page_num)
+        else:
+            ranges.append((page_num, page_num))
+    return ranges
+
+
+def _parse_pgm_stream(data: bytes) -> List[Image.Image]:
+    """Split concatenated binary PGM images (pdftoppm -gray output) into PIL images.
+
+    The images are views on ``data``: pixels are neither copied nor decoded.
+    """
+    images = []
+    view = memoryview(data)
+    offset = 0
+    while offset < len(data):
+        header = _PGM_HEADER.match(data, offset)
+        if not header:
+            raise OCRError("Unexpected output from pdftoppm")
+        width, height = int(header.group(1)), int(header.group(2))
+        start = header.end()
+        if start + width * height > len(data):
+            raise OCRError("Truncated output from pdftoppm")
+        images.append(Image.frombuffer("L", (width, height), view[start:start + width * height], "raw", "L", 0, 1))
+        offset = start + width * height
+    return images
+
+
+def _render_pages(pdf: PDFSource, first_page: int, last_page: int, dpi: int = OCR_DPI) -> List[Tuple[int, Image.Image]]:
+    """Render a contiguous range of pages to raw grayscale images.
+
+    The whole range is rendered with one pdftoppm invocation that writes
+    uncompressed PGM to stdout. If that fails, each page is retried on its
+    own so one corrupt page does not take the rest of the chunk down with it.
+
+    Args:
+        pdf: Path to the PDF file or its raw bytes
+        first_page: First page of the range (1-based, inclusive)
+        last_page: Last page of the range (inclusive)
+        dpi: Render resolution
+
+    Returns:
+        List of (page_number, image) tuples in page order
+    """
+    def render(first: int, last: int) -> List[Image.Image]:
+        options = ["-r", str(dpi), "-f", str(first), "-l", str(last), "-gray"]
+        return _parse_pgm_stream(_run_poppler("pdftoppm", options, pdf, timeout=OCR_RENDER_TIMEOUT_SECONDS))
+
+    try:
+        return list(zip(range(first_page, last_page + 1), render(first_page, last_page)))
+    except Exception as chunk_error:
+        print(f"Warning: Failed to render pages {first_page}-{last_page}: {chunk_error}")
+
+    rendered = []
+    for page_num in range(first_page, last_page + 1):
+        try:
+            pages = render(page_num, page_num)
+            if pages:
+                rendered.append((page_num, pages[0]))
+        except Exception as page_error:
+            print(f"Warning: Failed to render page {page_num}: {page_error}")
+    return rendered
+
+
+def _recognize(image: Image.Image, dpi: int, with_confidence: bool) -> Tuple[str, List[float], int]:
+    """Run Tesseract on one page image and drop low-confidence noise words.
+
+    Args:
+        image: Rendered page image
+        dpi: Resolution the page was rendered at
+        with_confidence: Whether per-word confidences are needed
+
+    Returns:
+        Tuple of (text, per-word confidences 0-100; empty if not requested and
+        noise filtering is off, number of noise words dropped)
+    """
+    text, confidences = _recognize_words(image, dpi, with_confidence or OCR_NOISE_MIN_CONFIDENCE > 0)
+    text, dropped = drop_noise_words(text, confidences)
+    return text, confidences, dropped
+
+
+def _recognize_words(image: Image.Image, dpi: int, with_confidence: bool) -> Tuple[str, List[float]]:
+    """Recognized text of a page image and, if requested, its per-word confidences."""
+    pool = get_worker_pool()
+    if pool is not None:
+        text, confidences = pool.ocr(image, dpi)
+        return text, [float(conf) for conf in confidences]
+
+    if not with_confidence:
+        return pytesseract.image_to_string(image, config=OCR_PSM_MODE), []
+
+    # image_to_data gives word boxes with confidences in a single Tesseract
+    # run; rebuild the line structure from its block/paragraph/line numbers.
+    data = pytesseract.image_to_data(image, config=OCR_PSM_MODE, output_type=Output.DICT)
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for index, word in enumerate(data["text"]):
+        conf = float(data["conf"][index])
+        if conf < 0 or not word.strip():
+            continue
+        confidences.append(conf)
+        line_key = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+        lines.setdefault(line_key, []).append(word)
+
+    return "\n".join(" ".join(words) for words in lines.values()), confidences
+
+
+def _mean_confidence(confidences: List[float]) -> float:
+    """Mean word confidence of a page (0 when nothing was recognized)."""
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+
+def _ocr_page(
+    pdf: PDFSource,
+    page_num: int,
+    image: Image.Image,
+    dpi: int,
+    adaptive: bool,
+    render_seconds: float = 0.0,
+    cancel_event: Optional[threading.Event] = None
+) -> Optional[PageResult]:
+    """OCR a single rendered page, isolating failures to that page.
+
+    In adaptive mode the page is scored by its mean word confidence; while it
+    stays below ``OCR_MIN_CONFIDENCE`` it is re-rendered at the next step of
+    ``OCR_DPI_LADDER`` and OCRed again. The best-scoring attempt wins.
+
+    Args:
+        pdf: Path to the PDF file or its raw bytes (for adaptive re-rendering)
+        page_num: 1-based page number
+        image: Rendered page image
+        dpi: Resolution the image was rendered at
+        adaptive: Re-render low-confidence pages at higher DPI
+        render_seconds: Time already spent rendering this page
+        cancel_event: Skips adaptive retries once set
+
+    Returns:
+        PageResult with the final DPI, confidence and timings, or None if OCR failed
+    """
+    timings = {"render": render_seconds, "ocr": 0.0}
+    try:
+        started = time.perf_counter()
+        text, confidences, noise_words = _recognize(image, dpi, adaptive)
+        timings["ocr"] += time.perf_counter() - started
+        best = PageResult(
+            page_number=page_num,
+            text=text,
+            source=SOURCE_OCR,
+            dpi=dpi,
+            confidence=_mean_confidence(confidences) if confidences or adaptive else None,
+            timings=timings,
+            noise_words=noise_words
+        )
+
+        for next_dpi in (step for step in OCR_DPI_LADDER if step > dpi):
+            if not adaptive or best.confidence >= OCR_MIN_CONFIDENCE:
+                break
+            if cancel_event is not None and cancel_event.is_set():
                 break
-            except Exception as page_error:
-                # Log page-specific error but continue processing
-                print(f"Warning: Failed to process page {page_num}: {page_error}")
-                continue
-        
-        if not full_text:
-            raise OCRError("No text could be extracted from PDF")
-            
-        return "\n".join(full_text)
-        
-    except OCRError:
-        # Re-raise OCRError as-is
-        raise
+            started = time.perf_counter()
+            rendered = _render_pages(pdf, page_num, page_num, next_dpi)
+            timings["render"] += time.perf_counter() - started
+            if not rendered:
+                break
+            started = time.perf_counter()
+            text, confidences, noise_words = _recognize(rendered[0][1], next_dpi, True)
+            timings["ocr"] += time.perf_counter() - started
+            confidence = _mean_confidence(confidences)
+            if confidence >= best.confidence:
+                best = PageResult(
+                    page_number=page_num,
+                    text=text,
+                    source=SOURCE_OCR,
+                    dpi=next_dpi,
+                    confidence=confidence,
+                    timings=timings,
+                    noise_words=noise_words
+                )
+
+        return best
+    except Exception as page_error:
+        # Log page-specific error but continue processing
+        print(f"Warning: Failed to process page {page_num}: {page_error}")
+        return None
+
+
+def _scheduled_ocr_page(owner: Optional[str], *args) -> Optional[PageResult]:
+    """Run _ocr_page once the OCR scheduler grants a slot (None if cancelled while waiting)."""
+    cancel_event = args[-1]
+    with get_ocr_scheduler().slot(owner, cancel_event) as admitted:
+        return _ocr_page(*args) if admitted else None
+
+
+def iter_pages_from_pdf(
+    pdf: Union[str, bytes, BinaryIO],
+    max_pages: int = MAX_PDF_PAGES,
+    workers: int = OCR_WORKERS,
+    use_text_layer: bool = True,
+    char_budget: Optional[int] = None,
+    first_page: int = 1,
+    adaptive_dpi: bool = OCR_ADAPTIVE_DPI,
+    cancel_event: Optional[threading.Event] = None,
+    page_numbers: Optional[Sequence[int]] = None,
+    dpi: Optional[int] = None,
+    owner: Optional[str] = None
+) -> Iterator[PageResult]:
+    """Extract text page by page, yielding each page as soon as it is done.
+
+    Born-digital pages with a plausible text layer are taken as-is. Only the
+    remaining (image-only) pages are rendered in chunks of ``OCR_CHUNK_SIZE``
+    and OCRed on a bounded thread pool (each page is recognized in a separate
+    Tesseract process, so threads are enough to use every core). The next
+    chunk is rendered while the previous one is being OCRed, and at most two
+    chunks of images are held in memory at a time. Pages are yielded in page
+    order, each with its ``render``/``ocr`` timings in seconds.
+
+    When ``char_budget`` is given, OCR stops as soon as the leading pages
+    already hold that many characters; the pages after that point are
+    yielded with source ``skipped`` and can be picked up later by calling
+    again with ``first_page`` set to the first skipped page.
+
+    With ``adaptive_dpi`` pages are first rendered at the lowest step of
+    ``OCR_DPI_LADDER`` and only low-confidence pages are re-rendered higher.
+
+    Setting ``cancel_event`` (or closing the generator) stops the extraction:
+    no further pages are rendered and queued OCR work is dropped at once.
+
+    ``page_numbers`` restricts the extraction to a subset of pages (e.g. the
+    ones picked by relevance triage); ``dpi`` overrides the render resolution.
+
+    Every chunk render and page OCR first waits for a slot of the
+    process-wide OCR scheduler, which shares the cores fairly between the
+    ``owner`` of this extraction and everyone else's.
+
+    In-memory PDFs (bytes or file objects) are piped to poppler through stdin
+    and pages travel as raw pixel buffers, so nothing touches the disk.
+
+    Args:
+        pdf: Path to the PDF file, its raw bytes, or a binary file object
+        max_pages: Maximum pages to process (prevents abuse)
+        workers: Maximum number of pages OCRed concurrently (1 = sequential)
+        use_text_layer: Use embedded text where plausible instead of OCR
+        char_budget: Stop OCR once this many characters are extracted
+        first_page: First page to extract (1-based)
+        adaptive_dpi: Start at a low DPI and re-render low-confidence pages
+        cancel_event: Event that aborts the extraction when set
+        page_numbers: Only extract these pages (default: all pages)
+        dpi: Render resolution (default: OCR_DPI, or the lowest ladder step in adaptive mode)
+        owner: User the extraction runs for (OCR slots are shared fairly per owner)
+
+    Yields:
+        One PageResult per extracted page from first_page on, in page order
+
+    Raises:
+        OCRError: If the PDF cannot be opened at all
+    """
+    pdf = read_pdf_source(pdf)
+    try:
+        last_page = min(get_page_count(pdf), max_pages)
     except Exception as e:
         raise OCRError(f"Failed to extract text from PDF: {str(e)}") from e
+
+    first_page = max(1, first_page)
+    workers = max(1, workers)
+    wanted = range(first_page, last_page + 1)
+    if page_numbers is not None:
+        wanted = sorted(set(page_numbers).intersection(wanted))
+    results: List[PageResult] = [
+        PageResult(page_number=page_num, text="", source=SOURCE_PENDING)
+        for page_num in wanted
+    ]
+    index_of = {result.page_number: index for index, result in enumerate(results)}
+
+    if use_text_layer and results:
+        started = time.perf_counter()
+        range_first, range_last = results[0].page_number, results[-1].page_number
+        texts = _read_text_layer(pdf, range_first, range_last)
+        per_page = (time.perf_counter() - started) / len(results)
+        for result in results:
+            text = texts[result.page_number - range_first]
+            if is_plausible_text(text):
+                result.text = text
+                result.source = SOURCE_TEXT_LAYER
+                result.timings = {"text_layer": per_page}
+
+    emitted = 0
+    emitted_chars = 0
+
+    def ready_pages() -> Iterator[PageResult]:
+        # Yield the contiguous run of finished pages that follows the last yielded one
+        nonlocal emitted, emitted_chars
+        while emitted < len(results) and results[emitted].source != SOURCE_PENDING:
+            emitted_chars += len(results[emitted].text)
+            emitted += 1
+            yield results[emitted - 1]
+
+    def collect(page_num: int, future: Future) -> None:
+        page = future.result()
+        if page is None:
+            results[index_of[page_num]].source = SOURCE_FAILED
+        else:
+            results[index_of[page_num]] = page
+
+    def budget_filled() -> bool:
+        return char_budget is not None and emitted_chars >= char_budget
+
+    def cancelled() -> bool:
+        return cancel_event is not None and cancel_event.is_set()
+
+    render_dpi = dpi or (min(OCR_DPI_LADDER) if adaptive_dpi else OCR_DPI)
+    ocr_pages = [result.page_number for result in results if result.source == SOURCE_PENDING]
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        yield from ready_pages()
+        in_flight: List[Tuple[int, Future]] = []
+
+        for chunk_first, chunk_last in _chunk_ranges(ocr_pages, OCR_CHUNK_SIZE):
+            if budget_filled() or cancelled():
+                break
+            with get_ocr_scheduler().slot(owner, cancel_event) as admitted:
+                if not admitted:
+                    return
+                started = time.perf_counter()
+                pages = _render_pages(pdf, chunk_first, chunk_last, render_dpi)
+            render_seconds = (time.perf_counter() - started) / (chunk_last - chunk_first + 1)
+            rendered = {page_num for page_num, _ in pages}
+            for page_num in range(chunk_first, chunk_last + 1):
+                if page_num not in rendered:
+                    results[index_of[page_num]].source = SOURCE_FAILED
+
+            # Wait for the previous chunk before queueing this one so only
+            # two chunks of page images are alive at once.
+            for page_num, future in in_flight:
+                collect(page_num, future)
+                yield from ready_pages()
+                if cancelled():
+                    return
+            in_flight = []
+            if budget_filled():
+                break
+            in_flight = [
+                (page_num, executor.submit(
+                    _scheduled_ocr_page, owner, pdf, page_num, image, render_dpi, adaptive_dpi, render_seconds,
+                    cancel_event
+                ))
+                for page_num, image in pages
+            ]
+
+        for page_num, future in in_flight:
+            if cancelled():
+                return
+            collect(page_num, future)
+            yield from ready_pages()
+
+        if cancelled():
+            return
+
+        # Once the budget is filled, everything after it is left for a later
+        # call starting at the first skipped page (text layer pages included,
+        # so the extracted text always covers a contiguous page range).
+        if budget_filled():
+            for index in range(emitted, len(results)):
+                results[index] = PageResult(page_number=results[index].page_number, text="", source=SOURCE_SKIPPED)
+        yield from ready_pages()
+    finally:
+        # Release queued page work immediately; pages already running finish on their own
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pages_from_pdf(
+    pdf: Union[str, bytes, BinaryIO],
+    max_pages: int = MAX_PDF_PAGES,
+    workers: int = OCR_WORKERS,
+    use_text_layer: bool = True,
+    char_budget: Optional[int] = None,
+    first_page: int = 1,
+    adaptive_dpi: bool = OCR_ADAPTIVE_DPI,
+    page_numbers: Optional[Sequence[int]] = None,
+    owner: Optional[str] = None
+) -> List[PageResult]:
+    """Extract text from every page and return all results at once.
+
+    See iter_pages_from_pdf for the meaning of the arguments.
+
+    Returns:
+        One PageResult per extracted page from first_page on, in page order
+
+    Raises:
+        OCRError: If the PDF cannot be opened at all
+    """
+    return list(iter_pages_from_pdf(
+        pdf,
+        max_pages=max_pages,
+        workers=workers,
+        use_text_layer=use_text_layer,
+        char_budget=char_budget,
+        first_page=first_page,
+        adaptive_dpi=adaptive_dpi,
+        page_numbers=page_numbers,
+        owner=owner
+    ))
+
+
+def join_pages(pages: List[PageResult]) -> str:
+    """Join the text of all successfully extracted pages in page order."""
+    return "\n".join(page.text for page in pages if page.source in (SOURCE_TEXT_LAYER, SOURCE_OCR))
+
+
+def page_texts(pages: List[PageResult]) -> Dict[int, str]:
+    """Text of each successfully extracted page, by page number."""
+    return {page.page_number: page.text for page in pages if page.source in (SOURCE_TEXT_LAYER, SOURCE_OCR)}
+
+
+def join_page_texts(texts: Dict[int, str]) -> str:
+    """Join page texts (e.g. merged from separate extraction passes) in page order."""
+    return "\n".join(texts[page_number] for page_number in sorted(texts))
+
+
+def normalize_extracted_pages(pages: List[PageResult]) -> Tuple[List[PageResult], NormalizationReport]:
+    """Normalize the text of the extracted pages (see text_normalizer.normalize_pages).
+
+    Args:
+        pages: Results from extract_pages_from_pdf
+
+    Returns:
+        Tuple of (copies of the pages with normalized text, report)
+    """
+    extracted = [page for page in pages if page.source in (SOURCE_TEXT_LAYER, SOURCE_OCR)]
+    texts, report = normalize_pages(
+        [page.text for page in extracted], noise_words=sum(page.noise_words for page in pages)
+    )
+    normalized = {page.page_number: text for page, text in zip(extracted, texts)}
+    return [
+        replace(page, text=normalized[page.page_number]) if page.page_number in normalized else page
+        for page in pages
+    ], report
+
+
+def next_unextracted_page(pages: List[PageResult]) -> Optional[int]:
+    """Return the first page skipped because of a char budget, if any."""
+    for page in pages:
+        if page.source == SOURCE_SKIPPED:
+            return page.page_number
+    return None
+
+
+def unextracted_pages(pages: List[PageResult]) -> List[int]:
+    """Return every page skipped because of a char budget or relevance triage."""
+    return [page.page_number for page in pages if page.source == SOURCE_SKIPPED]
+
+
+def summarize_extraction(pages: List[PageResult]) -> Dict:
+    """Summarize which extraction path each page took.
+
+    Args:
+        pages: Results from extract_pages_from_pdf
+
+    Returns:
+        Dictionary with per-page sources and the text layer hit rate
+    """
+    counts = {SOURCE_TEXT_LAYER: 0, SOURCE_OCR: 0, SOURCE_FAILED: 0, SOURCE_SKIPPED: 0}
+    for page in pages:
+        counts[page.source] += 1
+
+    extracted = len(pages) - counts[SOURCE_SKIPPED]
+    ocr_dpis = [page.dpi for page in pages if page.source == SOURCE_OCR and page.dpi]
+    return {
+        "pages": [
+            {
+                "page": page.page_number,
+                "source": page.source,
+                "chars": len(page.text),
+                "dpi": page.dpi,
+                "confidence": page.confidence,
+                "timings": page.timings,
+                "relevance": page.relevance,
+                "signals": page.signals,
+            }
+            for page in pages
+        ],
+        "text_layer_pages": counts[SOURCE_TEXT_LAYER],
+        "ocr_pages": counts[SOURCE_OCR],
+        "failed_pages": counts[SOURCE_FAILED],
+        "skipped_pages": counts[SOURCE_SKIPPED],
+        "text_layer_hit_rate": counts[SOURCE_TEXT_LAYER] / extracted if extracted else 0.0,
+        "average_ocr_dpi": sum(ocr_dpis) / len(ocr_dpis) if ocr_dpis else None,
+        "extraction_seconds": sum(sum(page.timings.values()) for page in pages),
+    }
+
+
+def extract_text_from_pdf(
+    pdf: Union[str, bytes, BinaryIO],
+    max_pages: int = MAX_PDF_PAGES,
+    workers: int = OCR_WORKERS
+) -> str:
+    """Extract text from PDF using the text layer where possible and parallel OCR elsewhere.
+
+    Args:
+        pdf: Path to the PDF file, its raw bytes, or a binary file object
+        max_pages: Maximum pages to process (prevents abuse)
+        workers: Maximum number of pages OCRed concurrently (1 = sequential)
+
+    Returns:
+        Extracted text content, in page order
+
+    Raises:
+        OCRError: If OCR processing fails
+    """
+    pages = extract_pages_from_pdf(pdf, max_pages=max_pages, workers=workers)
+    text = join_pages(normalize_extracted_pages(pages)[0])
+    if not text:
+        raise OCRError("No text could be extracted from PDF")
+
+    return text
@@ -0,0 +1,192 @@
+"""Process-wide admission control for OCR work.
+
+Every extraction renders pages with pdftoppm and recognizes them with
+Tesseract, and each one would otherwise start as many of those as it likes:
+a few simultaneous uploads oversubscribe the CPU and every user's latency
+collapses. Each page render or OCR task takes one of OCR_MAX_CONCURRENT_TASKS
+slots (one per core) before it starts. Waiting tasks are granted slots round
+robin across users, so a 50-page packet does not hold up everyone else's
+single-page letter.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+from src.constants import OCR_MAX_CONCURRENT_TASKS, OCR_MAX_WAITING_TASKS
+from src.errors import QueueFullError
+
+ANONYMOUS_OWNER = "anonymous"
+
+_WAIT_SAMPLES = 500
+_TASK_SECONDS_SMOOTHING = 0.2
+
+
+class OCRScheduler:
+    """Fair counting semaphore for OCR tasks, with queue metrics."""
+
+    def __init__(
+        self,
+        capacity: int = OCR_MAX_CONCURRENT_TASKS,
+        max_waiting: int = OCR_MAX_WAITING_TASKS,
+        initial_task_seconds: float = 1.0
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            capacity: Tasks allowed to run at the same time
+            max_waiting: Waiting tasks above which check_admission rejects new work
+            initial_task_seconds: Task duration assumed for ETAs until one has been measured
+        """
+        self.capacity = max(1, capacity)
+        self.max_waiting = max_waiting
+        self._cond = threading.Condition()
+        self._active = 0
+        # Owners with waiting tasks, in the order they get their next slot
+        self._waiting: "OrderedDict[str, Deque[object]]" = OrderedDict()
+        self._task_seconds = initial_task_seconds
+        self._wait_seconds: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self._stats = {"granted": 0, "rejected": 0, "abandoned": 0, "max_waiting_seen": 0}
+
+    def check_admission(self) -> None:
+        """Reject new work up front when the OCR queue is already full.
+
+        Raises:
+            QueueFullError: If max_waiting tasks are already waiting for a slot
+        """
+        with self._cond:
+            if self._waiting_count() >= self.max_waiting:
+                self._stats["rejected"] += 1
+                raise QueueFullError(
+                    "All OCR capacity is in use and the queue is full. Please try again in a minute."
+                )
+
+    def acquire(self, owner: Optional[str] = None, cancel_event: Optional[threading.Event] = None) -> bool:
+        """Wait for a slot.
+
+        Args:
+            owner: User the task runs for (fairness is per owner)
+            cancel_event: Stops waiting when set
+
+        Returns:
+            True once a slot is held, False if cancel_event was set first
+        """
+        owner = owner or ANONYMOUS_OWNER
+        ticket = object()
+        enqueued = time.monotonic()
+        with self._cond:
+            self._waiting.setdefault(owner, deque()).append(ticket)
+            self._stats["max_waiting_seen"] = max(self._stats["max_waiting_seen"], self._waiting_count())
+            while not (self._active < self.capacity and self._is_next(owner, ticket)):
+                if cancel_event is not None and cancel_event.is_set():
+                    self._remove(owner, ticket)
+                    self._stats["abandoned"] += 1
+                    self._cond.notify_all()
+                    return False
+                # Timed wait so a cancellation is noticed without a notify
+                self._cond.wait(timeout=0.5)
+
+            # Served: this owner moves to the back of the line
+            tickets = self._waiting.pop(owner)
+            tickets.popleft()
+            if tickets:
+                self._waiting[owner] = tickets
+            self._active += 1
+            self._stats["granted"] += 1
+            self._wait_seconds.append(time.monotonic() - enqueued)
+            self._cond.notify_all()
+        return True
+
+    def release(self, task_seconds: Optional[float] = None) -> None:
+        """Return a slot.
+
+        Args:
+            task_seconds: How long the task held the slot (feeds the ETA estimate)
+        """
+        with self._cond:
+            self._active -= 1
+            if task_seconds is not None:
+                self._task_seconds += _TASK_SECONDS_SMOOTHING * (task_seconds - self._task_seconds)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, owner: Optional[str] = None, cancel_event: Optional[threading.Event] = None) -> Iterator[bool]:
+        """Hold a slot for the duration of a with block.
+
+        Yields:
+            True if the slot is held, False if the wait was cancelled (the task should not run)
+        """
+        if not self.acquire(owner, cancel_event):
+            yield False
+            return
+        started = time.monotonic()
+        try:
+            yield True
+        finally:
+            self.release(time.monotonic() - started)
+
+    def position(self, owner: Optional[str] = None) -> Optional[int]:
+        """1-based place of the owner's next waiting task in line (None if it has none waiting)."""
+        owner = owner or ANONYMOUS_OWNER
+        with self._cond:
+            for position, waiting_owner in enumerate(self._waiting, start=1):
+                if waiting_owner == owner:
+                    return position
+        return None
+
+    def eta_seconds(self, owner: Optional[str] = None) -> Optional[float]:
+        """Estimated wait until the owner's next task gets a slot (None if it has none waiting)."""
+        position = self.position(owner)
+        if position is None:
+            return None
+        with self._cond:
+            free = self.capacity - self._active
+            if position <= free:
+                return 0.0
+            # Each round of capacity grants takes about one task duration
+            return math.ceil((position - free) / self.capacity) * self._task_seconds
+
+    def stats(self) -> Dict:
+        """Return queue depth, wait-time percentiles and counters."""
+        with self._cond:
+            waits = sorted(self._wait_seconds)
+            stats = dict(self._stats)
+            stats.update({
+                "capacity": self.capacity,
+                "active": self._active,
+                "waiting": self._waiting_count(),
+                "waiting_owners": len(self._waiting),
+                "task_seconds": round(self._task_seconds, 3),
+                "wait_p50_seconds": round(waits[len(waits) // 2], 3) if waits else None,
+                "wait_p95_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else None,
+            })
+        return stats
+
+    def _is_next(self, owner: str, ticket: object) -> bool:
+        next_owner = next(iter(self._waiting))
+        return next_owner == owner and self._waiting[owner][0] is ticket
+
+    def _remove(self, owner: str, ticket: object) -> None:
+        tickets = self._waiting[owner]
+        tickets.remove(ticket)
+        if not tickets:
+            del self._waiting[owner]
+
+    def _waiting_count(self) -> int:
+        return sum(len(tickets) for tickets in self._waiting.values())
+
+
+_scheduler: Optional[OCRScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_ocr_scheduler() -> OCRScheduler:
+    """Return the process-wide OCR scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = OCRScheduler()
+    return _scheduler
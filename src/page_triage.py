@@ -0,0 +1,160 @@
+"""Relevance triage for long denial packets.
+
+Appeal packets often bury the denial rationale in one or two pages among
+EOB tables, policy excerpts and legal boilerplate. Triage reads every page
+cheaply (embedded text layer, or OCR at PAGE_TRIAGE_DPI), scores it for
+denial signals, and only the top-ranked pages get full-resolution OCR and
+a place in the LLM context.
+"""
+import re
+import threading
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from src.constants import MAX_PDF_PAGES, PAGE_TRIAGE_DPI, PAGE_TRIAGE_MIN_PAGES
+from src.ocr_engine import (
+    iter_pages_from_pdf, get_page_count, read_pdf_source, PageResult,
+    SOURCE_OCR, SOURCE_SKIPPED
+)
+
+DENIAL_SIGNALS: List[Tuple[str, "re.Pattern", float]] = [
+    # Claim Adjustment Reason Codes, e.g. "CO-50", "PR 96"
+    ("carc", re.compile(r"\b(?:CO|PR|OA|PI|CR)[\s-]?\d{1,3}\b"), 3.0),
+    # Remittance Advice Remark Codes, e.g. "N115", "MA130" (not ICD-10 codes such as "M54.16")
+    ("rarc", re.compile(r"\b(?:MA|M|N)\d{1,3}\b(?!\.\d)"), 1.5),
+    ("medical_necessity", re.compile(r"\bnot\s+medically\s+necessary\b|\bmedical\s+necessity\b", re.IGNORECASE), 4.0),
+    ("denied", re.compile(r"\bden(?:ied|ial|y)\b|\badverse\s+(?:benefit\s+)?determination\b", re.IGNORECASE), 2.0),
+    ("claim_number", re.compile(r"\bclaim\s*(?:number|no\.?|#|id)\s*:?\s*[A-Z0-9-]{5,}", re.IGNORECASE), 2.0),
+    ("date_of_service", re.compile(r"\bdates?\s+of\s+service\b|(?-i:\bDOS\b)", re.IGNORECASE), 1.5),
+    ("appeal", re.compile(r"\bappeal(?:s|ed)?\b", re.IGNORECASE), 1.0),
+    ("reason_code", re.compile(r"\b(?:reason|remark|adjustment)\s+codes?\b", re.IGNORECASE), 1.0),
+]
+"""(name, pattern, weight) of every signal a page is scored on."""
+
+_MAX_COUNT_PER_SIGNAL = 3
+"""Repetitions of one signal beyond this add nothing (keeps EOB tables from dominating)."""
+
+
+def score_page(text: str) -> Tuple[float, Dict[str, int]]:
+    """Score a page's text for denial signals.
+
+    Args:
+        text: Page text (triage quality is enough)
+
+    Returns:
+        Tuple of (score, match count per signal that was found)
+    """
+    signals: Dict[str, int] = {}
+    score = 0.0
+    for name, pattern, weight in DENIAL_SIGNALS:
+        count = len(pattern.findall(text))
+        if count:
+            signals[name] = count
+            score += weight * min(count, _MAX_COUNT_PER_SIGNAL)
+    return score, signals
+
+
+def select_pages(pages: List[PageResult], char_budget: int) -> List[int]:
+    """Pick the highest-scoring pages until their text fills the budget.
+
+    Pages without any denial signal are never picked, so an empty list means
+    nothing in the document looked like a denial.
+
+    Args:
+        pages: Scored triage results
+        char_budget: Characters the LLM context can hold
+
+    Returns:
+        Selected page numbers, in page order
+    """
+    candidates = [page for page in pages if page.relevance]
+    candidates.sort(key=lambda page: (-page.relevance, page.page_number))
+
+    selected: List[int] = []
+    chars = 0
+    for page in candidates:
+        if chars >= char_budget:
+            break
+        selected.append(page.page_number)
+        chars += len(page.text)
+    return sorted(selected)
+
+
+def iter_ranked_pages(
+    pdf: Union[str, bytes, BinaryIO],
+    char_budget: int,
+    max_pages: int = MAX_PDF_PAGES,
+    cancel_event: Optional[threading.Event] = None,
+    owner: Optional[str] = None
+) -> Iterator[PageResult]:
+    """Extract only the most relevant pages of a document.
+
+    Every page is first read at triage quality and scored; the pages picked
+    by select_pages are then extracted at full quality (text layer pages are
+    reused as-is). All other pages are yielded with source ``skipped``.
+    Short documents, and documents with no denial signal at all, fall back to
+    the front-to-back budgeted extraction.
+
+    Args:
+        pdf: Path to the PDF file, its raw bytes, or a binary file object
+        char_budget: Characters the LLM context can hold
+        max_pages: Maximum pages to process (prevents abuse)
+        cancel_event: Event that aborts the extraction when set
+        owner: User the extraction runs for (for fair OCR scheduling)
+
+    Yields:
+        One PageResult per page, in page order, each carrying its relevance score
+    """
+    pdf = read_pdf_source(pdf)
+    if get_page_count(pdf) <= PAGE_TRIAGE_MIN_PAGES:
+        yield from iter_pages_from_pdf(
+            pdf, max_pages=max_pages, char_budget=char_budget, cancel_event=cancel_event, owner=owner
+        )
+        return
+
+    triage = list(iter_pages_from_pdf(
+        pdf, max_pages=max_pages, adaptive_dpi=False, dpi=PAGE_TRIAGE_DPI, cancel_event=cancel_event,
+        owner=owner
+    ))
+    if cancel_event is not None and cancel_event.is_set():
+        return
+    for page in triage:
+        page.relevance, page.signals = score_page(page.text)
+
+    selected = select_pages(triage, char_budget)
+    if not selected:
+        yield from iter_pages_from_pdf(
+            pdf, max_pages=max_pages, char_budget=char_budget, cancel_event=cancel_event, owner=owner
+        )
+        return
+
+    # Text layer pages are already final; low-DPI OCR pages are redone at full quality
+    rescan = [page.page_number for page in triage if page.page_number in selected and page.source == SOURCE_OCR]
+    full = iter_pages_from_pdf(
+        pdf, max_pages=max_pages, use_text_layer=False, page_numbers=rescan, cancel_event=cancel_event,
+        owner=owner
+    )
+    try:
+        for page in triage:
+            if page.page_number not in selected:
+                yield PageResult(
+                    page_number=page.page_number,
+                    text="",
+                    source=SOURCE_SKIPPED,
+                    relevance=page.relevance,
+                    signals=page.signals
+                )
+            elif page.page_number not in rescan:
+                yield page
+            else:
+                result = next(full, None)
+                if result is None:
+                    # Cancelled while rescanning
+                    return
+                result.relevance, result.signals = page.relevance, page.signals
+                result.timings = {
+                    **{f"triage_{name}": seconds for name, seconds in page.timings.items()},
+                    **result.timings
+                }
+                yield result
+    finally:
+        full.close()
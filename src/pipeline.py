@@ -1,45 +1,363 @@
-from src.ocr_engine import extract_text_from_pdf
+import threading
+from dataclasses import dataclass
+from src.ocr_engine import (
+    extract_pages_from_pdf, iter_pages_from_pdf, summarize_extraction, join_pages, next_unextracted_page, page_texts,
+    unextracted_pages, normalize_extracted_pages, read_pdf_source, PageResult
+)
+from src.ocr_cache import OCRCache, cache_key
+from src.page_triage import iter_ranked_pages
 from src.llm_engine import CloudLLM
-from src.constants import MAX_CONTEXT_LENGTH
+from src.constants import MAX_CONTEXT_LENGTH, MAX_CONTEXT_TOKENS, MAX_PDF_PAGES, PAGE_TRIAGE_ENABLED
+from src.context_builder import CompressedContext, compress_context, count_tokens
+from src.denial_extraction import DenialRecord, DenialRecordCache, extract_denial_record
+from src.letter_template import build_letter
+from src.text_normalizer import NormalizationReport
 from src.errors import OCRError, LLMError
-from typing import Dict, Optional
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+
+class DraftStream:
+    """Iterable over the pieces of an appeal letter as they are produced.
+
+    Once iteration has finished, ``result`` holds the same dictionary that
+    draft_from_pages would have returned (with the complete 'draft').
+    """
+
+    def __init__(self, deltas: Iterator[str], build_result: Callable[[str], Dict]):
+        self._deltas = deltas
+        self._build_result = build_result
+        self.result: Optional[Dict] = None
+
+    def __iter__(self) -> Iterator[str]:
+        parts = []
+        for delta in self._deltas:
+            parts.append(delta)
+            yield delta
+        self.result = self._build_result("".join(parts))
+
+
+@dataclass
+class DraftInput:
+    """What drafting works from: the document text and the denial record read from it."""
+
+    raw_text: str
+    page_texts: Dict[int, str]
+    normalization: NormalizationReport
+    compressed: CompressedContext
+    record: DenialRecord
+    record_cached: bool = False
 
 
 class MediSyncPipeline:
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        ocr_cache: Optional[OCRCache] = None,
+        record_cache: Optional[DenialRecordCache] = None
+    ):
         """Initialize MediSync processing pipeline.
-        
+
         Args:
             api_key: Groq API key for LLM
+            ocr_cache: Optional cache for OCR results of previously seen PDFs
+            record_cache: Optional cache of denial records, reused when an appeal is regenerated
         """
         self.llm = CloudLLM(api_key)
+        self.ocr_cache = ocr_cache
+        self.record_cache = record_cache
+
+    def stream_pages(
+        self,
+        pdf: Union[str, bytes, BinaryIO],
+        full_context: bool = False,
+        cancel_event: Optional[threading.Event] = None,
+        owner: Optional[str] = None
+    ) -> Iterator[PageResult]:
+        """Yield extracted pages one at a time, reusing a cached result for identical PDF content.
+
+        Unless ``full_context`` is set, long documents go through relevance
+        triage: only the pages with the strongest denial signals are fully
+        extracted, and every page carries its relevance score.
+
+        Args:
+            pdf: Path to the PDF file, its raw bytes, or a binary file object
+            full_context: Extract every page instead of stopping at the LLM budget
+            cancel_event: Event that aborts the extraction when set
+            owner: User the extraction runs for (OCR capacity is shared fairly per user)
+
+        Yields:
+            PageResult per page, in page order
+        """
+        char_budget = None if full_context else MAX_CONTEXT_LENGTH
+        ranked = PAGE_TRIAGE_ENABLED and not full_context
+        pdf = read_pdf_source(pdf)
+        key = None
+        if self.ocr_cache is not None:
+            if isinstance(pdf, bytes):
+                pdf_bytes = pdf
+            else:
+                with open(pdf, "rb") as f:
+                    pdf_bytes = f.read()
+            key = cache_key(pdf_bytes, 1, MAX_PDF_PAGES, char_budget, ranked)
+            cached = self.ocr_cache.get(key)
+            if cached is not None:
+                yield from cached
+                return
+
+        if ranked:
+            extraction = iter_ranked_pages(pdf, MAX_CONTEXT_LENGTH, cancel_event=cancel_event, owner=owner)
+        else:
+            extraction = iter_pages_from_pdf(pdf, char_budget=char_budget, cancel_event=cancel_event, owner=owner)
+
+        pages = []
+        for page in extraction:
+            pages.append(page)
+            yield page
+
+        # Only complete extractions are cached (not cancelled ones)
+        if key is not None and not (cancel_event is not None and cancel_event.is_set()):
+            self.ocr_cache.put(key, pages)
+
+    def draft_from_pages(self, pages: List[PageResult], advocate_details: Optional[Dict] = None) -> Dict:
+        """Generate an appeal from already extracted pages.
 
-    def process_file(self, file_path: str, advocate_details: Optional[Dict] = None) -> Dict:
-        """Process a denial letter PDF and generate an appeal.
-        
         Args:
-            file_path: Path to the PDF file
+            pages: Extracted pages, in page order
             advocate_details: Optional dict with name, title, address
-            
+
         Returns:
-            Dictionary with 'draft' and 'context' keys
-            
+            Dictionary with 'draft', 'context', 'extraction', 'normalization',
+            'compression', 'denial_record', 'prompt_version', 'page_texts',
+            'next_page' and 'remaining_pages' keys. 'extraction' reports which pages came from
+            the PDF text layer and which needed OCR, with per-page relevance
+            scores; 'normalization' reports the text size before and after
+            header/footer, hyphenation and noise clean-up; 'compression' reports
+            the document tokens and the tokens of the drafting context;
+            'denial_record' holds the fields the appeal was drafted from;
+            'prompt_version' identifies the prompt template; 'page_texts' maps
+            each extracted page number to its text; 'next_page' is the first
+            page not yet extracted (or None) and 'remaining_pages' lists every
+            page not yet extracted.
+
         Raises:
-            OCRError: If OCR processing fails
+            OCRError: If no text was extracted
             LLMError: If appeal generation fails
         """
         if advocate_details is None:
             advocate_details = {}
 
-        # 1. OCR - Extract text from PDF
-        raw_text = extract_text_from_pdf(file_path)
+        draft_input = self._build_input(pages)
+        # The LLM writes the body; header and signature are rendered locally
+        letter = build_letter(advocate_details, draft_input.record)
+        body = self.llm.draft_appeal(self._format_context(draft_input.record), advocate_details)
+        return self._build_result(letter.render(body), pages, draft_input)
+
+    def stream_draft_from_pages(self, pages: List[PageResult], advocate_details: Optional[Dict] = None) -> DraftStream:
+        """Generate an appeal from already extracted pages, streaming the letter as it is written.
+
+        Args:
+            pages: Extracted pages, in page order
+            advocate_details: Optional dict with name, title, address
+
+        Returns:
+            DraftStream yielding text deltas; its 'result' is filled in once the
+            letter is complete (same keys as draft_from_pages)
+
+        Raises:
+            OCRError: If no text was extracted
+            LLMError: If appeal generation fails (raised while iterating)
+        """
+        if advocate_details is None:
+            advocate_details = {}
+
+        draft_input = self._build_input(pages)
+        letter = build_letter(advocate_details, draft_input.record)
+        body: List[str] = []
+
+        def deltas() -> Iterator[str]:
+            # The header is shown at once, before the first LLM token arrives
+            yield letter.opening
+            for delta in self.llm.stream_appeal(self._format_context(draft_input.record), advocate_details):
+                body.append(delta)
+                yield delta
+            yield letter.closing
+
+        return DraftStream(
+            deltas(),
+            lambda _: self._build_result(letter.render("".join(body)), pages, draft_input)
+        )
+
+    def _build_input(self, pages: List[PageResult]) -> DraftInput:
+        """Normalize and join the extracted pages and extract the denial record from them."""
+        # Strip running headers/footers, hyphenation and noise before anything is counted
+        normalized, normalization = normalize_extracted_pages(pages)
+        raw_text = join_pages(normalized)
         if not raw_text.strip():
             raise OCRError("OCR returned empty text. Is the PDF readable?")
 
+        # Keep the most informative spans within the token budget
+        compressed = compress_context(raw_text, MAX_CONTEXT_TOKENS)
+        record = self.record_cache.get(raw_text) if self.record_cache is not None else None
+        if record is not None:
+            return DraftInput(raw_text, page_texts(normalized), normalization, compressed, record, record_cached=True)
+        record, cacheable = self._extract_record(raw_text, compressed)
+        if self.record_cache is not None and cacheable:
+            self.record_cache.put(raw_text, record)
+        return DraftInput(raw_text, page_texts(normalized), normalization, compressed, record)
+
+    def _extract_record(self, raw_text: str, compressed: CompressedContext) -> Tuple[DenialRecord, bool]:
+        """Read the denial fields locally, asking the LLM only when the rules miss the rationale.
+
+        Returns:
+            Tuple of (record, whether it may be cached); a record completed
+            without the LLM because its call failed is not cached, so the next
+            run retries
+        """
+        record = extract_denial_record(raw_text)
+        if record.complete:
+            return record, True
+        cacheable = True
+        try:
+            record.merge(self.llm.extract_denial_fields(compressed.text))
+            record.source = "rules+llm"
+        except LLMError as e:
+            print(f"Warning: Denial field extraction failed, drafting from the rule-based record: {e}")
+            cacheable = False
+        if not record.complete:
+            # Nothing says why the claim was denied: let drafting see the selected text itself
+            record.evidence = [line for line in compressed.text.split("\n") if line and line != "[...]"]
+        return record, cacheable
+
+    @staticmethod
+    def _format_context(record: DenialRecord) -> str:
+        """The denial context as it is placed in the prompt."""
+        return f"DENIAL RECORD:\n{record.to_prompt()}"
+
+    def _build_result(self, draft: str, pages: List[PageResult], draft_input: DraftInput) -> Dict:
+        """Assemble the result dictionary returned to callers."""
+        compression = draft_input.compressed.report()
+        compression["draft_context_tokens"] = count_tokens(self._format_context(draft_input.record))
+        record = draft_input.record.to_dict()
+        record["cached"] = draft_input.record_cached
+        return {
+            "draft": draft,
+            "context": draft_input.raw_text,
+            "page_texts": draft_input.page_texts,
+            "extraction": summarize_extraction(pages),
+            "normalization": draft_input.normalization.report(),
+            "compression": compression,
+            "denial_record": record,
+            "prompt_version": self.llm.prompt.id,
+            "next_page": next_unextracted_page(pages),
+            "remaining_pages": unextracted_pages(pages),
+        }
+
+    def process_file(
+        self,
+        pdf: Union[str, bytes, BinaryIO],
+        advocate_details: Optional[Dict] = None,
+        full_context: bool = False
+    ) -> Dict:
+        """Process a denial letter PDF and generate an appeal.
+
+        By default OCR stops once MAX_CONTEXT_LENGTH characters are extracted,
+        since nothing past that point reaches the LLM. The remaining pages can
+        be extracted later with extract_remaining_context.
+
+        Uploaded files can be passed as bytes or file objects; they are
+        processed entirely in memory without a temporary file.
+
+        Args:
+            pdf: Path to the PDF file, its raw bytes, or a binary file object
+            advocate_details: Optional dict with name, title, address
+            full_context: Extract every page instead of stopping at the LLM budget
+
+        Returns:
+            Dictionary with 'draft', 'context', 'extraction', 'normalization',
+            'compression', 'denial_record', 'prompt_version', 'page_texts',
+            'next_page' and 'remaining_pages' keys. 'extraction' reports which pages came from
+            the PDF text layer and which needed OCR, with per-page relevance
+            scores; 'normalization' reports the text size before and after
+            header/footer, hyphenation and noise clean-up; 'compression' reports
+            the document tokens and the tokens of the drafting context;
+            'denial_record' holds the fields the appeal was drafted from;
+            'prompt_version' identifies the prompt template; 'page_texts' maps
+            each extracted page number to its text; 'next_page' is the first
+            page not yet extracted (or None) and 'remaining_pages' lists every
+            page not yet extracted.
+
+        Raises:
+            OCRError: If OCR processing fails
+            LLMError: If appeal generation fails
+        """
+        # 1. OCR - Extract text from PDF (text layer first, OCR for image-only pages)
+        pages = list(self.stream_pages(pdf, full_context=full_context))
+
         # 2. Generate appeal using LLM
-        # Truncate to max context length to stay within token limits
-        context = f"DENIAL LETTER CONTENT:\n{raw_text[:MAX_CONTEXT_LENGTH]}"
-        
-        draft = self.llm.draft_appeal(context, advocate_details)
-        
-        return {"draft": draft, "context": raw_text}
\ No newline at end of file
+        return self.draft_from_pages(pages, advocate_details)
+
+    def stream_process_file(
+        self,
+        pdf: Union[str, bytes, BinaryIO],
+        advocate_details: Optional[Dict] = None,
+        full_context: bool = False
+    ) -> DraftStream:
+        """Process a denial letter PDF like process_file, streaming the appeal as it is written.
+
+        OCR runs before this returns; only the LLM output is streamed.
+
+        Args:
+            pdf: Path to the PDF file, its raw bytes, or a binary file object
+            advocate_details: Optional dict with name, title, address
+            full_context: Extract every page instead of stopping at the LLM budget
+
+        Returns:
+            DraftStream yielding text deltas; its 'result' holds the
+            process_file result once the letter is complete
+
+        Raises:
+            OCRError: If OCR processing fails
+            LLMError: If appeal generation fails (raised while iterating)
+        """
+        pages = list(self.stream_pages(pdf, full_context=full_context))
+        return self.stream_draft_from_pages(pages, advocate_details)
+
+    @staticmethod
+    def extract_remaining_context(
+        pdf: Union[str, bytes, BinaryIO],
+        first_page: int,
+        page_numbers: Optional[List[int]] = None,
+        owner: Optional[str] = None
+    ) -> str:
+        """Extract the pages skipped by a budgeted or relevance-ranked process_file run.
+
+        Args:
+            pdf: Path to the PDF file, its raw bytes, or a binary file object
+            first_page: First page to extract (the 'next_page' of a previous result)
+            page_numbers: Only extract these pages (the 'remaining_pages' of a previous result)
+            owner: User the extraction runs for
+
+        Returns:
+            Text of the remaining pages, in page order
+        """
+        pages = extract_pages_from_pdf(pdf, first_page=first_page, page_numbers=page_numbers, owner=owner)
+        return join_pages(normalize_extracted_pages(pages)[0])
+
+    @staticmethod
+    def extract_remaining_pages(
+        pdf: Union[str, bytes, BinaryIO],
+        first_page: int,
+        page_numbers: Optional[List[int]] = None,
+        owner: Optional[str] = None
+    ) -> Dict[int, str]:
+        """Extract the skipped pages like extract_remaining_context, keeping each page's text.
+
+        Pages skipped by relevance triage can lie before pages that were
+        extracted; merging by page number (e.g. with join_page_texts and the
+        'page_texts' of the previous result) keeps the context in document order.
+
+        Returns:
+            Text of each remaining page that could be extracted, by page number
+        """
+        pages = extract_pages_from_pdf(pdf, first_page=first_page, page_numbers=page_numbers, owner=owner)
+        return page_texts(normalize_extracted_pages(pages)[0])
@@ -0,0 +1,189 @@
+"""Cost-weighted quotas: budgets of OCR work and LLM tokens instead of request counts.
+
+A one-page letter and a 50-page packet are one request each, but the packet
+costs about 50 times the OCR CPU and several times the Groq tokens. Before
+an appeal starts it reserves its estimated cost against the user's plan
+budgets (per minute and per day); once it has run, the reservation is
+settled against what was actually used, refunding or charging the
+difference. A user's huge uploads use up their own budget quickly while
+their single-page letters keep fitting in.
+
+Budgets are GCRA limits with weighted requests (see rate_limiter), so they
+live on the same backend as the request limits: per process, or shared
+through Postgres.
+"""
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.constants import (
+    MAX_PDF_PAGES, OCR_ADAPTIVE_DPI, OCR_DPI, OCR_DPI_LADDER, PAGE_TRIAGE_DPI,
+    QUOTA_PLAN_BUDGETS, QUOTA_DEFAULT_PLAN, QUOTA_ESTIMATED_TOKENS, QUOTA_TEXT_LAYER_PAGE_UNITS
+)
+from src.errors import RateLimitError
+from src.ocr_engine import PageResult, SOURCE_OCR, SOURCE_TEXT_LAYER, SOURCE_SKIPPED
+from src.rate_limiter import InMemoryBackend, RateLimiter
+
+QUOTA_PERIODS: Dict[str, int] = {"minute": 60, "day": 24 * 60 * 60}
+"""Budget periods, in the order of QUOTA_PLAN_BUDGETS tuples."""
+
+TRIAL_PLAN = "trial"
+
+
+@dataclass(frozen=True)
+class Cost:
+    """What an appeal costs: OCR work in page units and LLM tokens.
+
+    One OCR unit is one page rendered and recognized at OCR_DPI; other
+    resolutions scale with the pixel count.
+    """
+
+    ocr_units: float = 0.0
+    llm_tokens: float = 0.0
+
+
+def dpi_factor(dpi: Optional[int]) -> float:
+    """OCR units of one page at a resolution (work grows with the pixel count)."""
+    return ((dpi or OCR_DPI) / OCR_DPI) ** 2
+
+
+def estimate_cost(page_count: int) -> Cost:
+    """Cost reserved for an appeal before it runs: every page OCRed, a typical prompt and letter.
+
+    Args:
+        page_count: Pages in the uploaded PDF
+
+    Returns:
+        Estimated cost
+    """
+    dpi = OCR_DPI_LADDER[0] if OCR_ADAPTIVE_DPI else OCR_DPI
+    return Cost(ocr_units=min(page_count, MAX_PDF_PAGES) * dpi_factor(dpi), llm_tokens=QUOTA_ESTIMATED_TOKENS)
+
+
+def ocr_cost(pages: List[PageResult]) -> float:
+    """OCR units actually used to extract the given pages.
+
+    Text layer pages are nearly free, OCRed pages cost their resolution's
+    factor, and pages that went through relevance triage add the cost of the
+    low-resolution triage pass. Failed pages are charged a full unit, since
+    the work was done.
+    """
+    units = 0.0
+    triage = dpi_factor(PAGE_TRIAGE_DPI)
+    for page in pages:
+        if page.source == SOURCE_TEXT_LAYER:
+            units += QUOTA_TEXT_LAYER_PAGE_UNITS
+        elif page.source == SOURCE_SKIPPED:
+            units += triage
+        elif page.source == SOURCE_OCR:
+            units += dpi_factor(page.dpi) + (triage if page.relevance is not None else 0.0)
+        else:
+            units += 1.0
+    return units
+
+
+def plan_for_status(status: Optional[str]) -> str:
+    """Quota plan of a Stripe subscription status."""
+    return TRIAL_PLAN if status == "trialing" else QUOTA_DEFAULT_PLAN
+
+
+class Reservation:
+    """Budget held by one appeal until its actual cost is known."""
+
+    def __init__(self, manager: "QuotaManager", user_id: str, plan: str, estimate: Cost):
+        self.manager = manager
+        self.user_id = user_id
+        self.plan = plan
+        self.estimate = estimate
+        self.actual: Optional[Cost] = None
+
+    @property
+    def settled(self) -> bool:
+        """Whether the actual cost has been booked."""
+        return self.actual is not None
+
+    def settle(self, actual: Cost) -> None:
+        """Replace the estimate with the actual cost (only the first call counts).
+
+        Args:
+            actual: What the appeal used; less than the estimate refunds budget
+        """
+        if self.settled:
+            return
+        self.actual = actual
+        self.manager._settle(self, actual)
+
+
+class QuotaManager:
+    """Per-plan budgets of OCR units and LLM tokens, per minute and per day."""
+
+    def __init__(self, plan_budgets: Dict[str, Dict[str, Tuple[int, int]]] = QUOTA_PLAN_BUDGETS, backend=None):
+        """Initialize the manager.
+
+        Args:
+            plan_budgets: Plan -> dimension ('ocr_units' or 'llm_tokens') -> (per minute, per day)
+            backend: Rate limit backend holding the budgets (see rate_limiter.create_backend)
+        """
+        self.plan_budgets = plan_budgets
+        backend = backend or InMemoryBackend()
+        self._limiters: Dict[Tuple[str, str], List[RateLimiter]] = {
+            (plan, dimension): [
+                RateLimiter(budget, period, backend=backend, name=f"quota:{plan}:{dimension}:{period_name}")
+                for budget, (period_name, period) in zip(budgets, QUOTA_PERIODS.items())
+            ]
+            for plan, dimensions in plan_budgets.items()
+            for dimension, budgets in dimensions.items()
+        }
+        self._lock = threading.Lock()
+        self._stats = {"reserved": 0, "rejected": 0, "settled": 0, "refunded_ocr_units": 0.0, "refunded_llm_tokens": 0.0}
+
+    def reserve(self, user_id: str, plan: str, estimate: Cost) -> Reservation:
+        """Hold an appeal's estimated cost against every budget of the user's plan.
+
+        Args:
+            user_id: User the appeal runs for
+            plan: Quota plan (see plan_for_status); unknown plans use QUOTA_DEFAULT_PLAN
+            estimate: Expected cost (see estimate_cost)
+
+        Returns:
+            Reservation to settle once the actual cost is known
+
+        Raises:
+            RateLimitError: If any budget cannot cover the estimate; nothing is held then
+        """
+        if plan not in self.plan_budgets:
+            plan = QUOTA_DEFAULT_PLAN
+        charged = []
+        for dimension, amount in asdict(estimate).items():
+            for limiter in self._limiters.get((plan, dimension), []):
+                allowed, retry_after = limiter.is_allowed(user_id, cost=amount)
+                if not allowed:
+                    for charged_limiter, charged_amount in charged:
+                        charged_limiter.adjust(user_id, -charged_amount)
+                    with self._lock:
+                        self._stats["rejected"] += 1
+                    raise RateLimitError(
+                        f"Your {dimension.replace('_', ' ')} budget is used up for now.", retry_after=retry_after
+                    )
+                charged.append((limiter, amount))
+        with self._lock:
+            self._stats["reserved"] += 1
+        return Reservation(self, user_id, plan, estimate)
+
+    def stats(self) -> Dict:
+        """Return reservation counters and the budget refunded by settlements."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["refunded_ocr_units"] = round(stats["refunded_ocr_units"], 2)
+        return stats
+
+    def _settle(self, reservation: Reservation, actual: Cost) -> None:
+        estimate = asdict(reservation.estimate)
+        for dimension, amount in asdict(actual).items():
+            delta = amount - estimate[dimension]
+            for limiter in self._limiters.get((reservation.plan, dimension), []):
+                limiter.adjust(reservation.user_id, delta)
+            with self._lock:
+                self._stats[f"refunded_{dimension}"] -= delta
+        with self._lock:
+            self._stats["settled"] += 1
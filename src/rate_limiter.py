@@ -1,67 +1,240 @@
-"""Rate limiting middleware for API protection."""
+"""Rate limiting middleware for API protection.
+
+Limits use the generic cell rate algorithm (GCRA): each user is allowed a
+burst of ``max_requests`` and then one request every
+``window_seconds / max_requests``, which keeps the long-run rate at
+max_requests per window. The whole state of a user is one number, the
+theoretical arrival time (TAT) of their next request. Requests can carry a
+cost (e.g. pages or tokens): a request of cost c uses c units of allowance.
+
+Where that number lives is up to the backend: InMemoryBackend keeps it in
+the process, PostgresBackend keeps it in a shared table so a limit holds
+across Streamlit replicas and Lambda instances.
+"""
+import math
+import threading
 import time
-from collections import defaultdict
-from typing import Dict, List, Tuple
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from src.constants import RATE_LIMIT_MAX_KEYS
+
+
+class InMemoryBackend:
+    """Per-process GCRA state with bounded memory.
+
+    Keys whose allowance has fully refilled carry no information and are
+    evicted; at most ``max_keys`` keys are tracked.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        """Initialize the backend.
+
+        Args:
+            max_keys: Maximum number of keys tracked at once
+            clock: Monotonic time source (replaceable for benchmarks)
+        """
+        self.max_keys = max_keys
+        self._clock = clock
+        # key -> TAT, least recently updated first
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: str, increment: float, window: float) -> Tuple[bool, float]:
+        """Count a request against a key if its allowance permits.
+
+        A request bigger than the whole allowance (increment > window) is
+        let through when the key is idle, and then blocks the key for longer.
+
+        Args:
+            key: Rate limit key
+            increment: Seconds this request adds to the key's TAT (cost x emission interval)
+            window: Burst tolerance in seconds (a full allowance)
+
+        Returns:
+            Tuple of (allowed, seconds until a request would be allowed)
+        """
+        tats = self._tats
+        with self._lock:
+            now = self._clock()
+            # Evict keys whose allowance has fully refilled (amortized O(1)).
+            # Entries are ordered by last update; stopping at the first key
+            # still limited means an idle key is dropped at most one window late.
+            while tats:
+                oldest = next(iter(tats))
+                if tats[oldest] > now:
+                    break
+                del tats[oldest]
+
+            tat = tats.get(key, now)
+            if tat < now:
+                tat = now
+            allowed_at = tat - window + (increment if increment < window else window)
+            if allowed_at > now:
+                return False, allowed_at - now
+
+            tats[key] = tat + increment
+            tats.move_to_end(key)
+            if len(tats) > self.max_keys:
+                tats.popitem(last=False)
+            return True, 0.0
+
+    def adjust(self, key: str, delta: float) -> None:
+        """Move a key's TAT by delta seconds (negative refunds allowance)."""
+        with self._lock:
+            now = self._clock()
+            tat = max(self._tats.get(key, now), now) + delta
+            if tat > now:
+                self._tats[key] = tat
+                self._tats.move_to_end(key)
+            else:
+                self._tats.pop(key, None)
+
+    def backlog(self, key: str) -> float:
+        """Seconds the key's TAT is ahead of now (0 for a full allowance)."""
+        with self._lock:
+            tat = self._tats.get(key)
+            return max(0.0, tat - self._clock()) if tat is not None else 0.0
+
+    def tracked_keys(self) -> int:
+        """Number of keys currently holding rate limit state."""
+        with self._lock:
+            return len(self._tats)
+
+
+class PostgresBackend:
+    """GCRA state shared through Postgres (infra/supabase/rate_limits.sql).
+
+    Every check is one call of the ``rate_limit_check`` database function,
+    which updates the key's row under a row lock, so concurrent checks from
+    any number of processes are serialized per key. If the database cannot
+    be reached the check falls back to a per-process backend rather than
+    blocking every request.
+    """
+
+    def __init__(self, client, fallback: Optional[InMemoryBackend] = None):
+        """Initialize the backend.
+
+        Args:
+            client: Supabase client (service role) or postgrest SyncPostgrestClient
+            fallback: Backend used while the database is unavailable
+        """
+        self._client = client
+        self._fallback = fallback or InMemoryBackend()
+
+    def check(self, key: str, increment: float, window: float) -> Tuple[bool, float]:
+        """Count a request against a key if its allowance permits (see InMemoryBackend.check)."""
+        try:
+            rows = self._client.rpc(
+                "rate_limit_check", {"p_key": key, "p_interval": increment, "p_window": window}
+            ).execute()
+            row = rows.data[0] if isinstance(rows.data, list) else rows.data
+            return bool(row["allowed"]), float(row["retry_after"])
+        except Exception as e:
+            print(f"Warning: Shared rate limit unavailable, limiting per process: {e}")
+            return self._fallback.check(key, increment, window)
+
+    def adjust(self, key: str, delta: float) -> None:
+        """Move a key's TAT by delta seconds (negative refunds allowance)."""
+        try:
+            self._client.rpc("rate_limit_adjust", {"p_key": key, "p_delta": delta}).execute()
+        except Exception as e:
+            print(f"Warning: Shared rate limit unavailable, limiting per process: {e}")
+            self._fallback.adjust(key, delta)
+
+    def backlog(self, key: str) -> float:
+        """Seconds the key's TAT is ahead of now (0 for a full allowance)."""
+        try:
+            return max(0.0, float(self._client.rpc("rate_limit_backlog", {"p_key": key}).execute().data or 0.0))
+        except Exception as e:
+            print(f"Warning: Shared rate limit unavailable, limiting per process: {e}")
+            return self._fallback.backlog(key)
 
 
 class RateLimiter:
-    """Simple in-memory rate limiter using sliding window algorithm."""
-    
-    def __init__(self, max_requests: int = 10, window_seconds: int = 60):
+    """Thread-safe GCRA rate limiter with a pluggable state backend."""
+
+    def __init__(
+        self,
+        max_requests: int = 10,
+        window_seconds: int = 60,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+        clock: Callable[[], float] = time.monotonic,
+        backend=None,
+        name: str = "default"
+    ):
         """Initialize rate limiter.
-        
+
         Args:
             max_requests: Maximum number of requests allowed in the window
             window_seconds: Time window in seconds
+            max_keys: Maximum number of users tracked by the default in-memory backend
+            clock: Time source of the default in-memory backend
+            backend: InMemoryBackend (default) or PostgresBackend
+            name: Namespace of this limit's keys, so limits can share a backend
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests: Dict[str, List[float]] = defaultdict(list)
-    
-    def is_allowed(self, user_id: str) -> Tuple[bool, int]:
+        self.name = name
+        self.backend = backend or InMemoryBackend(max_keys=max_keys, clock=clock)
+        self._interval = window_seconds / max_requests
+
+    def is_allowed(self, user_id: str, cost: float = 1.0) -> Tuple[bool, int]:
         """Check if a request from the user is allowed.
-        
+
         Args:
             user_id: Unique identifier for the user (e.g., email)
-            
+            cost: Units of allowance the request uses (max_requests units per window)
+
         Returns:
             Tuple of (is_allowed, seconds_until_reset)
         """
-        now = time.time()
-        user_requests = self.requests[user_id]
-        
-        # Remove old requests outside the sliding window
-        user_requests[:] = [
-            req_time for req_time in user_requests 
-            if now - req_time < self.window_seconds
-        ]
-        
-        # Check if limit exceeded
-        if len(user_requests) >= self.max_requests:
-            oldest_request = min(user_requests)
-            reset_time = int(self.window_seconds - (now - oldest_request))
-            return False, reset_time
-        
-        # Allow request and record timestamp
-        user_requests.append(now)
-        return True, 0
-    
+        allowed, retry_after = self.backend.check(
+            f"{self.name}:{user_id}", cost * self._interval, self.window_seconds
+        )
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil(retry_after))
+
+    def adjust(self, user_id: str, cost: float) -> None:
+        """Charge (positive) or refund (negative) allowance after the fact.
+
+        Args:
+            user_id: Unique identifier for the user
+            cost: Units to add to or remove from what the user has used
+        """
+        if cost:
+            self.backend.adjust(f"{self.name}:{user_id}", cost * self._interval)
+
     def get_remaining_requests(self, user_id: str) -> int:
         """Get the number of remaining requests for a user.
-        
+
         Args:
             user_id: Unique identifier for the user
-            
+
         Returns:
-            Number of remaining requests in the current window
+            Number of requests that would be allowed right now
         """
-        now = time.time()
-        user_requests = self.requests[user_id]
-        
-        # Count valid requests in current window
-        valid_requests = [
-            req_time for req_time in user_requests 
-            if now - req_time < self.window_seconds
-        ]
-        
-        return max(0, self.max_requests - len(valid_requests))
+        backlog = self.backend.backlog(f"{self.name}:{user_id}")
+        return max(0, min(self.max_requests, math.floor((self.window_seconds - backlog) / self._interval)))
+
+
+def create_backend(
+    supabase_url: Optional[str] = None,
+    service_key: Optional[str] = None,
+    postgrest_url: Optional[str] = None
+):
+    """Pick the rate limit backend for the configured environment.
+
+    Args:
+        supabase_url: Supabase project URL
+        service_key: Supabase service role key
+        postgrest_url: Bare PostgREST URL (e.g. the local stand-in); overrides supabase_url
+
+    Returns:
+        PostgresBackend when database credentials are configured, otherwise InMemoryBackend
+    """
+    if service_key and (supabase_url or postgrest_url):
+        from src.clients import get_database_client
+        return PostgresBackend(get_database_client(supabase_url, service_key, postgrest_url))
+    return InMemoryBackend()
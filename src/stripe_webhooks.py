@@ -0,0 +1,169 @@
+"""Stripe webhook processing: keeps the entitlement table in sync with Stripe.
+
+Handled events:
+
+- ``checkout.session.completed`` links the buyer's email to the Stripe
+  customer (and grants access right away, before the subscription events)
+- ``customer.subscription.created/updated/deleted`` store the status and
+  current period end of the customer's subscription
+
+Subscription events carry a customer id but no email; the email comes from
+the existing row of that customer or, failing that, from one Stripe lookup.
+Events older than the last one applied to a row are ignored, since Stripe
+does not guarantee delivery order.
+
+A row tracks one subscription (the customer's current one). An event for
+another subscription of the same customer takes over the row only when it
+entitles the user (e.g. a new subscription after a re-subscribe); others,
+such as the late deletion of the subscription a customer replaced, leave
+the row alone.
+"""
+import json
+from typing import Callable, Dict, Optional, Tuple
+
+from src.constants import STRIPE_WEBHOOK_TOLERANCE_SECONDS
+from src.entitlements import ENTITLED_STATUSES, EntitlementStore
+
+SUBSCRIPTION_EVENTS = (
+    "customer.subscription.created",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+)
+
+
+def verify_event(payload: bytes, signature: Optional[str], secret: str) -> Dict:
+    """Check the Stripe-Signature header and parse the event.
+
+    Args:
+        payload: Raw request body, exactly as received
+        signature: Value of the Stripe-Signature header
+        secret: Webhook endpoint signing secret (whsec_...)
+
+    Returns:
+        The event as a plain dictionary
+
+    Raises:
+        ValueError: If the signature is missing, invalid or too old, or the body is not JSON
+    """
+    import stripe
+
+    if not signature:
+        raise ValueError("Missing Stripe-Signature header")
+    body = payload.decode("utf-8") if isinstance(payload, bytes) else payload
+    try:
+        stripe.WebhookSignature.verify_header(body, signature, secret, STRIPE_WEBHOOK_TOLERANCE_SECONDS)
+    except stripe.SignatureVerificationError as e:
+        raise ValueError(f"Invalid Stripe signature: {e}") from e
+    return json.loads(body)
+
+
+def _period_end(subscription: Dict) -> Optional[int]:
+    # Newer API versions moved current_period_end from the subscription to its items
+    if subscription.get("current_period_end"):
+        return subscription["current_period_end"]
+    items = (subscription.get("items") or {}).get("data") or []
+    ends = [item["current_period_end"] for item in items if item.get("current_period_end")]
+    return max(ends) if ends else None
+
+
+def apply_event(
+    event: Dict,
+    store: EntitlementStore,
+    lookup_customer_email: Callable[[str], Optional[str]]
+) -> str:
+    """Apply one verified Stripe event to the entitlement table.
+
+    Args:
+        event: Verified event from verify_event
+        store: Entitlement table
+        lookup_customer_email: Returns the email of a Stripe customer id
+
+    Returns:
+        What happened: 'checkout', 'subscription', 'stale', 'superseded' (an
+        event for a subscription other than the current one) or 'ignored'
+    """
+    event_type = event.get("type")
+    obj = event.get("data", {}).get("object", {})
+
+    if event_type == "checkout.session.completed":
+        if obj.get("mode") != "subscription" or not obj.get("customer"):
+            return "ignored"
+        email = (obj.get("customer_details") or {}).get("email") or obj.get("customer_email")
+        if not email:
+            return "ignored"
+        record = {"email": email, "customer_id": obj["customer"]}
+        existing = store.get(email)
+        if existing is None or existing.get("customer_id") != obj["customer"] or not existing.get("status"):
+            # Grant access now; the subscription events that follow set the exact status
+            record["status"] = "trialing" if obj.get("payment_status") == "no_payment_required" else "active"
+            if obj.get("subscription"):
+                record["subscription_id"] = obj["subscription"]
+        store.upsert(record)
+        return "checkout"
+
+    if event_type in SUBSCRIPTION_EVENTS:
+        customer_id = obj.get("customer")
+        if not customer_id:
+            return "ignored"
+        existing = store.find_by_customer(customer_id)
+        if existing is not None and (existing.get("last_event_at") or 0) > event.get("created", 0):
+            return "stale"
+        status = "canceled" if event_type == "customer.subscription.deleted" else obj.get("status")
+        current = existing.get("subscription_id") if existing is not None else None
+        if current and obj.get("id") and obj["id"] != current and status not in ENTITLED_STATUSES:
+            return "superseded"
+        email = existing["email"] if existing is not None else lookup_customer_email(customer_id)
+        if not email:
+            return "ignored"
+        store.upsert({
+            "email": email,
+            "customer_id": customer_id,
+            "subscription_id": obj.get("id") or current,
+            "status": status,
+            "period_end": _period_end(obj),
+            "last_event_at": event.get("created"),
+        })
+        return "subscription"
+
+    return "ignored"
+
+
+def handle_webhook(
+    payload: bytes,
+    signature: Optional[str],
+    secret: str,
+    store: EntitlementStore,
+    lookup_customer_email: Callable[[str], Optional[str]]
+) -> Tuple[int, Dict]:
+    """Verify and apply a webhook request.
+
+    Args:
+        payload: Raw request body
+        signature: Value of the Stripe-Signature header
+        secret: Webhook endpoint signing secret
+        store: Entitlement table
+        lookup_customer_email: Returns the email of a Stripe customer id
+
+    Returns:
+        Tuple of (HTTP status code, JSON response body). Failures to apply an
+        event return 500 so Stripe retries the delivery.
+    """
+    try:
+        event = verify_event(payload, signature, secret)
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+    try:
+        outcome = apply_event(event, store, lookup_customer_email)
+    except Exception as e:
+        print(f"Warning: Failed to apply Stripe event {event.get('id')}: {e}")
+        return 500, {"error": "Failed to apply event"}
+    return 200, {"received": True, "event": event.get("type"), "outcome": outcome}
+
+
+def stripe_customer_email_lookup(stripe_client) -> Callable[[str], Optional[str]]:
+    """Build a lookup_customer_email callable backed by the Stripe API."""
+    def lookup(customer_id: str) -> Optional[str]:
+        customer = stripe_client.v1.customers.retrieve(customer_id)
+        return getattr(customer, "email", None)
+    return lookup
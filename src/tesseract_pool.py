@@ -0,0 +1,374 @@
+"""Long-lived Tesseract worker processes.
+
+pytesseract forks a fresh ``tesseract`` binary per page, which writes the page
+to a temporary PNG and reloads the language model every time. The workers in
+this module call libtesseract directly through its C API: each one loads the
+model once at startup and then receives raw grayscale page buffers over a
+pipe, so a page costs only the recognition itself.
+"""
+import atexit
+import ctypes
+import ctypes.util
+import multiprocessing
+import queue
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from PIL import Image
+from src.constants import (
+    OCR_PSM_MODE, OCR_WORKERS, OCR_USE_WORKER_POOL, OCR_WORKER_MAX_PAGES, OCR_WORKER_PING_IDLE_SECONDS,
+    OCR_WORKER_PING_TIMEOUT_SECONDS, OCR_WORKER_TIMEOUT_SECONDS
+)
+from src.errors import OCRError
+
+_LIBRARY_NAMES = ("libtesseract.so.5", "libtesseract.so.4", "libtesseract.dylib")
+
+
+def _psm_from_config(config: str) -> int:
+    """Extract the page segmentation mode number from a Tesseract CLI config string."""
+    match = re.search(r"--psm\s+(\d+)", config)
+    return int(match.group(1)) if match else 3
+
+
+class _TessBaseAPI:
+    """Minimal ctypes binding for the parts of the libtesseract C API we use."""
+
+    def __init__(self, language: str, psm: int):
+        path = ctypes.util.find_library("tesseract")
+        candidates = [path] if path else list(_LIBRARY_NAMES)
+        lib = None
+        for name in candidates:
+            try:
+                lib = ctypes.CDLL(name)
+                break
+            except OSError:
+                continue
+        if lib is None:
+            raise OCRError("libtesseract could not be loaded")
+
+        lib.TessBaseAPICreate.restype = ctypes.c_void_p
+        lib.TessBaseAPIInit3.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPIInit3.restype = ctypes.c_int
+        lib.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPISetImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int
+        ]
+        lib.TessBaseAPISetSourceResolution.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p
+        lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIAllWordConfidences.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIAllWordConfidences.restype = ctypes.POINTER(ctypes.c_int)
+        lib.TessDeleteIntArray.argtypes = [ctypes.POINTER(ctypes.c_int)]
+        lib.TessBaseAPIClear.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+
+        self._lib = lib
+        self._handle = lib.TessBaseAPICreate()
+        # NULL datapath lets libtesseract honour TESSDATA_PREFIX like the CLI does
+        if lib.TessBaseAPIInit3(self._handle, None, language.encode("utf-8")) != 0:
+            lib.TessBaseAPIDelete(self._handle)
+            raise OCRError(f"libtesseract could not load language '{language}'")
+        lib.TessBaseAPISetPageSegMode(self._handle, psm)
+
+    def recognize(self, data: bytes, width: int, height: int, dpi: int) -> Tuple[str, List[int]]:
+        """Recognize an 8-bit grayscale page buffer.
+
+        Returns:
+            Tuple of (text, per-word confidences 0-100)
+        """
+        self._lib.TessBaseAPISetImage(self._handle, data, width, height, 1, width)
+        self._lib.TessBaseAPISetSourceResolution(self._handle, dpi)
+        text_ptr = self._lib.TessBaseAPIGetUTF8Text(self._handle)
+        try:
+            if not text_ptr:
+                raise OCRError("libtesseract returned no text")
+            text = ctypes.string_at(text_ptr).decode("utf-8", "replace")
+            return text, self._word_confidences()
+        finally:
+            if text_ptr:
+                self._lib.TessDeleteText(text_ptr)
+            self._lib.TessBaseAPIClear(self._handle)
+
+    def _word_confidences(self) -> List[int]:
+        # The C API returns a -1 terminated int array
+        array = self._lib.TessBaseAPIAllWordConfidences(self._handle)
+        if not array:
+            return []
+        confidences = []
+        try:
+            index = 0
+            while array[index] != -1:
+                confidences.append(array[index])
+                index += 1
+        finally:
+            self._lib.TessDeleteIntArray(array)
+        return confidences
+
+    def close(self) -> None:
+        self._lib.TessBaseAPIEnd(self._handle)
+        self._lib.TessBaseAPIDelete(self._handle)
+
+
+def _worker_main(conn, language: str, psm: int) -> None:
+    """Entry point of a worker process: load the model once, then serve requests."""
+    try:
+        api = _TessBaseAPI(language, psm)
+    except Exception as e:
+        conn.send(("error", str(e)))
+        return
+    conn.send(("ready", None))
+
+    try:
+        while True:
+            message = conn.recv()
+            op = message[0]
+            if op == "stop":
+                break
+            if op == "ping":
+                conn.send(("ok", "pong"))
+                continue
+            try:
+                _, width, height, dpi, data = message
+                conn.send(("ok", api.recognize(data, width, height, dpi)))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        api.close()
+
+
+class _Worker:
+    """Handle to one worker process and its end of the pipe."""
+
+    def __init__(self, context, language: str, psm: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, language, psm), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.pages_done = 0
+        self.idle_since = time.monotonic()
+
+        try:
+            status, detail = self._receive(OCR_WORKER_TIMEOUT_SECONDS)
+        except Exception:
+            self.kill()
+            raise
+        if status != "ready":
+            self.kill()
+            raise OCRError(f"Tesseract worker failed to start: {detail}")
+
+    def request(self, message: tuple, timeout: float):
+        self.conn.send(message)
+        status, detail = self._receive(timeout)
+        if status != "ok":
+            raise OCRError(f"Tesseract worker error: {detail}")
+        return detail
+
+    def _receive(self, timeout: float) -> tuple:
+        if not self.conn.poll(timeout):
+            raise OCRError("Tesseract worker timed out")
+        return self.conn.recv()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def ping(self, timeout: float = OCR_WORKER_PING_TIMEOUT_SECONDS) -> bool:
+        """Whether the worker process is alive and answers a request."""
+        if not self.is_alive():
+            return False
+        try:
+            return self.request(("ping",), timeout) == "pong"
+        except Exception:
+            return False
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+
+class TesseractWorkerPool:
+    """Bounded pool of persistent Tesseract workers.
+
+    Workers are started lazily up to ``size``. A worker that crashes or times
+    out is discarded and replaced on the next request, and a worker that sat
+    idle is pinged before it is handed a page; a healthy worker is recycled
+    after ``max_pages_per_worker`` pages to cap memory growth.
+    """
+
+    def __init__(
+        self,
+        size: int = OCR_WORKERS,
+        max_pages_per_worker: int = OCR_WORKER_MAX_PAGES,
+        language: str = "eng",
+        psm: int = _psm_from_config(OCR_PSM_MODE)
+    ):
+        """Initialize the pool (no process is started until the first page).
+
+        Args:
+            size: Maximum number of worker processes
+            max_pages_per_worker: Pages a worker handles before it is replaced
+            language: Tesseract language code
+            psm: Tesseract page segmentation mode
+        """
+        self.size = max(1, size)
+        self.max_pages_per_worker = max_pages_per_worker
+        self.language = language
+        self.psm = psm
+        # Spawn instead of fork: the Streamlit server is multi-threaded
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.LifoQueue[_Worker]" = queue.LifoQueue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def ocr(self, image: Image.Image, dpi: int) -> Tuple[str, List[int]]:
+        """OCR one page image on a pooled worker.
+
+        Args:
+            image: Rendered page image
+            dpi: Resolution the page was rendered at
+
+        Returns:
+            Tuple of (recognized text, per-word confidences 0-100)
+
+        Raises:
+            OCRError: If the worker fails on this page
+        """
+        gray = image if image.mode == "L" else image.convert("L")
+        message = ("ocr", gray.width, gray.height, dpi, gray.tobytes())
+
+        worker = self._acquire()
+        try:
+            text, confidences = worker.request(message, OCR_WORKER_TIMEOUT_SECONDS)
+        except Exception:
+            self._discard(worker)
+            raise
+        worker.pages_done += 1
+        self._release(worker)
+        return text, confidences
+
+    def health_check(self) -> int:
+        """Ping every idle worker and replace the ones that do not answer.
+
+        Workers are also checked one at a time when they are taken from the
+        pool after OCR_WORKER_PING_IDLE_SECONDS idle; this checks all of them
+        at once (e.g. from a periodic task).
+
+        Returns:
+            Number of healthy idle workers
+        """
+        healthy: List[_Worker] = []
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker.ping():
+                healthy.append(worker)
+            else:
+                self._discard(worker)
+        for worker in healthy:
+            self._idle.put(worker)
+        return len(healthy)
+
+    def close(self) -> None:
+        """Stop all idle workers; busy workers are stopped when released."""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(worker)
+
+    def _acquire(self) -> _Worker:
+        while True:
+            with self._lock:
+                can_start = self._idle.empty() and self._started < self.size
+                if can_start:
+                    self._started += 1
+            if can_start:
+                try:
+                    return _Worker(self._context, self.language, self.psm)
+                except Exception:
+                    with self._lock:
+                        self._started -= 1
+                    raise
+
+            try:
+                # Short timeout so a discarded worker's slot is noticed promptly
+                worker = self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # A worker idle for a while may have died or wedged since: check it
+            # before it gets a page, so a bad worker costs a ping, not a page timeout
+            if time.monotonic() - worker.idle_since < OCR_WORKER_PING_IDLE_SECONDS:
+                if worker.is_alive():
+                    return worker
+            elif worker.ping():
+                return worker
+            print("Warning: Replacing an unresponsive Tesseract worker")
+            self._discard(worker)
+
+    def _release(self, worker: _Worker) -> None:
+        if self._closed or worker.pages_done >= self.max_pages_per_worker:
+            # Recycle: the replacement is started lazily by the next request
+            self._discard(worker, graceful=True)
+        else:
+            worker.idle_since = time.monotonic()
+            self._idle.put(worker)
+
+    def _discard(self, worker: _Worker, graceful: bool = False) -> None:
+        if graceful:
+            worker.stop()
+        else:
+            worker.kill()
+        with self._lock:
+            self._started -= 1
+
+
+_pool: Optional[TesseractWorkerPool] = None
+_pool_unavailable = False
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> Optional[TesseractWorkerPool]:
+    """Return the process-wide worker pool, or None if it cannot be used.
+
+    The first call starts one worker to check that libtesseract is usable. If
+    it is not (library missing, language data missing), the pool is disabled
+    for the life of the process and callers fall back to pytesseract.
+    """
+    global _pool, _pool_unavailable
+    if not OCR_USE_WORKER_POOL or _pool_unavailable:
+        return None
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None and not _pool_unavailable:
+            pool = TesseractWorkerPool()
+            try:
+                pool._release(pool._acquire())
+            except Exception as e:
+                print(f"Warning: Tesseract worker pool unavailable, using pytesseract: {e}")
+                _pool_unavailable = True
+                return None
+            atexit.register(pool.close)
+            _pool = pool
+    return _pool
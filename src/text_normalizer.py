@@ -0,0 +1,167 @@
+"""Clean-up of extracted page text before it reaches the LLM.
+
+OCR output of a denial packet repeats the payer letterhead, the page footer,
+"Page X of Y" and the privacy notice on every page, breaks words at line-end
+hyphens, and turns stamps, logos and fax speckle into runs of garbage. All of
+it costs prompt tokens and context budget. Normalization:
+
+- drops low-confidence noise words while the page is recognized
+  (drop_noise_words, using Tesseract's per-word confidences)
+- removes lines repeated across pages, keeping their first occurrence
+- rejoins words hyphenated across line breaks
+- collapses whitespace and drops lines that are mostly symbols
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from src.constants import OCR_NOISE_MIN_CONFIDENCE, TEXT_REPEATED_LINE_MIN_SHARE
+
+_HYPHENATED = re.compile(r"(\w+)-\n(\s*)([a-z]\w*)")
+_PAGE_MARKER = re.compile(r"^(?:page\s+)?\d+\s*(?:of|/)\s*\d+$|^page\s+\d+$|^-\s*\d+\s*-$", re.IGNORECASE)
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_MIN_LINE_ALNUM_RATIO = 0.3
+_MIN_WORD_ALNUM_RATIO = 0.5
+
+
+@dataclass
+class NormalizationReport:
+    """What normalization removed from a document."""
+
+    chars_before: int = 0
+    chars_after: int = 0
+    repeated_lines: int = 0
+    page_markers: int = 0
+    hyphenations: int = 0
+    noise_lines: int = 0
+    noise_words: int = 0
+
+    def report(self) -> Dict:
+        """Sizes before and after normalization plus per-step counts."""
+        return {
+            "chars_before": self.chars_before,
+            "chars_after": self.chars_after,
+            "reduction": round(1 - self.chars_after / self.chars_before, 3) if self.chars_before else 0.0,
+            "repeated_lines": self.repeated_lines,
+            "page_markers": self.page_markers,
+            "hyphenations": self.hyphenations,
+            "noise_lines": self.noise_lines,
+            "noise_words": self.noise_words,
+        }
+
+
+def _alnum_ratio(text: str) -> float:
+    return sum(char.isalnum() for char in text) / len(text) if text else 0.0
+
+
+def drop_noise_words(
+    text: str, confidences: Sequence[float], min_confidence: float = OCR_NOISE_MIN_CONFIDENCE
+) -> Tuple[str, int]:
+    """Remove words Tesseract recognized with low confidence that look like noise.
+
+    A word is dropped when its confidence is below ``min_confidence`` and it
+    is mostly symbols, or when its confidence is below half of that whatever
+    it looks like. Confidences are matched to the words of ``text`` in
+    reading order; if the counts differ the text is returned unchanged.
+
+    Args:
+        text: Recognized page text
+        confidences: Per-word confidences 0-100, in reading order
+        min_confidence: Threshold below which symbol-like words are dropped (0 disables)
+
+    Returns:
+        Tuple of (cleaned text, number of words dropped)
+    """
+    if min_confidence <= 0 or not confidences:
+        return text, 0
+    lines = text.splitlines()
+    if sum(len(line.split()) for line in lines) != len(confidences):
+        return text, 0
+
+    kept_lines = []
+    dropped = 0
+    position = 0
+    for line in lines:
+        kept = []
+        for word in line.split():
+            confidence = confidences[position]
+            position += 1
+            if confidence < min_confidence / 2 or (
+                confidence < min_confidence and _alnum_ratio(word) < _MIN_WORD_ALNUM_RATIO
+            ):
+                dropped += 1
+                continue
+            kept.append(word)
+        kept_lines.append(" ".join(kept))
+    return "\n".join(kept_lines), dropped
+
+
+def _line_key(line: str) -> str:
+    """Comparison key of a line (case does not matter)."""
+    return line.lower()
+
+
+def normalize_pages(
+    texts: List[str], noise_words: int = 0, min_share: float = TEXT_REPEATED_LINE_MIN_SHARE
+) -> Tuple[List[str], NormalizationReport]:
+    """Normalize the text of every page of a document.
+
+    A line is treated as a running header or footer when it appears on at
+    least ``min_share`` of the pages (and on two or more); its first
+    occurrence is kept, so the payer name in the letterhead still reaches
+    the LLM once.
+
+    Args:
+        texts: Text of each extracted page, in page order
+        noise_words: Noise words already dropped during recognition (for the report)
+        min_share: Share of pages a line must repeat on to be removed
+
+    Returns:
+        Tuple of (normalized page texts, report)
+    """
+    report = NormalizationReport(chars_before=sum(len(text) for text in texts), noise_words=noise_words)
+
+    pages: List[List[str]] = []
+    for text in texts:
+        text, joined = _HYPHENATED.subn(r"\1\3\n\2", text)
+        report.hyphenations += joined
+        lines = []
+        for raw_line in text.splitlines():
+            line = _SPACES.sub(" ", raw_line).strip()
+            if not line:
+                # Keep paragraph breaks, but never more than one blank line
+                if lines and lines[-1]:
+                    lines.append("")
+                continue
+            if _PAGE_MARKER.match(line):
+                report.page_markers += 1
+                continue
+            if len(line) >= 3 and _alnum_ratio(line) < _MIN_LINE_ALNUM_RATIO:
+                report.noise_lines += 1
+                continue
+            lines.append(line)
+        pages.append(lines)
+
+    if len(pages) > 1:
+        page_counts: Dict[str, int] = {}
+        for lines in pages:
+            for key in {_line_key(line) for line in lines if line}:
+                page_counts[key] = page_counts.get(key, 0) + 1
+        threshold = max(2, min_share * len(pages))
+        repeated = {key for key, count in page_counts.items() if count >= threshold}
+        seen = set()
+        for index, lines in enumerate(pages):
+            kept = []
+            for line in lines:
+                key = _line_key(line)
+                if key in repeated:
+                    if key in seen:
+                        report.repeated_lines += 1
+                        continue
+                    seen.add(key)
+                kept.append(line)
+            pages[index] = kept
+
+    normalized = ["\n".join(lines).strip() for lines in pages]
+    report.chars_after = sum(len(text) for text in normalized)
+    return normalized, report
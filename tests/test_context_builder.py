@@ -0,0 +1,110 @@
+"""Token-budgeted context selection."""
+from benchmarks.corpus import generate_document
+from src.context_builder import compress_context, count_tokens, score_span, split_spans
+
+LETTER = """Unity Care Assurance
+123 Insurance Way, Springfield
+
+Notice of Adverse Benefit Determination
+Member ID: F192704936
+Claim Number: 1581938033
+Date of Service: 04/08/2024
+
+We reviewed the request for the sleep apnea device (HCPCS E0601). The claim is denied
+because the records do not meet the medical necessity criteria of policy number MP-104.
+You may appeal this decision within 180 days of this notice.
+"""
+
+BOILERPLATE = """This notice contains confidential health information protected under HIPAA.
+Language assistance services are available free of charge. Call TTY 711.
+Page 1 of 3
+"""
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert count_tokens("Claim denied.") == 5
+    # Long words count as several word pieces
+    assert count_tokens("investigational") == 4
+
+
+def test_split_spans_rejoins_wrapped_sentences_and_keeps_field_lines():
+    spans = split_spans(LETTER)
+
+    assert "Member ID: F192704936" in spans
+    assert "Claim Number: 1581938033" in spans
+    assert any(span.startswith("The claim is denied because the records") for span in spans)
+    assert all("\n" not in span for span in spans)
+
+
+def test_score_span_prefers_rationale_over_boilerplate():
+    rationale, signals = score_span("The claim is denied because it is not medically necessary.")
+    boilerplate, _ = score_span("Language assistance is available free of charge. Page 2 of 4")
+
+    assert rationale > 0
+    assert "rationale" in signals
+    assert boilerplate < 0
+
+
+def test_diagnosis_codes_do_not_score_as_procedure_or_remark_codes():
+    _, signals = score_span("Diagnosis M54.16 and N39.0, also listed as M5416.")
+
+    assert "procedure_code" not in signals
+    assert "rarc" not in signals
+    assert "procedure_code" in score_span("Procedure: E0601")[1]
+    assert "rarc" in score_span("Remark code N115")[1]
+
+
+def test_whole_letter_fits_a_generous_budget():
+    context = compress_context(LETTER + BOILERPLATE, token_budget=10_000)
+
+    assert "because the records do not meet" in context.text
+    assert "HIPAA" not in context.text
+    assert "Page 1 of 3" not in context.text
+    assert context.tokens_after < context.tokens_before
+
+
+def test_context_stays_within_budget_and_keeps_the_facts():
+    document = generate_document("born_digital", page_count=8, seed=3)
+    text = "\n\n".join(document.pages)
+
+    context = compress_context(text, token_budget=300)
+
+    assert context.tokens_after <= 300
+    assert context.tokens_before > 1_000
+    assert context.spans_kept < context.spans_total
+    for fact in ("Claim Number", "Member ID", "Reason code"):
+        assert fact in context.text
+
+
+def test_kept_spans_stay_in_document_order_with_gap_markers():
+    text = LETTER + "\n" + "\n".join(f"Filler paragraph {i} about nothing in particular." for i in range(40)) + \
+        "\nThe appeal must include the letter of medical necessity."
+    context = compress_context(text, token_budget=200)
+
+    lines = context.text.splitlines()
+    assert lines.index("Member ID: F192704936") < lines.index("Claim Number: 1581938033")
+    assert "[...]" in lines
+    assert lines[0] != "[...]" and lines[-1] != "[...]"
+
+
+def test_repeated_spans_are_kept_once():
+    context = compress_context(LETTER + "\n" + LETTER, token_budget=10_000)
+    assert context.text.count("Claim Number: 1581938033") == 1
+
+
+def test_unrecognized_text_falls_back_to_the_start():
+    text = "lorem ipsum dolor sit amet " * 200
+
+    context = compress_context(text, token_budget=50)
+
+    assert text.startswith(context.text)
+    assert 0 < context.tokens_after <= 50
+
+
+def test_report():
+    report = compress_context(LETTER + BOILERPLATE, token_budget=10_000).report()
+
+    assert set(report) == {"tokens_before", "tokens_after", "reduction", "spans_total", "spans_kept"}
+    assert 0 < report["reduction"] < 1
+    assert compress_context("", token_budget=100).report()["reduction"] == 0.0
@@ -0,0 +1,163 @@
+"""Rule-based denial record extraction and its cache."""
+import pytest
+
+from benchmarks.corpus import generate_document
+from src.denial_extraction import DenialRecord, DenialRecordCache, extract_denial_record
+
+LETTER = """Unity Care Assurance
+Notice of Adverse Benefit Determination
+Member ID: A879599866
+Claim Number: 2594848098
+Date of Service: 12/22/2024
+Procedure: E0601 continuous positive airway pressure device
+Diagnosis: G47.33 obstructive sleep apnea
+We have reviewed the claim for continuous positive airway pressure device and
+the claim has been denied. Reason code CO-50: These are non-covered services
+because this is not deemed a medical necessity by the payer. Remark code N115.
+You have the right to appeal this decision within 180 days of the date of this
+notice.
+"""
+
+EOB = """Explanation of Benefits
+Line  Date        Code   Billed    Allowed   Remark
+1     12/22/2024  99214  245.00    0.00      CO-45 N130
+2     12/22/2024  94660  180.00    0.00      PR-96 N20
+"""
+
+
+@pytest.fixture
+def record():
+    return extract_denial_record(LETTER + "\n" + EOB)
+
+
+def test_fields(record):
+    assert record.payer == "Unity Care Assurance"
+    assert record.member_id == "A879599866"
+    assert record.claim_number == "2594848098"
+    assert record.dates_of_service == ["12/22/2024"]
+    assert record.procedure_codes == ["E0601"]
+    assert record.diagnosis_codes == ["G47.33"]
+    assert record.carc_codes == ["CO-50"]
+    assert record.rarc_codes == ["N115"]
+    assert "within 180 days" in record.appeal_deadline
+    assert record.source == "rules"
+
+
+def test_rationale_quotes_the_denial_reason(record):
+    assert record.complete
+    assert "not deemed a medical necessity" in record.rationale
+
+
+def test_codes_of_eob_table_rows_are_left_out(record):
+    codes = record.procedure_codes + record.carc_codes + record.rarc_codes
+    for code in ("99214", "94660", "CO-45", "PR-96", "N130", "N20"):
+        assert code not in codes
+
+
+def test_letter_without_denial_facts():
+    record = extract_denial_record("Thank you for choosing our pharmacy.\nHave a nice day.")
+
+    assert not record.complete
+    assert record.claim_number is None
+    assert "rationale" in record.missing_fields()
+
+
+def test_generated_packets():
+    for seed in range(5):
+        document = generate_document("born_digital", page_count=4, seed=seed)
+        first_page = document.pages[0]
+
+        record = extract_denial_record("\n\n".join(document.pages))
+
+        assert record.complete
+        assert record.claim_number and record.claim_number in first_page
+        assert record.member_id and record.member_id in first_page
+        assert all(code in first_page for code in record.carc_codes)
+
+
+def test_prompt_lists_found_fields_only(record):
+    prompt = record.to_prompt()
+
+    assert "Claim number: 2594848098" in prompt
+    assert "Claim adjustment reason codes (CARC): CO-50" in prompt
+    assert "Appeal deadline" in prompt
+    assert "Payer" not in DenialRecord(claim_number="1").to_prompt()
+
+
+def test_merge_fills_only_empty_fields():
+    record = DenialRecord(claim_number="123", procedure_codes=["E0601"])
+
+    record.merge({"claim_number": "999", "member_id": "M1", "diagnosis_codes": "G47.33", "carc_codes": []})
+
+    assert record.claim_number == "123"
+    assert record.member_id == "M1"
+    assert record.diagnosis_codes == ["G47.33"]
+    assert record.carc_codes == []
+
+
+def test_dict_round_trip(record):
+    data = dict(record.to_dict(), unknown_key=1)
+    assert DenialRecord.from_dict(data) == record
+
+
+def test_cache_returns_copies(record):
+    cache = DenialRecordCache(max_entries=2, max_age_seconds=60)
+    assert cache.get(LETTER) is None
+
+    cache.put(LETTER, record)
+    cached = cache.get(LETTER)
+    assert cached == record
+    cached.carc_codes.append("CO-4")
+
+    assert cache.get(LETTER).carc_codes == ["CO-50"]
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 1}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = DenialRecordCache(max_entries=2, max_age_seconds=60)
+    for text in ("a", "b"):
+        cache.put(text, DenialRecord(claim_number=text))
+    cache.get("a")
+    cache.put("c", DenialRecord(claim_number="c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a").claim_number == "a"
+    assert cache.stats()["entries"] == 2
+
+
+def test_expired_records_are_misses():
+    cache = DenialRecordCache(max_entries=2, max_age_seconds=0)
+    cache.put("a", DenialRecord(claim_number="a"))
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_undotted_diagnosis_codes_on_diagnosis_lines():
+    record = extract_denial_record("Diagnosis: M5416 and G4733\nClaim Number: 2594848098")
+
+    assert record.diagnosis_codes == ["M5416", "G4733"]
+    assert record.procedure_codes == []
+
+
+@pytest.mark.parametrize("diagnosis", ["M54.16, N39.0", "M5416, N390"])
+def test_m_and_n_diagnosis_codes_are_not_procedure_or_remark_codes(diagnosis):
+    text = (
+        f"Procedure: 72148 MRI lumbar spine without contrast\nDiagnosis: {diagnosis}\n"
+        "The MRI was denied because it is not medically necessary. Remark code N115."
+    )
+
+    record = extract_denial_record(text)
+
+    assert record.diagnosis_codes == diagnosis.split(", ")
+    assert record.procedure_codes == ["72148"]
+    assert record.rarc_codes == ["N115"]
+
+
+def test_procedure_and_diagnosis_in_one_sentence():
+    record = extract_denial_record(
+        "We denied the lumbar MRI (CPT 72148, HCPCS E0601) for diagnosis M5416 because it is not covered."
+    )
+
+    assert record.procedure_codes == ["72148", "E0601"]
+    assert record.diagnosis_codes == ["M5416"]
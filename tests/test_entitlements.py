@@ -0,0 +1,160 @@
+"""Entitlement cache: fresh, stale-while-revalidate and invalidation."""
+import threading
+import time
+
+import pytest
+
+from src.constants import ENTITLEMENT_PERIOD_GRACE_SECONDS
+from src.entitlements import Entitlement, EntitlementCache, entitlement_from_record
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.002)
+
+
+class FakeFetch:
+    """Entitlement lookup that returns queued answers and can be held mid-call."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+        self.hold = threading.Event()
+        self.hold.set()
+        self.entered = threading.Event()
+
+    def __call__(self, email):
+        self.calls += 1
+        answer = self.answers.pop(0)
+        self.entered.set()
+        assert self.hold.wait(5)
+        return answer
+
+
+def granted(status="active"):
+    return Entitlement(email="alice@example.com", active=True, customer_id="cus_1", status=status)
+
+
+def denied():
+    return Entitlement(email="alice@example.com", active=False, customer_id="cus_1", status="canceled")
+
+
+@pytest.fixture
+def cache(clock):
+    return EntitlementCache(ttl_seconds=60, stale_seconds=300, clock=clock)
+
+
+def settled(cache):
+    return lambda: not cache._refreshing
+
+
+def test_fresh_entries_are_served_without_a_lookup(cache, clock):
+    fetch = FakeFetch(granted())
+
+    assert cache.get("Alice@Example.com ", fetch).active
+    clock.advance(59)
+    assert cache.get("alice@example.com", fetch).active
+
+    assert fetch.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_stale_hits_return_the_old_value_while_one_refresh_runs(cache, clock):
+    fetch = FakeFetch(granted("trialing"), granted("active"))
+    cache.get("alice@example.com", fetch)
+    clock.advance(61)
+    fetch.hold.clear()
+    fetch.entered.clear()
+
+    first = cache.get("alice@example.com", fetch)
+    assert fetch.entered.wait(5)
+    second = cache.get("alice@example.com", fetch)
+
+    assert first.status == second.status == "trialing"
+    assert fetch.calls == 2
+    assert cache.stats()["stale_hits"] == 2
+
+    fetch.hold.set()
+    wait_until(settled(cache))
+    assert cache.get("alice@example.com", fetch).status == "active"
+    assert fetch.calls == 2
+
+
+def test_denied_entitlements_are_never_served_stale(cache, clock):
+    fetch = FakeFetch(denied(), granted())
+    cache.get("alice@example.com", fetch)
+    clock.advance(61)
+
+    # The lookup happens before answering, so a user who just paid gets in right away
+    assert cache.get("alice@example.com", fetch).active
+    assert cache.stats()["stale_hits"] == 0
+    assert fetch.calls == 2
+
+
+def test_entries_past_the_stale_window_are_looked_up(cache, clock):
+    fetch = FakeFetch(granted(), denied())
+    cache.get("alice@example.com", fetch)
+    clock.advance(361)
+
+    assert not cache.get("alice@example.com", fetch).active
+
+
+def test_invalidate_during_a_refresh_wins(cache, clock):
+    fetch = FakeFetch(granted("active"), granted("active"), denied())
+    cache.get("alice@example.com", fetch)
+    clock.advance(61)
+    fetch.hold.clear()
+    fetch.entered.clear()
+    cache.get("alice@example.com", fetch)
+    assert fetch.entered.wait(5)
+
+    # The user cancels and the app invalidates while the refresh is still looking up
+    cache.invalidate("alice@example.com")
+    fetch.hold.set()
+    wait_until(settled(cache))
+
+    # The refresh did not write its answer back: the next read looks the user up again
+    assert not cache.get("alice@example.com", fetch).active
+    assert fetch.calls == 3
+
+
+def test_refresh_does_not_overwrite_a_newer_entry_with_the_same_timestamp(cache, clock):
+    fetch = FakeFetch(granted("active"), granted("active"))
+    cache.get("alice@example.com", fetch)
+    clock.advance(61)
+    fetch.hold.clear()
+    fetch.entered.clear()
+    cache.get("alice@example.com", fetch)
+    assert fetch.entered.wait(5)
+
+    # Replaced while the refresh runs, at the same clock reading the refresh started at
+    cache.invalidate("alice@example.com")
+    cache.get("alice@example.com", lambda email: denied())
+    fetch.hold.set()
+    wait_until(settled(cache))
+
+    assert not cache.get("alice@example.com", fetch).active
+
+
+def test_failed_refresh_keeps_serving_the_stale_entry(cache, clock):
+    def failing(email):
+        raise ConnectionError("Stripe unavailable")
+
+    cache.get("alice@example.com", FakeFetch(granted()))
+    clock.advance(61)
+
+    assert cache.get("alice@example.com", failing).active
+    wait_until(settled(cache))
+    assert cache.get("alice@example.com", failing).active
+    assert cache.stats()["refresh_errors"] >= 1
+
+
+def test_entitlement_from_record_honours_the_period_end():
+    record = {"email": "alice@example.com", "customer_id": "cus_1", "status": "active", "period_end": 2_000}
+
+    assert entitlement_from_record(record, now=1_000).active
+    assert entitlement_from_record(record, now=2_000 + ENTITLEMENT_PERIOD_GRACE_SECONDS - 1).active
+    assert not entitlement_from_record(record, now=2_000 + ENTITLEMENT_PERIOD_GRACE_SECONDS + 1).active
+    assert not entitlement_from_record(dict(record, status="canceled"), now=1_000).active
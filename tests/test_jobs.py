@@ -0,0 +1,173 @@
+"""Background job queue: coalescing, cancellation and queue limits."""
+import threading
+import time
+
+import pytest
+
+from src.errors import QueueFullError
+from src.jobs import (
+    JOB_CANCELLED, JOB_FAILED, JOB_QUEUED, JOB_SUCCEEDED, JobQueue, appeal_job_key
+)
+
+
+def wait_done(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.done:
+        assert time.monotonic() < deadline, f"Job {job.id} did not finish"
+        time.sleep(0.005)
+    return job
+
+
+class Gate:
+    """Work function that blocks until the test opens the gate."""
+
+    def __init__(self, result="done"):
+        self.started = threading.Event()
+        self.opened = threading.Event()
+        self.result = result
+        self.calls = 0
+
+    def __call__(self, job):
+        self.calls += 1
+        self.started.set()
+        assert self.opened.wait(5)
+        return self.result
+
+
+@pytest.fixture
+def queue():
+    return JobQueue(workers=1, max_queue_depth=2, result_ttl_seconds=60)
+
+
+def test_job_result(queue):
+    job = wait_done(queue.submit("alice", lambda job: 42))
+
+    assert job.status == JOB_SUCCEEDED
+    assert job.result == 42
+    assert queue.get(job.id, owner="alice") is job
+    assert queue.get(job.id, owner="bob") is None
+
+
+def test_failed_job_records_the_error(queue):
+    def work(job):
+        raise RuntimeError("boom")
+
+    job = wait_done(queue.submit("alice", work))
+
+    assert job.status == JOB_FAILED
+    assert job.error == "boom"
+
+
+def test_same_key_joins_the_job_in_flight(queue):
+    gate = Gate()
+    first = queue.submit("alice", gate, key="k")
+    second = queue.submit("alice", gate, key="k")
+    assert second is first
+    assert queue.in_flight("alice", "k") is first
+
+    gate.opened.set()
+    wait_done(first)
+    assert gate.calls == 1
+    stats = queue.stats()
+    assert stats["submitted"] == 1
+    assert stats["coalesced"] == 2
+
+
+def test_coalesced_submission_calls_back(queue):
+    gate = Gate()
+    released = []
+    first = queue.submit("alice", gate, key="k", on_coalesced=lambda: released.append("first"))
+    second = queue.submit("alice", gate, key="k", on_coalesced=lambda: released.append("second"))
+    gate.opened.set()
+
+    assert second is first
+    assert released == ["second"]
+
+
+def test_coalescing_is_per_owner_and_key(queue):
+    gate = Gate()
+    first = queue.submit("alice", gate, key="k")
+    assert gate.started.wait(5)
+
+    assert queue.submit("bob", gate, key="k") is not first
+    assert queue.submit("alice", gate, key="other") is not first
+    assert queue.in_flight("bob", "other") is None
+    gate.opened.set()
+
+
+def test_finished_jobs_are_no_longer_in_flight(queue):
+    first = wait_done(queue.submit("alice", lambda job: 1, key="k"))
+
+    assert queue.in_flight("alice", "k") is None
+    second = queue.submit("alice", lambda job: 2, key="k")
+    assert second is not first
+    assert wait_done(second).result == 2
+
+
+def test_cancelled_queued_job_never_runs(queue):
+    gate = Gate()
+    running = queue.submit("alice", gate)
+    assert gate.started.wait(5)
+    waiting = queue.submit("alice", lambda job: pytest.fail("cancelled job ran"), key="k")
+    assert waiting.status == JOB_QUEUED
+    assert queue.queue_position(waiting.id) == 1
+
+    queue.cancel(waiting.id)
+    gate.opened.set()
+
+    assert wait_done(waiting).status == JOB_CANCELLED
+    assert wait_done(running).status == JOB_SUCCEEDED
+    assert queue.in_flight("alice", "k") is None
+    assert queue.stats()["cancelled"] == 1
+
+
+def test_running_job_stops_when_cancelled(queue):
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while not job.cancelled:
+            time.sleep(0.005)
+        return "partial"
+
+    job = queue.submit("alice", work)
+    assert started.wait(5)
+    queue.cancel(job.id)
+
+    assert wait_done(job).status == JOB_CANCELLED
+    assert job.result is None
+
+
+def test_full_queue_rejects_new_jobs(queue):
+    gate = Gate()
+    queue.submit("alice", gate)
+    assert gate.started.wait(5)
+    queue.submit("alice", gate)
+    queue.submit("alice", gate, key="k")
+
+    with pytest.raises(QueueFullError):
+        queue.submit("alice", gate)
+    # Joining a job in flight needs no room in the queue
+    queue.submit("alice", gate, key="k")
+    gate.opened.set()
+
+    assert queue.stats()["rejected"] == 1
+
+
+def test_expired_results_are_purged():
+    queue = JobQueue(workers=1, max_queue_depth=2, result_ttl_seconds=0)
+    job = wait_done(queue.submit("alice", lambda job: 1))
+    time.sleep(0.01)
+
+    queue.purge_expired()
+    assert queue.get(job.id) is None
+
+
+def test_appeal_job_key_covers_every_input():
+    key = appeal_job_key(b"%PDF", {"name": "A", "title": "B"}, "model", "appeal_body@3")
+
+    assert key == appeal_job_key(b"%PDF", {"title": "B", "name": "A"}, "model", "appeal_body@3")
+    assert key != appeal_job_key(b"%PDF-2", {"name": "A", "title": "B"}, "model", "appeal_body@3")
+    assert key != appeal_job_key(b"%PDF", {"name": "C", "title": "B"}, "model", "appeal_body@3")
+    assert key != appeal_job_key(b"%PDF", {"name": "A", "title": "B"}, "other", "appeal_body@3")
+    assert key != appeal_job_key(b"%PDF", {"name": "A", "title": "B"}, "model", "appeal_body@4")
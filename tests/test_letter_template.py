@@ -0,0 +1,107 @@
+"""Appeal letter frame around the generated body."""
+import datetime
+
+import pytest
+
+from src.denial_extraction import DenialRecord
+from src.letter_template import CLOSING, DEFAULT_TITLE, SALUTATION, build_letter, clean_body, format_date
+
+TODAY = datetime.date(2025, 3, 4)
+ADVOCATE = {"name": "Jane Doe", "title": "Patient Advocate", "address": "123 Main St\n  Springfield, IL 62701\n"}
+BODY = "I am writing to appeal the denial of the claim.\n\nThe MRI was medically necessary."
+
+
+def test_format_date():
+    assert format_date(TODAY) == "March 4, 2025"
+    assert format_date(datetime.date(2024, 12, 31)) == "December 31, 2024"
+
+
+def test_header_is_filled_from_the_denial_record():
+    record = DenialRecord(
+        payer="Blue Cross", claim_number="CLM-1234", member_id="XYZ987", dates_of_service=["01/02/2025", "01/09/2025"]
+    )
+
+    letter = build_letter(ADVOCATE, record, today=TODAY)
+
+    assert letter.opening == "\n".join([
+        "Jane Doe",
+        "Patient Advocate",
+        "123 Main St",
+        "Springfield, IL 62701",
+        "",
+        "March 4, 2025",
+        "",
+        "Blue Cross",
+        "Attn: Appeals Department",
+        "",
+        "Re: Appeal of claim denial "
+        "(Claim number CLM-1234; Member ID XYZ987; Date(s) of service 01/02/2025, 01/09/2025)",
+        "",
+        SALUTATION,
+        "",
+        "",
+    ])
+    assert letter.closing == "\n".join(["", "", CLOSING, "", "Jane Doe", "Patient Advocate"])
+
+
+def test_header_leaves_out_fields_the_record_lacks():
+    letter = build_letter(ADVOCATE, DenialRecord(member_id="XYZ987"), today=TODAY)
+
+    assert "Attn: Appeals Department" not in letter.opening
+    assert "Re: Appeal of claim denial (Member ID XYZ987)\n" in letter.opening
+    assert "Re: Appeal of claim denial\n" in build_letter(ADVOCATE, DenialRecord(), today=TODAY).opening
+    assert "Re:" not in build_letter(ADVOCATE, today=TODAY).opening
+
+
+@pytest.mark.parametrize("details", [
+    {"name": "[Your Name]", "title": "[Title]", "address": "[Mailing Address]"},
+    {"name": "your name", "title": "", "address": "Mailing address"},
+    {},
+])
+def test_placeholder_advocate_details_are_left_out(details):
+    letter = build_letter(details, today=TODAY)
+
+    assert letter.opening.startswith(f"{DEFAULT_TITLE}\n\nMarch 4, 2025\n")
+    assert letter.closing.endswith(f"{CLOSING}\n\n{DEFAULT_TITLE}")
+    assert "[" not in letter.opening + letter.closing
+
+
+def test_render_puts_the_cleaned_body_between_the_frame():
+    letter = build_letter(ADVOCATE, today=TODAY)
+
+    text = letter.render(f"Dear Sir or Madam,\n\n{BODY}\n\nSincerely,\nJane Doe")
+
+    assert text == f"{letter.opening}{BODY}{letter.closing}"
+    assert text.count(SALUTATION) == 1 and text.count(CLOSING) == 1
+
+
+@pytest.mark.parametrize("body", [
+    BODY,
+    f"\n\n  {BODY}  \n",
+    f"Dear Appeals Reviewer:\n\n{BODY}",
+    f"To Whom It May Concern:\n{BODY}",
+    f"Date: March 4, 2025\nRe: Claim CLM-1234\nSubject: Appeal\n\nDear Reviewer,\n{BODY}",
+    f"{BODY}\n\nSincerely,",
+    f"{BODY}\n\nRespectfully submitted,\nJane Doe\nPatient Advocate",
+    f"{BODY}\n\nBest regards,\nJane Doe",
+    f"{BODY}\n\nYours truly\n",
+])
+def test_clean_body_removes_duplicate_salutations_and_sign_offs(body):
+    assert clean_body(body) == BODY
+
+
+@pytest.mark.parametrize("body", [
+    f"[Your Name]\n[Your Address]\n[Date]\n\nDear Appeals Reviewer:\n\n{BODY}",
+    f"{BODY}\n\nSincerely,\n[Your Name]\n[Your Title]",
+    f"{BODY}\n[Insert supporting documentation here]",
+    f"Your Name\nMailing Address\n{BODY}",
+])
+def test_clean_body_strips_leftover_placeholder_lines(body):
+    assert clean_body(body) == BODY
+
+
+def test_clean_body_keeps_the_argument_intact():
+    # A sign-off word early in the text, and inline brackets, are part of the argument
+    body = "Regards,\nthe plan's own policy [section 4.2] covers this.\n" + "\n".join(["More detail."] * 6)
+
+    assert clean_body(body) == body
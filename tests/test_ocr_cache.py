@@ -0,0 +1,120 @@
+"""OCR result cache: memory and encrypted disk tiers."""
+import os
+import time
+
+import pytest
+
+from src.ocr_cache import OCRCache, cache_key
+from src.ocr_engine import PageResult, SOURCE_FAILED, SOURCE_OCR, SOURCE_SKIPPED, SOURCE_TEXT_LAYER
+
+
+def pages(*sources_and_texts):
+    return [
+        PageResult(page_number=number, text=text, source=source)
+        for number, (source, text) in enumerate(sources_and_texts, start=1)
+    ]
+
+
+GOOD = pages((SOURCE_TEXT_LAYER, "Claim denied."), (SOURCE_OCR, "Reason code CO-50"), (SOURCE_SKIPPED, ""))
+
+
+def test_cache_key_depends_on_content_and_parameters():
+    key = cache_key(b"%PDF-1", 1, 10)
+
+    assert key == cache_key(b"%PDF-1", 1, 10)
+    assert key != cache_key(b"%PDF-2", 1, 10)
+    assert key != cache_key(b"%PDF-1", 1, 5)
+    assert key != cache_key(b"%PDF-1", 1, 10, char_budget=4_000)
+    assert key != cache_key(b"%PDF-1", 1, 10, ranked=True)
+
+
+def test_memory_hit_and_miss():
+    cache = OCRCache(max_entries=2, max_age_seconds=60)
+    assert cache.get("k") is None
+
+    cache.put("k", GOOD)
+
+    assert cache.get("k") == GOOD
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = OCRCache(max_entries=2, max_age_seconds=60)
+    cache.put("a", GOOD)
+    cache.put("b", GOOD)
+    cache.get("a")
+    cache.put("c", GOOD)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.parametrize("failed", [
+    pages((SOURCE_TEXT_LAYER, "Claim denied."), (SOURCE_FAILED, "")),
+    pages((SOURCE_TEXT_LAYER, "Claim denied."), (SOURCE_OCR, "  \n")),
+])
+def test_results_with_failed_pages_are_not_cached(failed):
+    cache = OCRCache(max_entries=2, max_age_seconds=60)
+
+    cache.put("k", failed)
+
+    assert cache.get("k") is None
+    assert cache.stats()["skipped_failures"] == 1
+
+
+def test_expired_entries_are_purged():
+    cache = OCRCache(max_entries=2, max_age_seconds=0)
+    cache.put("k", GOOD)
+    time.sleep(0.01)
+
+    assert cache.purge_expired() == 1
+    assert cache.get("k") is None
+
+
+def test_disk_tier_survives_memory_eviction(tmp_path):
+    cache = OCRCache(max_entries=1, max_age_seconds=60, disk_dir=str(tmp_path))
+    cache.put("a", GOOD)
+    cache.put("b", GOOD)
+
+    assert cache.get("a") == GOOD
+    assert cache.stats()["disk_hits"] == 1
+    # Entries are encrypted on disk
+    assert all(b"Claim denied" not in path.read_bytes() for path in tmp_path.iterdir())
+
+
+def test_disk_tier_of_another_key_is_unreadable(tmp_path):
+    OCRCache(max_entries=1, max_age_seconds=60, disk_dir=str(tmp_path)).put("a", GOOD)
+
+    assert OCRCache(max_entries=1, max_age_seconds=60, disk_dir=str(tmp_path)).get("a") is None
+
+
+@pytest.mark.parametrize("disk", [False, True])
+def test_callers_get_copies_of_cached_pages(tmp_path, disk):
+    cache = OCRCache(max_entries=1, max_age_seconds=60, disk_dir=str(tmp_path) if disk else None)
+    stored = pages((SOURCE_OCR, "Reason code CO-50"))
+    cache.put("k", stored)
+    stored[0].text = "changed after put"
+    if disk:
+        cache.put("other", GOOD)  # Evicts "k" from memory, so the next get reads the disk tier
+
+    first = cache.get("k")
+    first[0].text = "changed by caller"
+    first[0].timings["ocr"] = 9.0
+    first.append(first[0])
+
+    assert cache.get("k") == pages((SOURCE_OCR, "Reason code CO-50"))
+
+
+def test_failed_disk_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    cache = OCRCache(max_entries=1, max_age_seconds=60, disk_dir=str(tmp_path))
+
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "replace", fail_replace)
+    cache.put("k", GOOD)
+
+    assert list(tmp_path.iterdir()) == []
+    assert cache.get("k") == GOOD
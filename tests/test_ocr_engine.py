@@ -0,0 +1,311 @@
+"""Page extraction with poppler and Tesseract replaced by in-process fakes."""
+import io
+import subprocess
+import threading
+import time
+
+import pytest
+
+from src import ocr_engine
+from src.ocr_engine import (
+    OCRError, SOURCE_FAILED, SOURCE_OCR, SOURCE_SKIPPED, SOURCE_TEXT_LAYER, _chunk_ranges, _parse_pgm_stream,
+    _run_poppler, extract_pages_from_pdf, is_plausible_text, iter_pages_from_pdf, next_unextracted_page
+)
+
+PDF = b"%PDF-1.7 fake"
+LETTER = (
+    "We have reviewed the claim for services on March 4, 2025 and denied payment because the "
+    "procedure was not medically necessary under the member's plan. You may appeal within 180 days."
+)
+
+
+def pgm(page_num: int, width: int = 4, height: int = 3) -> bytes:
+    """Raw PGM image whose pixels all hold the page number (how FakeOCR tells pages apart)."""
+    return f"P5\n{width} {height}\n255\n".encode("ascii") + bytes([page_num % 256]) * (width * height)
+
+
+class FakePoppler:
+    """pdfinfo, pdftotext and pdftoppm for a document described page by page."""
+
+    def __init__(self, page_count: int, text_layers=None, broken_pages=()):
+        self.page_count = page_count
+        self.text_layers = text_layers or {}
+        self.broken_pages = set(broken_pages)
+        self.renders = []
+        self.tools = []
+        self.inputs = []
+
+    def __call__(self, tool, options, pdf, timeout, output=None):
+        self.tools.append(tool)
+        self.inputs.append(pdf)
+        if tool == "pdfinfo":
+            return f"Title: fake\nPages: {self.page_count}\n".encode("ascii")
+        first, last = int(options[options.index("-f") + 1]), int(options[options.index("-l") + 1])
+        pages = range(first, last + 1)
+        if tool == "pdftotext":
+            return "".join(self.text_layers.get(page, "") + "\f" for page in pages).encode("utf-8")
+        self.renders.append((first, last))
+        if self.broken_pages.intersection(pages):
+            raise subprocess.CalledProcessError(1, tool, stderr=b"Syntax Error: broken page")
+        return b"".join(pgm(page) for page in pages)
+
+
+class FakeOCR:
+    """_recognize stand-in: reads the page number from the pixels."""
+
+    def __init__(self, failing_pages=(), delay=None):
+        self.failing_pages = set(failing_pages)
+        self.delay = delay
+        self.pages = []
+
+    def __call__(self, image, dpi, with_confidence):
+        page_num = image.getpixel((0, 0))
+        self.pages.append(page_num)
+        if self.delay:
+            time.sleep(self.delay(page_num))
+        if page_num in self.failing_pages:
+            raise RuntimeError("tesseract crashed")
+        return f"Recognized text of page {page_num}", [90.0], 0
+
+
+@pytest.fixture
+def fake_engine(monkeypatch):
+    """Install fakes for a document; returns (poppler, ocr)."""
+    def install(page_count, text_layers=None, broken_pages=(), failing_pages=(), delay=None, chunk_size=8):
+        poppler = FakePoppler(page_count, text_layers, broken_pages)
+        ocr = FakeOCR(failing_pages, delay)
+        monkeypatch.setattr(ocr_engine, "_run_poppler", poppler)
+        monkeypatch.setattr(ocr_engine, "_recognize", ocr)
+        monkeypatch.setattr(ocr_engine, "OCR_CHUNK_SIZE", chunk_size)
+        return poppler, ocr
+    return install
+
+
+def extract(**kwargs):
+    return extract_pages_from_pdf(PDF, adaptive_dpi=False, **kwargs)
+
+
+def test_chunk_ranges_split_at_gaps_and_chunk_size():
+    assert _chunk_ranges([], 8) == []
+    assert _chunk_ranges([1, 2, 3, 5, 6, 9], 8) == [(1, 3), (5, 6), (9, 9)]
+    assert _chunk_ranges([1, 2, 3, 5, 6, 9], 2) == [(1, 2), (3, 3), (5, 6), (9, 9)]
+    assert _chunk_ranges(list(range(1, 8)), 3) == [(1, 3), (4, 6), (7, 7)]
+
+
+def test_pages_are_yielded_in_page_order(fake_engine):
+    # Later pages finish first
+    poppler, _ = fake_engine(10, delay=lambda page: (11 - page) * 0.003, chunk_size=4)
+
+    pages = extract(workers=4)
+
+    assert [page.page_number for page in pages] == list(range(1, 11))
+    assert [page.text for page in pages] == [f"Recognized text of page {n}" for n in range(1, 11)]
+    assert all(page.source == SOURCE_OCR and page.dpi for page in pages)
+    assert poppler.renders == [(1, 4), (5, 8), (9, 10)]
+
+
+def test_failed_page_ocr_does_not_stop_the_others(fake_engine):
+    fake_engine(5, failing_pages={2, 4})
+
+    pages = extract(workers=2)
+
+    assert [page.source for page in pages] == [SOURCE_OCR, SOURCE_FAILED, SOURCE_OCR, SOURCE_FAILED, SOURCE_OCR]
+    assert pages[2].text == "Recognized text of page 3"
+
+
+def test_broken_page_is_retried_on_its_own(fake_engine):
+    poppler, _ = fake_engine(4, broken_pages={3})
+
+    pages = extract()
+
+    assert [page.source for page in pages] == [SOURCE_OCR, SOURCE_OCR, SOURCE_FAILED, SOURCE_OCR]
+    # The chunk render failed, then every page of it was rendered on its own
+    assert poppler.renders == [(1, 4), (1, 1), (2, 2), (3, 3), (4, 4)]
+
+
+def test_failed_chunk_does_not_stop_later_chunks(fake_engine):
+    fake_engine(6, broken_pages={1, 2, 3}, chunk_size=3)
+
+    pages = extract()
+
+    assert [page.source for page in pages] == [SOURCE_FAILED] * 3 + [SOURCE_OCR] * 3
+
+
+def test_page_selection_and_page_cap(fake_engine):
+    poppler, _ = fake_engine(20)
+
+    assert [page.page_number for page in extract(page_numbers=[7, 3, 25, 4])] == [3, 4, 7]
+    assert len(extract(max_pages=5)) == 5
+    assert [page.page_number for page in extract(first_page=18)] == [18, 19, 20]
+
+
+@pytest.mark.parametrize("text, plausible", [
+    (LETTER, True),
+    ("", False),
+    ("   \n\f  ", False),
+    ("Page 1 of 3", False),
+    (LETTER + " \ufffd", False),
+    ("%$#@ !&*() ~" * 20, False),
+    ("3/4 ($1,250.00) -- " * 10, False),
+])
+def test_is_plausible_text(text, plausible):
+    assert is_plausible_text(text) is plausible
+
+
+def test_real_text_layer_skips_ocr(fake_engine):
+    poppler, ocr = fake_engine(3, text_layers={1: LETTER, 2: LETTER, 3: LETTER})
+
+    pages = extract()
+
+    assert [page.source for page in pages] == [SOURCE_TEXT_LAYER] * 3
+    assert pages[0].text == LETTER
+    assert poppler.renders == [] and ocr.pages == []
+
+
+@pytest.mark.parametrize("layer", ["", "  \n ", "\ufffd\ufffd\ufffd " * 40, "_-_~" * 40])
+def test_empty_or_garbage_text_layer_falls_back_to_ocr(fake_engine, layer):
+    poppler, _ = fake_engine(2, text_layers={1: layer, 2: layer})
+
+    pages = extract()
+
+    assert [page.source for page in pages] == [SOURCE_OCR] * 2
+    assert pages[1].text == "Recognized text of page 2"
+    assert poppler.renders == [(1, 2)]
+
+
+def test_mixed_document_only_ocrs_scanned_pages(fake_engine):
+    poppler, ocr = fake_engine(5, text_layers={1: LETTER, 2: "", 3: LETTER, 4: "x", 5: ""})
+
+    pages = extract()
+
+    assert [page.source for page in pages] == [
+        SOURCE_TEXT_LAYER, SOURCE_OCR, SOURCE_TEXT_LAYER, SOURCE_OCR, SOURCE_OCR
+    ]
+    assert [page.page_number for page in pages] == [1, 2, 3, 4, 5]
+    assert poppler.renders == [(2, 2), (4, 5)]
+    assert sorted(ocr.pages) == [2, 4, 5]
+
+
+def test_text_layer_can_be_disabled(fake_engine):
+    poppler, _ = fake_engine(2, text_layers={1: LETTER, 2: LETTER})
+
+    pages = extract(use_text_layer=False)
+
+    assert [page.source for page in pages] == [SOURCE_OCR] * 2
+    assert "pdftotext" not in poppler.tools
+
+
+def test_parse_pgm_stream_splits_concatenated_pages():
+    images = _parse_pgm_stream(pgm(1) + pgm(2, width=5, height=2) + b"P5 3 1 255 " + bytes([7, 8, 9]))
+
+    assert [image.size for image in images] == [(4, 3), (5, 2), (3, 1)]
+    assert [image.getpixel((0, 0)) for image in images] == [1, 2, 7]
+    assert list(images[2].getdata()) == [7, 8, 9]
+
+
+def test_parse_pgm_stream_of_nothing_is_empty():
+    assert _parse_pgm_stream(b"") == []
+
+
+@pytest.mark.parametrize("data", [
+    pgm(1)[:-1],
+    pgm(1) + pgm(2)[:-5],
+    pgm(1) + b"P5\n4 3\n255\n",
+])
+def test_parse_pgm_stream_rejects_truncated_output(data):
+    with pytest.raises(OCRError, match="Truncated"):
+        _parse_pgm_stream(data)
+
+
+@pytest.mark.parametrize("data", [b"P6\n4 3\n255\n" + bytes(36), pgm(1) + b"\x00\x00", b"<html>error</html>"])
+def test_parse_pgm_stream_rejects_other_output(data):
+    with pytest.raises(OCRError, match="Unexpected"):
+        _parse_pgm_stream(data)
+
+
+def test_truncated_chunk_is_retried_page_by_page(fake_engine, monkeypatch):
+    poppler, _ = fake_engine(3)
+    render = poppler.__call__
+
+    def truncating(tool, options, pdf, timeout, output=None):
+        output_bytes = render(tool, options, pdf, timeout, output)
+        return output_bytes[:-3] if tool == "pdftoppm" and options[options.index("-l") + 1] == "3" else output_bytes
+    monkeypatch.setattr(ocr_engine, "_run_poppler", truncating)
+
+    pages = extract()
+
+    assert [page.source for page in pages] == [SOURCE_OCR, SOURCE_OCR, SOURCE_FAILED]
+    assert poppler.renders == [(1, 3), (1, 1), (2, 2), (3, 3)]
+
+
+def test_in_memory_pdf_is_piped_through_stdin(monkeypatch):
+    calls = []
+
+    def run(command, input=None, **kwargs):
+        calls.append((command, input))
+        return subprocess.CompletedProcess(command, 0, stdout=b"ok")
+    monkeypatch.setattr(subprocess, "run", run)
+
+    assert _run_poppler("pdftoppm", ["-gray"], PDF, timeout=5) == b"ok"
+    _run_poppler("pdftotext", ["-enc", "UTF-8"], "/tmp/denial.pdf", timeout=5, output="-")
+
+    assert calls == [
+        (["pdftoppm", "-gray", "-"], PDF),
+        (["pdftotext", "-enc", "UTF-8", "/tmp/denial.pdf", "-"], None),
+    ]
+
+
+@pytest.mark.parametrize("source", [PDF, bytearray(PDF), memoryview(PDF), io.BytesIO(PDF)])
+def test_in_memory_sources_reach_poppler_as_bytes(fake_engine, source):
+    poppler, _ = fake_engine(2)
+
+    pages = extract_pages_from_pdf(source, adaptive_dpi=False)
+
+    assert len(pages) == 2
+    assert poppler.inputs and all(pdf == PDF and isinstance(pdf, bytes) for pdf in poppler.inputs)
+
+
+def test_char_budget_stops_ocr_and_skips_the_rest(fake_engine):
+    poppler, _ = fake_engine(10, chunk_size=2)
+
+    pages = extract(char_budget=40)
+
+    assert [page.source for page in pages] == [SOURCE_OCR] * 2 + [SOURCE_SKIPPED] * 8
+    assert all(page.text == "" for page in pages[2:])
+    assert poppler.renders == [(1, 2), (3, 4)]
+    assert next_unextracted_page(pages) == 3
+
+    rest = extract(first_page=next_unextracted_page(pages))
+    assert [page.page_number for page in rest] == list(range(3, 11))
+    assert all(page.source == SOURCE_OCR for page in rest)
+
+
+def test_char_budget_filled_by_text_layer_skips_ocr(fake_engine):
+    poppler, ocr = fake_engine(4, text_layers={1: LETTER})
+
+    pages = extract(char_budget=len(LETTER))
+
+    assert [page.source for page in pages] == [SOURCE_TEXT_LAYER] + [SOURCE_SKIPPED] * 3
+    assert poppler.renders == [] and ocr.pages == []
+
+
+def test_cancel_stops_rendering_and_yielding(fake_engine):
+    poppler, _ = fake_engine(10, chunk_size=2)
+    cancel = threading.Event()
+
+    yielded = []
+    for page in iter_pages_from_pdf(PDF, adaptive_dpi=False, cancel_event=cancel):
+        yielded.append(page.page_number)
+        cancel.set()
+
+    assert yielded == [1]
+    assert max(last for _, last in poppler.renders) < 10
+
+
+def test_cancel_before_start_renders_nothing(fake_engine):
+    poppler, ocr = fake_engine(4)
+    cancel = threading.Event()
+    cancel.set()
+
+    assert list(iter_pages_from_pdf(PDF, adaptive_dpi=False, cancel_event=cancel)) == []
+    assert poppler.renders == [] and ocr.pages == []
@@ -0,0 +1,145 @@
+"""Fair OCR slot scheduling across users."""
+import threading
+import time
+
+import pytest
+
+from src.errors import QueueFullError
+from src.ocr_scheduler import OCRScheduler
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.002)
+
+
+class Waiter(threading.Thread):
+    """Thread that waits for a slot, records the grant, and frees the slot again."""
+
+    def __init__(self, scheduler, owner, granted=None, cancel_event=None):
+        super().__init__(daemon=True)
+        self.scheduler = scheduler
+        self.owner = owner
+        self.granted = granted if granted is not None else []
+        self.cancel_event = cancel_event
+        self.result = None
+
+    def run(self):
+        self.result = self.scheduler.acquire(self.owner, self.cancel_event)
+        if self.result:
+            self.granted.append(self.owner)
+            self.scheduler.release()
+
+
+def enqueue(scheduler, owner, **kwargs):
+    """Start a waiter and return once it is in line (so the line order is known)."""
+    waiting = scheduler.stats()["waiting"]
+    waiter = Waiter(scheduler, owner, **kwargs)
+    waiter.start()
+    wait_until(lambda: scheduler.stats()["waiting"] == waiting + 1)
+    return waiter
+
+
+@pytest.fixture
+def scheduler():
+    # One slot, held by the test until the line is set up
+    scheduler = OCRScheduler(capacity=1, max_waiting=10, initial_task_seconds=2.0)
+    assert scheduler.acquire("holder")
+    return scheduler
+
+
+def test_slots_are_granted_round_robin_across_owners(scheduler):
+    granted = []
+    waiters = [enqueue(scheduler, owner, granted=granted) for owner in ("alice", "alice", "alice", "bob")]
+
+    scheduler.release()
+    for waiter in waiters:
+        waiter.join(5)
+
+    # Bob's single task does not wait behind Alice's whole backlog
+    assert granted == ["alice", "bob", "alice", "alice"]
+    stats = scheduler.stats()
+    assert stats["granted"] == 5
+    assert stats["waiting"] == 0
+    assert stats["active"] == 0
+
+
+def test_cancelled_waiter_leaves_the_line(scheduler):
+    cancel = threading.Event()
+    cancelled = enqueue(scheduler, "alice", cancel_event=cancel)
+    granted = []
+    other = enqueue(scheduler, "bob", granted=granted)
+
+    cancel.set()
+    cancelled.join(5)
+
+    assert cancelled.result is False
+    assert scheduler.position("alice") is None
+    assert scheduler.position("bob") == 1
+    assert scheduler.stats()["abandoned"] == 1
+
+    scheduler.release()
+    other.join(5)
+    assert granted == ["bob"]
+
+
+def test_slot_context_manager_skips_cancelled_tasks(scheduler):
+    cancel = threading.Event()
+    cancel.set()
+
+    with scheduler.slot("alice", cancel) as held:
+        assert held is False
+    assert scheduler.stats()["active"] == 1
+
+
+def test_admission_is_refused_when_the_line_is_full():
+    scheduler = OCRScheduler(capacity=1, max_waiting=2)
+    assert scheduler.acquire("holder")
+    scheduler.check_admission()
+    waiters = [enqueue(scheduler, owner) for owner in ("alice", "bob")]
+
+    with pytest.raises(QueueFullError):
+        scheduler.check_admission()
+    assert scheduler.stats()["rejected"] == 1
+
+    scheduler.release()
+    for waiter in waiters:
+        waiter.join(5)
+    scheduler.check_admission()
+
+
+def test_position_and_eta(scheduler):
+    waiters = [enqueue(scheduler, owner) for owner in ("alice", "alice", "bob")]
+
+    assert scheduler.position("alice") == 1
+    assert scheduler.position("bob") == 2
+    assert scheduler.position("carol") is None
+    # No slot is free: each place in line waits about one task duration
+    assert scheduler.eta_seconds("alice") == 2.0
+    assert scheduler.eta_seconds("bob") == 4.0
+    assert scheduler.eta_seconds("carol") is None
+
+    scheduler.release()
+    for waiter in waiters:
+        waiter.join(5)
+    assert scheduler.position("alice") is None
+
+
+def test_eta_follows_measured_task_durations():
+    scheduler = OCRScheduler(capacity=2, max_waiting=10, initial_task_seconds=2.0)
+    assert scheduler.acquire("a")
+    assert scheduler.acquire("b")
+    scheduler.release(task_seconds=12.0)
+    assert scheduler.stats()["task_seconds"] == 4.0
+
+    assert scheduler.acquire("c")
+    waiters = [enqueue(scheduler, owner) for owner in ("alice", "bob", "carol")]
+    assert [scheduler.eta_seconds(owner) for owner in ("alice", "bob", "carol")] == [4.0, 4.0, 8.0]
+
+    scheduler.release()
+    scheduler.release()
+    for waiter in waiters:
+        waiter.join(5)
+    assert scheduler.stats()["max_waiting_seen"] == 3
@@ -0,0 +1,57 @@
+"""Page relevance scoring, page selection and merging of page texts."""
+from src.ocr_engine import (
+    PageResult, SOURCE_FAILED, SOURCE_OCR, SOURCE_SKIPPED, SOURCE_TEXT_LAYER, join_page_texts, page_texts
+)
+from src.page_triage import score_page, select_pages
+
+
+def scored(number, text):
+    page = PageResult(page_number=number, text=text, source=SOURCE_OCR)
+    page.relevance, page.signals = score_page(text)
+    return page
+
+
+def test_denial_letter_outscores_boilerplate():
+    letter, signals = score_page(
+        "Your claim has been denied. Reason code CO-50: not medically necessary. Claim Number: 2594848098"
+    )
+    boilerplate, _ = score_page("Nothing in this letter limits the rights afforded to you under your plan.")
+
+    assert {"denied", "carc", "medical_necessity", "claim_number"} <= set(signals)
+    assert letter > 0 == boilerplate
+
+
+def test_repeated_signals_are_capped():
+    three, _ = score_page("CO-50 " * 3)
+    many, _ = score_page("CO-50 " * 30)
+    assert many == three
+
+
+def test_select_pages_fills_the_budget_by_relevance_in_page_order():
+    pages = [
+        scored(1, "Cover sheet " * 10),
+        scored(2, "EOB remark N115 " * 5),
+        scored(3, "Claim denied. Reason code CO-50: not medically necessary. " * 2),
+        scored(4, "Appeal rights: you may appeal within 180 days. " * 2),
+    ]
+
+    assert select_pages(pages, char_budget=10_000) == [2, 3, 4]
+    assert select_pages(pages, char_budget=1) == [3]
+    assert select_pages([scored(1, "Cover sheet")], char_budget=10_000) == []
+
+
+def test_page_texts_keep_extracted_pages_only():
+    pages = [
+        PageResult(page_number=1, text="letter", source=SOURCE_TEXT_LAYER),
+        PageResult(page_number=2, text="", source=SOURCE_SKIPPED),
+        PageResult(page_number=3, text="eob", source=SOURCE_OCR),
+        PageResult(page_number=4, text="", source=SOURCE_FAILED),
+    ]
+    assert page_texts(pages) == {1: "letter", 3: "eob"}
+
+
+def test_merged_page_texts_are_joined_in_page_order():
+    first_pass = {1: "letter", 5: "rationale"}
+    remaining = {3: "eob", 2: "policy"}
+
+    assert join_page_texts({**first_pass, **remaining}) == "letter\npolicy\neob\nrationale"
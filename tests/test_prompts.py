@@ -0,0 +1,74 @@
+"""Versioned prompt templates."""
+import pytest
+
+from src.prompts import APPEAL_BODY, DENIAL_FIELDS, TEMPLATES, PromptTemplate, get_template
+
+
+def test_template_ids_carry_the_version():
+    assert APPEAL_BODY.id == "appeal_body@3"
+    assert DENIAL_FIELDS.id == "denial_fields@1"
+    assert PromptTemplate("letter", 7, "Static.", "$context").id == "letter@7"
+
+
+def test_templates_are_looked_up_by_id():
+    assert get_template("appeal_body@3") is APPEAL_BODY
+    assert get_template(DENIAL_FIELDS.id) is DENIAL_FIELDS
+    assert set(TEMPLATES) == {APPEAL_BODY.id, DENIAL_FIELDS.id}
+
+
+@pytest.mark.parametrize("prompt_id", ["appeal_body@2", "appeal_body", "cover_letter@1", ""])
+def test_unknown_template_ids_are_rejected(prompt_id):
+    with pytest.raises(ValueError, match="Unknown prompt template"):
+        get_template(prompt_id)
+
+
+def test_fields_come_from_the_user_template():
+    assert APPEAL_BODY.fields == {"title", "context"}
+    assert DENIAL_FIELDS.fields == {"context"}
+    assert PromptTemplate("t", 1, "Static.", "No data.").fields == frozenset()
+
+
+def test_messages_put_static_instructions_first():
+    messages = APPEAL_BODY.messages(title="Patient Advocate", context="Claim CLM-1 denied: CO-50.")
+
+    assert [message["role"] for message in messages] == ["system", "user"]
+    assert messages[0]["content"] == APPEAL_BODY.system
+    assert "<advocate_title>Patient Advocate</advocate_title>" in messages[1]["content"]
+    assert "Claim CLM-1 denied: CO-50." in messages[1]["content"]
+
+
+def test_values_are_not_substituted_twice():
+    # Placeholders inside the request data stay literal text
+    messages = DENIAL_FIELDS.messages(context="Paid $context and ${title} of $100")
+
+    assert "Paid $context and ${title} of $100" in messages[1]["content"]
+
+
+@pytest.mark.parametrize("values", [
+    {},
+    {"title": "Patient Advocate"},
+    {"title": "Patient Advocate", "context": "...", "payer": "Blue Cross"},
+    {"context": "...", "titel": "Patient Advocate"},
+])
+def test_missing_or_unknown_placeholder_values_are_rejected(values):
+    with pytest.raises(ValueError, match=r"appeal_body expects \['context', 'title'\]"):
+        APPEAL_BODY.messages(**values)
+
+
+@pytest.mark.parametrize("user", ["Price: $", "$1 dollars", "${context", "${con text}"])
+def test_malformed_placeholders_are_rejected(user):
+    with pytest.raises(ValueError, match="malformed placeholder"):
+        PromptTemplate("broken", 1, "Static.", user)
+
+
+@pytest.mark.parametrize("system", ["Write for $title.", "Context: ${context}"])
+def test_placeholders_in_system_instructions_are_rejected(system):
+    with pytest.raises(ValueError, match="per-request data"):
+        PromptTemplate("leaky", 1, system, "$context")
+
+
+def test_escaped_dollar_signs_are_literal():
+    template = PromptTemplate("money", 1, "Static.", "Billed $$$amount")
+
+    assert template.fields == {"amount"}
+    assert template.messages(amount="250")[1]["content"] == "Billed $250"
@@ -0,0 +1,88 @@
+"""Quota reservations, rollback and settlement against an in-memory backend."""
+import pytest
+
+from src.errors import RateLimitError
+from src.quotas import Cost, QuotaManager, plan_for_status, TRIAL_PLAN
+from src.rate_limiter import InMemoryBackend
+
+BUDGETS = {
+    "basic": {"ocr_units": (10, 100), "llm_tokens": (1_000, 10_000)},
+}
+
+
+@pytest.fixture
+def manager(clock):
+    return QuotaManager(BUDGETS, backend=InMemoryBackend(clock=clock))
+
+
+def test_reserve_within_budget(manager):
+    reservation = manager.reserve("alice", "basic", Cost(ocr_units=6, llm_tokens=500))
+
+    assert reservation.plan == "basic"
+    assert not reservation.settled
+    assert manager.stats()["reserved"] == 1
+
+
+def test_rejection_reports_retry_after(manager):
+    manager.reserve("alice", "basic", Cost(ocr_units=6, llm_tokens=500))
+
+    with pytest.raises(RateLimitError) as error:
+        manager.reserve("alice", "basic", Cost(ocr_units=6, llm_tokens=500))
+
+    assert error.value.retry_after > 0
+    assert "ocr units" in str(error.value)
+    assert manager.stats()["rejected"] == 1
+
+
+def test_rejected_reservation_rolls_back_charged_budgets(manager):
+    manager.reserve("alice", "basic", Cost(ocr_units=1, llm_tokens=900))
+
+    # OCR units are charged first, then the token budget rejects the request
+    with pytest.raises(RateLimitError):
+        manager.reserve("alice", "basic", Cost(ocr_units=1, llm_tokens=200))
+
+    # Without the rollback only 8 units would be left
+    manager.reserve("alice", "basic", Cost(ocr_units=9, llm_tokens=100))
+
+
+def test_settle_refunds_unused_budget(manager):
+    reservation = manager.reserve("alice", "basic", Cost(ocr_units=8, llm_tokens=500))
+    reservation.settle(Cost(ocr_units=2, llm_tokens=300))
+
+    manager.reserve("alice", "basic", Cost(ocr_units=8, llm_tokens=500))
+    stats = manager.stats()
+    assert stats["settled"] == 1
+    assert stats["refunded_ocr_units"] == 6
+    assert stats["refunded_llm_tokens"] == 200
+
+
+def test_settle_charges_overruns(manager):
+    reservation = manager.reserve("alice", "basic", Cost(ocr_units=2, llm_tokens=500))
+    reservation.settle(Cost(ocr_units=9, llm_tokens=500))
+
+    with pytest.raises(RateLimitError):
+        manager.reserve("alice", "basic", Cost(ocr_units=2, llm_tokens=100))
+    assert manager.stats()["refunded_ocr_units"] == -7
+
+
+def test_only_the_first_settlement_counts(manager):
+    reservation = manager.reserve("alice", "basic", Cost(ocr_units=8, llm_tokens=500))
+    reservation.settle(Cost(ocr_units=2, llm_tokens=500))
+    reservation.settle(Cost(ocr_units=0, llm_tokens=0))
+
+    assert reservation.actual == Cost(ocr_units=2, llm_tokens=500)
+    stats = manager.stats()
+    assert stats["settled"] == 1
+    assert stats["refunded_ocr_units"] == 6
+
+
+def test_unknown_plan_uses_the_default_plan(clock):
+    manager = QuotaManager({"standard": BUDGETS["basic"]}, backend=InMemoryBackend(clock=clock))
+
+    assert manager.reserve("alice", "enterprise", Cost(ocr_units=1, llm_tokens=1)).plan == "standard"
+
+
+def test_plan_for_status():
+    assert plan_for_status("trialing") == TRIAL_PLAN
+    assert plan_for_status("active") != TRIAL_PLAN
+    assert plan_for_status(None) != TRIAL_PLAN
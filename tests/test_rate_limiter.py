@@ -0,0 +1,148 @@
+"""GCRA rate limiter on the in-memory backend and a stubbed Postgres backend (no network)."""
+from src.rate_limiter import InMemoryBackend, PostgresBackend, RateLimiter
+
+
+def test_allows_a_burst_of_max_requests_then_limits(clock):
+    limiter = RateLimiter(max_requests=5, window_seconds=60, clock=clock)
+
+    assert all(limiter.is_allowed("alice")[0] for _ in range(5))
+    allowed, retry_after = limiter.is_allowed("alice")
+
+    assert not allowed
+    # One request every 12 seconds refills the allowance
+    assert retry_after == 12
+
+
+def test_allowance_refills_at_the_emission_interval(clock):
+    limiter = RateLimiter(max_requests=5, window_seconds=60, clock=clock)
+    for _ in range(5):
+        limiter.is_allowed("alice")
+
+    clock.advance(11.9)
+    assert not limiter.is_allowed("alice")[0]
+    clock.advance(0.1)
+    assert limiter.is_allowed("alice")[0]
+    assert not limiter.is_allowed("alice")[0]
+
+
+def test_users_are_limited_independently(clock):
+    limiter = RateLimiter(max_requests=1, window_seconds=60, clock=clock)
+
+    assert limiter.is_allowed("alice")[0]
+    assert not limiter.is_allowed("alice")[0]
+    assert limiter.is_allowed("bob")[0]
+
+
+def test_rejected_requests_do_not_use_allowance(clock):
+    limiter = RateLimiter(max_requests=2, window_seconds=60, clock=clock)
+    limiter.is_allowed("alice")
+    limiter.is_allowed("alice")
+    for _ in range(10):
+        limiter.is_allowed("alice")
+
+    clock.advance(30)
+    assert limiter.is_allowed("alice")[0]
+
+
+def test_remaining_requests(clock):
+    limiter = RateLimiter(max_requests=5, window_seconds=60, clock=clock)
+    assert limiter.get_remaining_requests("alice") == 5
+
+    limiter.is_allowed("alice")
+    limiter.is_allowed("alice")
+    assert limiter.get_remaining_requests("alice") == 3
+
+    clock.advance(60)
+    assert limiter.get_remaining_requests("alice") == 5
+
+
+def test_refilled_keys_are_evicted(clock):
+    backend = InMemoryBackend(clock=clock)
+    limiter = RateLimiter(max_requests=5, window_seconds=60, backend=backend)
+    for user in range(100):
+        limiter.is_allowed(f"user{user}")
+    assert backend.tracked_keys() == 100
+
+    clock.advance(60)
+    limiter.is_allowed("alice")
+    assert backend.tracked_keys() == 1
+
+
+def test_tracked_keys_are_bounded(clock):
+    backend = InMemoryBackend(max_keys=10, clock=clock)
+    limiter = RateLimiter(max_requests=5, window_seconds=60, backend=backend)
+    for user in range(50):
+        limiter.is_allowed(f"user{user}")
+
+    assert backend.tracked_keys() == 10
+
+
+def test_limits_sharing_a_backend_use_separate_keys(clock):
+    backend = InMemoryBackend(clock=clock)
+    appeals = RateLimiter(max_requests=1, window_seconds=60, backend=backend, name="appeals")
+    api = RateLimiter(max_requests=1, window_seconds=60, backend=backend, name="api")
+
+    assert appeals.is_allowed("alice")[0]
+    assert api.is_allowed("alice")[0]
+    assert not appeals.is_allowed("alice")[0]
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def execute(self):
+        return self
+
+
+class DatabaseClient:
+    """Stand-in for the PostgREST client: the rate limit functions run on an in-memory backend."""
+
+    def __init__(self, clock):
+        self.backend = InMemoryBackend(clock=clock)
+        self.calls = []
+        self.available = True
+
+    def rpc(self, name, params):
+        self.calls.append(name)
+        if not self.available:
+            raise ConnectionError("database unavailable")
+        if name == "rate_limit_check":
+            allowed, retry_after = self.backend.check(params["p_key"], params["p_interval"], params["p_window"])
+            return FakeResponse([{"allowed": allowed, "retry_after": retry_after}])
+        if name == "rate_limit_adjust":
+            self.backend.adjust(params["p_key"], params["p_delta"])
+            return FakeResponse(None)
+        return FakeResponse(self.backend.backlog(params["p_key"]))
+
+
+def test_postgres_backend_uses_the_database(clock):
+    client = DatabaseClient(clock)
+    limiter = RateLimiter(max_requests=2, window_seconds=60, backend=PostgresBackend(client), name="appeals")
+
+    assert limiter.is_allowed("alice")[0]
+    assert limiter.is_allowed("alice")[0]
+    assert limiter.is_allowed("alice") == (False, 30)
+    assert client.backend.backlog("appeals:alice") == 60
+
+    limiter.adjust("alice", -1)
+    assert limiter.get_remaining_requests("alice") == 1
+    assert client.calls.count("rate_limit_check") == 3
+
+
+def test_postgres_backend_keeps_limiting_when_the_database_fails(clock):
+    client = DatabaseClient(clock)
+    client.available = False
+    backend = PostgresBackend(client, fallback=InMemoryBackend(clock=clock))
+    limiter = RateLimiter(max_requests=2, window_seconds=60, backend=backend)
+
+    assert limiter.is_allowed("alice")[0]
+    assert limiter.is_allowed("alice")[0]
+    allowed, retry_after = limiter.is_allowed("alice")
+
+    assert not allowed
+    assert retry_after == 30
+    limiter.adjust("alice", -1)
+    assert limiter.get_remaining_requests("alice") == 1
+    assert limiter.is_allowed("alice")[0]
+    assert not limiter.is_allowed("alice")[0]
@@ -0,0 +1,229 @@
+"""Stripe webhook verification and event ordering against an in-memory table."""
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+
+from src.stripe_webhooks import apply_event, handle_webhook, verify_event
+
+SECRET = "whsec_test"
+
+
+class FakeStore:
+    """Entitlement table kept in a dict; upsert only writes the given columns."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get(self, email):
+        return self.rows.get(email.strip().lower())
+
+    def find_by_customer(self, customer_id):
+        return next((row for row in self.rows.values() if row.get("customer_id") == customer_id), None)
+
+    def upsert(self, record):
+        email = record["email"].strip().lower()
+        self.rows[email] = {**self.rows.get(email, {}), **record, "email": email}
+
+
+def no_lookup(customer_id):
+    raise AssertionError(f"Unexpected Stripe lookup of {customer_id}")
+
+
+def subscription_event(
+    event_type="customer.subscription.updated", created=100, status="active", customer="cus_1", subscription="sub_1"
+):
+    return {
+        "type": event_type,
+        "created": created,
+        "data": {"object": {
+            "id": subscription, "customer": customer, "status": status, "current_period_end": 5000
+        }},
+    }
+
+
+def checkout_event(email="Alice@Example.com", mode="subscription", payment_status="paid"):
+    return {
+        "type": "checkout.session.completed",
+        "created": 90,
+        "data": {"object": {
+            "mode": mode,
+            "customer": "cus_1",
+            "customer_details": {"email": email},
+            "payment_status": payment_status,
+            "subscription": "sub_1",
+        }},
+    }
+
+
+def sign(payload: str, timestamp: int, secret: str = SECRET) -> str:
+    mac = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={mac}"
+
+
+@pytest.fixture
+def store():
+    return FakeStore()
+
+
+def test_checkout_grants_access(store):
+    assert apply_event(checkout_event(), store, no_lookup) == "checkout"
+    assert store.get("alice@example.com") == {
+        "email": "alice@example.com", "customer_id": "cus_1", "status": "active", "subscription_id": "sub_1"
+    }
+
+
+def test_checkout_without_payment_starts_a_trial(store):
+    apply_event(checkout_event(payment_status="no_payment_required"), store, no_lookup)
+    assert store.get("alice@example.com")["status"] == "trialing"
+
+
+def test_checkout_keeps_the_status_of_earlier_subscription_events(store):
+    apply_event(checkout_event(), store, no_lookup)
+    apply_event(subscription_event(status="past_due"), store, no_lookup)
+
+    # Redelivered checkout must not grant access again
+    apply_event(checkout_event(), store, no_lookup)
+    assert store.get("alice@example.com")["status"] == "past_due"
+
+
+def test_subscription_event_looks_up_unknown_customers(store):
+    outcome = apply_event(subscription_event(), store, lambda customer_id: "bob@example.com")
+
+    assert outcome == "subscription"
+    row = store.get("bob@example.com")
+    assert row["status"] == "active"
+    assert row["period_end"] == 5000
+    assert row["last_event_at"] == 100
+
+
+def test_period_end_from_subscription_items(store):
+    event = subscription_event()
+    del event["data"]["object"]["current_period_end"]
+    event["data"]["object"]["items"] = {"data": [{"current_period_end": 7000}, {"current_period_end": 8000}]}
+
+    apply_event(event, store, lambda customer_id: "bob@example.com")
+    assert store.get("bob@example.com")["period_end"] == 8000
+
+
+def test_deleted_subscription_is_canceled(store):
+    apply_event(checkout_event(), store, no_lookup)
+    apply_event(subscription_event("customer.subscription.deleted", created=200), store, no_lookup)
+
+    assert store.get("alice@example.com")["status"] == "canceled"
+
+
+def test_older_events_are_stale(store):
+    apply_event(checkout_event(), store, no_lookup)
+    apply_event(subscription_event(created=200, status="canceled"), store, no_lookup)
+
+    assert apply_event(subscription_event(created=150, status="active"), store, no_lookup) == "stale"
+    assert store.get("alice@example.com")["status"] == "canceled"
+
+
+def test_events_with_the_same_timestamp_apply(store):
+    apply_event(checkout_event(), store, no_lookup)
+    apply_event(subscription_event(created=200, status="trialing"), store, no_lookup)
+
+    assert apply_event(subscription_event(created=200, status="active"), store, no_lookup) == "subscription"
+    assert store.get("alice@example.com")["status"] == "active"
+
+
+def test_deletion_of_a_replaced_subscription_keeps_the_new_one(store):
+    apply_event(checkout_event(), store, no_lookup)
+    first = subscription_event("customer.subscription.created", created=100, subscription="sub_1")
+    apply_event(first, store, no_lookup)
+    # The customer re-subscribes; the old subscription's deletion arrives last
+    new = subscription_event("customer.subscription.created", created=200, subscription="sub_2")
+    old_deleted = subscription_event("customer.subscription.deleted", created=210, subscription="sub_1")
+
+    assert apply_event(new, store, no_lookup) == "subscription"
+    assert apply_event(old_deleted, store, no_lookup) == "superseded"
+    row = store.get("alice@example.com")
+    assert row["status"] == "active"
+    assert row["subscription_id"] == "sub_2"
+
+
+def test_other_subscription_does_not_downgrade_the_current_one(store):
+    apply_event(checkout_event(), store, no_lookup)
+    apply_event(subscription_event(created=100, subscription="sub_1"), store, no_lookup)
+
+    incomplete = subscription_event(
+        "customer.subscription.created", created=200, status="incomplete", subscription="sub_2"
+    )
+    assert apply_event(incomplete, store, no_lookup) == "superseded"
+    assert store.get("alice@example.com")["subscription_id"] == "sub_1"
+
+
+def test_active_subscription_replaces_a_lapsed_one(store):
+    apply_event(checkout_event(), store, no_lookup)
+    apply_event(subscription_event(created=100, status="past_due", subscription="sub_1"), store, no_lookup)
+
+    assert apply_event(subscription_event(created=200, subscription="sub_2"), store, no_lookup) == "subscription"
+    # Later events of the lapsed subscription no longer change the row
+    assert apply_event(subscription_event(created=300, status="unpaid", subscription="sub_1"), store, no_lookup) == \
+        "superseded"
+    row = store.get("alice@example.com")
+    assert (row["subscription_id"], row["status"]) == ("sub_2", "active")
+
+
+@pytest.mark.parametrize("event", [
+    {"type": "invoice.paid", "data": {"object": {"customer": "cus_1"}}},
+    checkout_event(mode="payment"),
+    checkout_event(email=None),
+    subscription_event(customer=None),
+])
+def test_irrelevant_events_are_ignored(store, event):
+    assert apply_event(event, store, no_lookup) == "ignored"
+    assert store.rows == {}
+
+
+def test_subscription_of_customer_without_email_is_ignored(store):
+    assert apply_event(subscription_event(), store, lambda customer_id: None) == "ignored"
+    assert store.rows == {}
+
+
+def test_verify_event_accepts_a_valid_signature():
+    payload = json.dumps(subscription_event())
+    event = verify_event(payload.encode(), sign(payload, int(time.time())), SECRET)
+    assert event["type"] == "customer.subscription.updated"
+
+
+@pytest.mark.parametrize("signature", [
+    None,
+    "",
+    "t=1,v1=deadbeef",
+])
+def test_verify_event_rejects_missing_or_invalid_signatures(signature):
+    with pytest.raises(ValueError):
+        verify_event(b"{}", signature, SECRET)
+
+
+def test_verify_event_rejects_other_secrets_and_old_timestamps():
+    payload = json.dumps(subscription_event())
+    with pytest.raises(ValueError):
+        verify_event(payload.encode(), sign(payload, int(time.time()), "whsec_other"), SECRET)
+    with pytest.raises(ValueError):
+        verify_event(payload.encode(), sign(payload, int(time.time()) - 3600), SECRET)
+
+
+def test_handle_webhook_status_codes(store):
+    payload = json.dumps(checkout_event())
+    signature = sign(payload, int(time.time()))
+
+    assert handle_webhook(payload.encode(), "t=1,v1=bad", SECRET, store, no_lookup)[0] == 400
+    status, body = handle_webhook(payload.encode(), signature, SECRET, store, no_lookup)
+    assert status == 200
+    assert body["outcome"] == "checkout"
+
+
+def test_handle_webhook_asks_for_a_retry_when_the_store_fails():
+    class BrokenStore(FakeStore):
+        def upsert(self, record):
+            raise ConnectionError("database unavailable")
+
+    payload = json.dumps(checkout_event())
+    status, _ = handle_webhook(payload.encode(), sign(payload, int(time.time())), SECRET, BrokenStore(), no_lookup)
+    assert status == 500
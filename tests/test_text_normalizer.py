@@ -0,0 +1,80 @@
+"""Page text normalization before the LLM."""
+from src.text_normalizer import drop_noise_words, normalize_pages
+
+HEADER = "Unity Care Assurance | Appeals Unit"
+FOOTER = "Confidential: contains protected health information"
+
+
+def page(body: str, number: int, total: int = 3) -> str:
+    return f"{HEADER}\n\n{body}\n\n{FOOTER}\nPage {number} of {total}"
+
+
+def test_repeated_header_and_footer_are_kept_once():
+    texts = [page(f"Body of page {number}.", number) for number in (1, 2, 3)]
+
+    normalized, report = normalize_pages(texts)
+
+    assert normalized[0].startswith(HEADER)
+    assert FOOTER in normalized[0]
+    assert all(HEADER not in text and FOOTER not in text for text in normalized[1:])
+    assert all(f"Body of page {number}." in text for number, text in zip((1, 2, 3), normalized))
+    assert report.repeated_lines == 4
+
+
+def test_page_markers_are_removed():
+    normalized, report = normalize_pages(["Text\nPage 1 of 2", "More\n2/2\n- 3 -"])
+
+    assert normalized == ["Text", "More"]
+    assert report.page_markers == 3
+
+
+def test_lines_on_few_pages_are_kept():
+    texts = ["Claim denied.", "Claim denied.", "Other", "Other too"]
+
+    normalized, report = normalize_pages(texts, min_share=0.75)
+
+    assert normalized[1] == "Claim denied."
+    assert report.repeated_lines == 0
+
+
+def test_single_page_keeps_repeated_lines():
+    normalized, _ = normalize_pages(["Total\nTotal"])
+    assert normalized == ["Total\nTotal"]
+
+
+def test_line_end_hyphenation_is_rejoined():
+    normalized, report = normalize_pages(["The service is not medi-\ncally necessary.\nPre-\nAuthorization"])
+
+    assert normalized == ["The service is not medically\nnecessary.\nPre-\nAuthorization"]
+    assert report.hyphenations == 1
+
+
+def test_whitespace_and_symbol_lines_are_cleaned():
+    normalized, report = normalize_pages(["Claim\t  Number:   123\n\n\n\n~~~|||~~~\nDenied"])
+
+    assert normalized == ["Claim Number: 123\n\nDenied"]
+    assert report.noise_lines == 1
+
+
+def test_report_sizes():
+    texts = [page("Body.", 1), page("Body two.", 2)]
+
+    _, report = normalize_pages(texts, noise_words=4)
+    summary = report.report()
+
+    assert summary["chars_before"] == sum(len(text) for text in texts)
+    assert 0 < summary["chars_after"] < summary["chars_before"]
+    assert summary["noise_words"] == 4
+
+
+def test_drop_noise_words_by_confidence():
+    text, dropped = drop_noise_words("Claim ~#~ denied\nE0601 xq", [95, 40, 90, 55, 10], min_confidence=60)
+
+    # Symbols below the threshold and anything below half of it go; a clean word at 55 stays
+    assert text == "Claim denied\nE0601"
+    assert dropped == 2
+
+
+def test_drop_noise_words_leaves_text_alone_when_confidences_do_not_match():
+    assert drop_noise_words("Claim denied", [10], min_confidence=60) == ("Claim denied", 0)
+    assert drop_noise_words("Claim denied", [10, 10], min_confidence=0) == ("Claim denied", 0)